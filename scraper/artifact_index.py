@@ -0,0 +1,138 @@
+"""Persistent index of stored artifacts.
+
+Every showtimes file and seat-availability snapshot is recorded as it is
+written, so "what do we have for site X on date Y" is an indexed SQLite
+lookup instead of a walk over the data tree.
+"""
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from artifact_writer import artifact_stem, iter_artifacts
+from data_paths import DATA_DIR
+
+
+INDEX_FILE = DATA_DIR / "artifacts.sqlite"
+
+SHOWTIMES = "showtimes"
+SEAT_AVAILABILITY = "seat_availability"
+SEAT_SERIES = "seat_series"
+
+
+class ArtifactIndex:
+    def __init__(self, path: Path = INDEX_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS artifacts (
+                path TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                site_id TEXT,
+                date TEXT,
+                show_id TEXT,
+                fetched_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS artifacts_site_date ON artifacts (kind, site_id, date);
+            CREATE INDEX IF NOT EXISTS artifacts_date ON artifacts (kind, date);
+            CREATE INDEX IF NOT EXISTS artifacts_show ON artifacts (kind, show_id, fetched_at);
+        """)
+
+    def record(self, kind: str, path: Path, site_id: str | None = None, date: str | None = None,
+               show_id: str | None = None, fetched_at: float | None = None):
+        fetched_at = time.time() if fetched_at is None else fetched_at
+        with self._lock, self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO artifacts (path, kind, site_id, date, show_id, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(path), kind, site_id, date, show_id, fetched_at),
+            )
+
+    def record_many(self, rows):
+        """Record [(kind, path, site_id, date, show_id, fetched_at)] in one transaction."""
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO artifacts (path, kind, site_id, date, show_id, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(str(path), kind, site_id, date, show_id, fetched_at) for kind, path, site_id, date, show_id, fetched_at in rows],
+            )
+
+    def find(self, kind: str, site_id: str | None = None, date: str | None = None, show_id: str | None = None):
+        """Return [(path, site_id, date, show_id, fetched_at)] newest first."""
+        sql = "SELECT path, site_id, date, show_id, fetched_at FROM artifacts WHERE kind = ?"
+        params = [kind]
+        for column, value in (("site_id", site_id), ("date", date), ("show_id", show_id)):
+            if value is not None:
+                sql += f" AND {column} = ?"
+                params.append(value)
+        sql += " ORDER BY fetched_at DESC"
+        with self._lock:
+            return [(Path(p), *rest) for p, *rest in self.db.execute(sql, params).fetchall()]
+
+    def latest(self, kind: str, **filters) -> Path | None:
+        rows = self.find(kind, **filters)
+        return rows[0][0] if rows else None
+
+    def forget_missing(self) -> int:
+        """Drop rows whose file has been deleted."""
+        with self._lock:
+            paths = [p for (p,) in self.db.execute("SELECT path FROM artifacts").fetchall()]
+        gone = [(p,) for p in paths if not Path(p).exists()]
+        with self._lock, self.db:
+            self.db.executemany("DELETE FROM artifacts WHERE path = ?", gone)
+        return len(gone)
+
+    def rebuild(self, root: Path = DATA_DIR) -> int:
+        """Index every artifact already on disk (one walk, for existing history)."""
+        rows = []
+        for p in iter_artifacts(root, "showtimes_*.json"):
+            site_id, _, date = artifact_stem(p)[len("showtimes_"):].partition("_")
+            rows.append((str(p), SHOWTIMES, site_id, date, None, p.stat().st_mtime))
+        for p in iter_artifacts(root, "seat_availability_*.json"):
+            # seat_availability_<show>_<HHMMSS>[-<microseconds>].json; the date is not in the name
+            show_id = artifact_stem(p)[len("seat_availability_"):].rsplit("_", 1)[0]
+            rows.append((str(p), SEAT_AVAILABILITY, None, None, show_id, p.stat().st_mtime))
+        # rows recorded at write time carry more detail, keep them
+        with self._lock, self.db:
+            self.db.executemany(
+                "INSERT OR IGNORE INTO artifacts (path, kind, site_id, date, show_id, fetched_at) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+        return len(rows)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> ArtifactIndex:
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = ArtifactIndex()
+    return _index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Rebuild or query the artifact index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Index all files already under data/")
+    p_list = sub.add_parser("list", help="List indexed artifacts")
+    p_list.add_argument("--kind", default=SHOWTIMES, choices=[SHOWTIMES, SEAT_AVAILABILITY, SEAT_SERIES])
+    p_list.add_argument("--site", default=None)
+    p_list.add_argument("--date", default=None)
+    p_list.add_argument("--show", default=None)
+    args = parser.parse_args()
+
+    index = get_index()
+    if args.command == "rebuild":
+        print(f"Indexed {index.rebuild()} artifacts, dropped {index.forget_missing()} missing")
+    else:
+        for path, site_id, date, show_id, fetched_at in index.find(args.kind, args.site, args.date, args.show):
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(fetched_at))
+            print(f"{stamp}  {site_id or '-':<6} {date or '-':<10} {show_id or '-':<12} {path}")
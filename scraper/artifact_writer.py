@@ -0,0 +1,260 @@
+"""Crash-safe writes for scraped artifacts.
+
+Every file is written under a temporary name in its destination directory
+and renamed over the final path, so readers, concurrent runs and a crash
+mid-write only ever leave the old file or the complete new one, never a
+truncated one.
+
+    atomic_write(path, data)          one file, as is
+    write_artifact(path, data)        one showtimes or seat file, compressed per
+                                      config.ARTIFACT_COMPRESSION (.json.gz or .json.zst)
+    BatchWriter                       many small files renamed together, each
+                                      directory created and synced once per batch
+    read_artifact / open_artifact     read plain or compressed files
+    iter_artifacts / find_artifact    locate files in either form
+    unique_path                       timestamped names that never collide
+    locked(path)                      exclusive advisory lock on path + ".lock"
+
+With config.ARTIFACT_FSYNC files are fsynced before the rename and their
+directory after it, so a write survives power loss as well.
+"""
+import fnmatch
+import gzip
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from config import ARTIFACT_COMPRESSION, ARTIFACT_COMPRESSION_LEVEL, ARTIFACT_FSYNC
+
+try:
+    import fcntl
+except ImportError:  # Windows: renames are still atomic, locks become no-ops
+    fcntl = None
+
+
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+_made_dirs = set()
+_last_stamp = 0
+_stamp_lock = threading.Lock()
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise SystemExit("zstd compression needs zstandard: python3 -m pip install zstandard")
+    return zstandard
+
+
+def ensure_dir(path: Path):
+    """mkdir -p, once per directory and process."""
+    if path not in _made_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _made_dirs.add(path)
+
+
+def _tmp_path(path: Path) -> Path:
+    # dot-prefixed, so artifact globs never pick up a half-written file
+    return path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+
+
+def _write_tmp(path: Path, data: bytes, fsync: bool) -> Path:
+    ensure_dir(path.parent)
+    tmp = _tmp_path(path)
+    try:
+        try:
+            f = open(tmp, "wb")
+        except FileNotFoundError:
+            # the directory was removed since it was created
+            _made_dirs.discard(path.parent)
+            ensure_dir(path.parent)
+            f = open(tmp, "wb")
+        with f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return tmp
+
+
+def _fsync_dir(path: Path):
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data, fsync: bool = ARTIFACT_FSYNC) -> Path:
+    """Write bytes (or text as UTF-8) to `path` via a temporary file and rename."""
+    path = Path(path)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    tmp = _write_tmp(path, data, fsync)
+    try:
+        os.replace(tmp, path)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    if fsync:
+        _fsync_dir(path.parent)
+    return path
+
+
+def compress(data: bytes, codec: str = ARTIFACT_COMPRESSION, level: int = ARTIFACT_COMPRESSION_LEVEL) -> bytes:
+    if not codec:
+        return data
+    if codec == "gzip":
+        # mtime=0 keeps the output identical for identical payloads
+        return gzip.compress(data, compresslevel=level or 6, mtime=0)
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=level or 3).compress(data)
+    raise ValueError(f"Unknown compression {codec!r} (expected gzip or zstd)")
+
+
+def artifact_path(path, codec: str = ARTIFACT_COMPRESSION) -> Path:
+    """The name `path` is stored under with `codec`, e.g. showtimes_1004_2026-01-02.json.gz."""
+    path = Path(path)
+    return path.with_name(path.name + SUFFIXES[codec]) if codec else path
+
+
+def write_artifact(path, data: bytes, codec: str = ARTIFACT_COMPRESSION, fsync: bool = ARTIFACT_FSYNC) -> Path:
+    """Atomically write a payload, compressed per `codec`; returns the path actually written."""
+    return atomic_write(artifact_path(path, codec), compress(data, codec), fsync)
+
+
+def artifact_name(path) -> str:
+    """File name without a compression suffix."""
+    name = Path(path).name
+    for suffix in SUFFIXES.values():
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def artifact_stem(path) -> str:
+    """File name without compression and .json suffixes, e.g. showtimes_1004_2026-01-02."""
+    name = artifact_name(path)
+    return name[:-len(".json")] if name.endswith(".json") else Path(name).stem
+
+
+def find_artifact(path) -> Path | None:
+    """The stored form of `path` (plain or compressed) if any exists, preferring the configured one."""
+    path = Path(path)
+    codecs = [ARTIFACT_COMPRESSION] + [c for c in ("", *SUFFIXES) if c != ARTIFACT_COMPRESSION]
+    for codec in codecs:
+        p = artifact_path(path, codec)
+        if p.exists():
+            return p
+    return None
+
+
+def iter_artifacts(root, pattern: str, recursive: bool = True):
+    """Paths under `root` whose name, minus any compression suffix, matches `pattern`."""
+    root = Path(root)
+    found = root.rglob(pattern + "*") if recursive else root.glob(pattern + "*")
+    return sorted(p for p in found if fnmatch.fnmatch(artifact_name(p), pattern))
+
+
+def open_artifact(path):
+    """Open a plain or compressed artifact as a binary file."""
+    path = Path(path)
+    if path.name.endswith(SUFFIXES["gzip"]):
+        return gzip.open(path, "rb")
+    if path.name.endswith(SUFFIXES["zstd"]):
+        return _zstd().ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True)
+    return open(path, "rb")
+
+
+def read_artifact(path) -> bytes:
+    with open_artifact(path) as f:
+        return f.read()
+
+
+def unique_path(directory: Path, prefix: str, suffix: str = ".json") -> Path:
+    """<prefix><HHMMSS>-<microseconds><suffix>, never the same name twice in a process.
+
+    Stamps come from one strictly increasing microsecond clock, so polling a
+    show twice within a second (or a microsecond) never overwrites a poll.
+    """
+    global _last_stamp
+    with _stamp_lock:
+        stamp = _last_stamp = max(time.time_ns() // 1000, _last_stamp + 1)
+    seconds, micros = divmod(stamp, 1_000_000)
+    return directory / f"{prefix}{time.strftime('%H%M%S', time.localtime(seconds))}-{micros:06d}{suffix}"
+
+
+@contextmanager
+def locked(path):
+    """Hold an exclusive lock on `path` + ".lock" across processes (no-op without fcntl)."""
+    lock_path = Path(str(path) + ".lock")
+    ensure_dir(lock_path.parent)
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+class BatchWriter:
+    """Collect many small artifact writes and commit them together.
+
+    write() only buffers; flush() (every `max_files` writes and on exit)
+    writes each file to a temporary name, then renames them all, creating
+    each directory once and, with fsync, syncing each directory once.
+    Paths are returned as they will be named, compression suffix included.
+    """
+
+    def __init__(self, codec: str = ARTIFACT_COMPRESSION, fsync: bool = ARTIFACT_FSYNC, max_files: int = 256):
+        self.codec = codec
+        self.fsync = fsync
+        self.max_files = max_files
+        self._pending = []
+
+    def write(self, path, data, compressed: bool = True) -> Path:
+        if isinstance(data, str):
+            data = data.encode("utf-8")
+        codec = self.codec if compressed else ""
+        final = artifact_path(path, codec)
+        self._pending.append((final, compress(data, codec)))
+        if len(self._pending) >= self.max_files:
+            self.flush()
+        return final
+
+    def flush(self) -> int:
+        pending, self._pending = self._pending, []
+        staged = []
+        try:
+            for final, data in pending:
+                staged.append((_write_tmp(final, data, self.fsync), final))
+            for tmp, final in staged:
+                os.replace(tmp, final)
+        except BaseException:
+            for tmp, _ in staged:
+                tmp.unlink(missing_ok=True)
+            raise
+        if self.fsync:
+            for directory in {final.parent for _, final in staged}:
+                _fsync_dir(directory)
+        return len(staged)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.flush()
@@ -0,0 +1,272 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from artifact_writer import find_artifact
+from bearer_token import get_provider
+from config import (
+    THEATER_SHOWTIMES, MAX_CONCURRENCY, REQUESTS_PER_SECOND, RATE_BURST,
+    SHOWTIMES_BATCH_SIZE, SHOWTIMES_BATCH_MAX, SHOWTIMES_BATCH_TARGET_SECONDS, SHOWTIMES_BATCH_TARGET_BYTES,
+)
+from http_client import get_client
+from http_cache import format_stats
+from json_stream import loads
+import metrics
+from scrape_manifest import ScrapeManifest, payload_hash
+from showtime_scraper import (
+    showtimes_output_path, save_showtimes, save_showtimes_response, multi_site_showtimes_url, split_showtimes_by_site,
+)
+
+
+class TokenBucket:
+    """Allow `rate` requests per second with bursts of up to `burst`.
+
+    throttle() halves the rate once per throttling event (a 429 seen at
+    monotonic time `at`); recover() adds back a twentieth of the configured
+    rate per successful request.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.throttled_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttle(self, at: float):
+        if at > self.throttled_at:
+            self.throttled_at = at
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def recover(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class HostRateLimiter:
+    """One token bucket per host."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+
+    def bucket(self, url: str) -> TokenBucket:
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            bucket = self._buckets[host] = TokenBucket(self.rate, self.burst)
+        return bucket
+
+    async def acquire(self, url: str):
+        await self.bucket(url).acquire()
+
+
+class AdaptiveBatcher:
+    """Pick how many sites to request per call from recent latency and size.
+
+    Halves the batch when a response is slower or larger than the target and
+    doubles it when both stay under half the target.
+    """
+
+    def __init__(self, size: int = SHOWTIMES_BATCH_SIZE, max_size: int = SHOWTIMES_BATCH_MAX,
+                 target_seconds: float = SHOWTIMES_BATCH_TARGET_SECONDS, target_bytes: int = SHOWTIMES_BATCH_TARGET_BYTES):
+        self.max_size = max(1, max_size)
+        self.size = min(max(1, size), self.max_size)
+        self.target_seconds = target_seconds
+        self.target_bytes = target_bytes
+
+    def observe(self, n_sites: int, seconds: float, nbytes: int):
+        if seconds > self.target_seconds or nbytes > self.target_bytes:
+            self.size = max(1, min(self.size, n_sites) // 2)
+        elif n_sites >= self.size and seconds < self.target_seconds / 2 and nbytes < self.target_bytes / 2:
+            self.size = min(self.max_size, self.size * 2)
+
+    def failed(self, n_sites: int):
+        self.size = max(1, min(self.size, n_sites) // 2)
+
+
+class ScrapeEngine:
+    """Fetch many Digital API urls concurrently under a per-host rate limit."""
+
+    def __init__(self, token: str, concurrency: int | None = None, rate: float | None = None, burst: int | None = None):
+        self.concurrency = concurrency or MAX_CONCURRENCY
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency)
+        self.limiter = HostRateLimiter(rate or REQUESTS_PER_SECOND, burst or RATE_BURST)
+        # The pooled client holds the shared token and refreshes it once on 401.
+        self.client = get_client()
+        self.client.set_token(token)
+        # renew the token before it expires instead of waiting for a 401
+        get_provider().start_background_refresh()
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def in_executor(self, fn, *args):
+        """Run blocking work (file writes, parsing) on the engine's thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, fn, *args)
+
+    async def fetch(self, url: str, headers: dict | None = None, cache: bool = False):
+        headers = headers or {"Content-Type": "application/json"}
+        if cache:
+            # fresh cache hits cost neither a concurrency slot nor a rate-limit token
+            resp = await self.in_executor(self.client.get_cached, url, True)
+            if resp is not None:
+                return resp
+        breaker = self.client.retry.breaker(url)
+        async with self._semaphore:
+            # wait out a Retry-After here rather than on a pool thread
+            hold = breaker.hold_remaining()
+            if hold:
+                await asyncio.sleep(hold)
+            await self.limiter.acquire(url)
+            started = time.monotonic()
+            resp = await self.in_executor(lambda: self.client.get(url, headers=headers, auth=True, cache=cache))
+        if breaker.last_throttled > started:
+            self.limiter.bucket(url).throttle(breaker.last_throttled)
+        elif not getattr(resp, "from_cache", False):
+            self.limiter.bucket(url).recover()
+        return resp
+
+    async def fetch_showtimes(self, entry, date: str, manifest=None):
+        site_id = entry.get("key")
+        if not site_id:
+            return None
+        out_path, _ = await self.fetch_showtimes_payload(site_id, date, manifest)
+        return out_path
+
+    async def fetch_showtimes_payload(self, site_id: str, date: str, manifest=None):
+        """Fetch and save showtimes; returns (out_path, body), or (None, None) on failure.
+
+        The body lets callers use the shows without reading the file back.
+        """
+        url = THEATER_SHOWTIMES.format(date=date, site_id=site_id)
+        try:
+            with metrics.span("fetch_showtimes", site_id=site_id, date=date):
+                resp = await self.fetch(url, cache=True)
+        except Exception as e:
+            print(f"Request error for {site_id}: {e}")
+            return None, None
+        if resp.status_code != 200:
+            print(f"Showtimes {site_id} {date} returned HTTP {resp.status_code}")
+            return None, None
+
+        out_path = showtimes_output_path(site_id, date)
+        try:
+            if manifest is not None:
+                changed = manifest.record(site_id, date, payload_hash(loads(resp.content)))
+                if not changed and find_artifact(out_path):
+                    return out_path, resp.content
+            save_showtimes_response(resp, out_path, site_id, date)
+        except Exception:
+            print(f"Failed to parse JSON for {site_id}")
+            return None, None
+        return out_path, resp.content
+
+    async def _save_site_payload(self, site_id: str, date: str, data, from_cache: bool, manifest=None):
+        out_path = showtimes_output_path(site_id, date)
+        if from_cache and find_artifact(out_path):
+            return out_path
+        if manifest is not None:
+            if not manifest.record(site_id, date, payload_hash(data)) and find_artifact(out_path):
+                return out_path
+        await self.in_executor(save_showtimes, data, out_path, site_id, date)
+        return out_path
+
+    async def fetch_showtimes_batched(self, site_ids, date: str, batcher: AdaptiveBatcher, manifest=None):
+        """Fetch many sites per request for one date, splitting responses per site."""
+        pending = list(site_ids)
+        saved = []
+        while pending:
+            batch, pending = pending[:batcher.size], pending[batcher.size:]
+            url = multi_site_showtimes_url(date, batch)
+            started = time.monotonic()
+            try:
+                resp = await self.fetch(url, cache=True)
+                ok = resp.status_code == 200
+                data = loads(resp.content) if ok else None
+            except Exception as e:
+                print(f"Request error for {date} sites {','.join(batch)}: {e}")
+                ok = False
+            if not ok:
+                if len(batch) == 1:
+                    print(f"Failed to fetch showtimes for {batch[0]} {date}")
+                    saved.append(None)
+                    continue
+                # retry the same sites in smaller batches
+                batcher.failed(len(batch))
+                pending = batch + pending
+                continue
+
+            batcher.observe(len(batch), time.monotonic() - started, len(resp.content))
+            from_cache = getattr(resp, "from_cache", False)
+            for site_id, payload in split_showtimes_by_site(data, batch).items():
+                saved.append(await self._save_site_payload(site_id, date, payload, from_cache, manifest))
+        return saved
+
+    async def run_showtimes_batched(self, pairs, manifest=None):
+        by_date = {}
+        for entry, d in pairs:
+            if entry.get("key"):
+                by_date.setdefault(d, []).append(entry["key"])
+        batcher = AdaptiveBatcher()
+        results = await asyncio.gather(*(
+            self.fetch_showtimes_batched(site_ids, d, batcher, manifest) for d, site_ids in by_date.items()
+        ))
+        return [p for paths in results for p in paths]
+
+    async def run_showtimes(self, pairs, manifest=None):
+        jobs = [self.fetch_showtimes(entry, d, manifest) for entry, d in pairs]
+        return await asyncio.gather(*jobs)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def scrape_showtimes(token: str, entries, dates, concurrency: int | None = None, rate: float | None = None,
+                     manifest: ScrapeManifest | None = None, batch: bool = False):
+    """Fetch showtimes for every (entry, date) pair concurrently. Returns saved paths.
+
+    With a `manifest`, only pairs that are due under the freshness policy are
+    fetched, and files are rewritten only when their content hash changed.
+    With `batch`, each request covers many sites of one date (siteIds list),
+    sized adaptively, and the response is split back into per-site files.
+    """
+    pairs = [(entry, d) for d in dates for entry in entries]
+    if manifest is not None:
+        due = [(entry, d) for entry, d in pairs if manifest.is_due(entry.get("key"), d)]
+        print(f"Incremental: {len(due)}/{len(pairs)} site/dates due")
+        pairs = due
+
+    engine = ScrapeEngine(token, concurrency=concurrency, rate=rate)
+    started = time.monotonic()
+    try:
+        run = engine.run_showtimes_batched if batch else engine.run_showtimes
+        paths = asyncio.run(run(pairs, manifest))
+    finally:
+        engine.close()
+        if manifest is not None:
+            manifest.save()
+        metrics.export_run("showtimes")
+    saved = [p for p in paths if p]
+    print(f"Fetched {len(saved)}/{len(paths)} showtimes in {time.monotonic() - started:.1f}s")
+    if manifest is not None:
+        print(f"{manifest.changed} changed, {manifest.unchanged} unchanged")
+    if engine.client.cache is not None:
+        print(format_stats(engine.client.cache.session_stats))
+    retry_stats = engine.client.retry.stats()
+    if retry_stats["open_circuits"] or retry_stats["retry_budget_exhausted"]:
+        print(f"Open circuits: {retry_stats['open_circuits']}, retries refused by budget: {retry_stats['retry_budget_exhausted']}")
+    return saved
@@ -1,16 +1,33 @@
-from playwright.sync_api import sync_playwright
-from config import BASE_URL, DIGITAL_API_HOST, DEFAULT_USER_AGENT
+from config import BASE_URL, DIGITAL_API_HOST, DEFAULT_USER_AGENT, TOKEN_REFRESH_MARGIN, TOKEN_CAPTURE_TIMEOUT_MS, TOKEN_URL
+from concurrent.futures import Future, TimeoutError as FutureTimeout
 from pathlib import Path
+import atexit
 import json
+import queue
+import threading
 import time
 from base64 import urlsafe_b64decode
+import metrics
+from artifact_writer import atomic_write, locked
 
 
 TOKEN_FILE = Path(__file__).parent / "data" / "bearer_token.json"
+BROWSER_PROFILE_DIR = Path(__file__).parent / "data" / "browser_profile"
 
+BROWSER_ARGS = [
+    "--disable-blink-features=AutomationControlled",
+    "--no-sandbox",
+    "--disable-setuid-sandbox"
+]
+BROWSER_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
 
-def _ensure_data_dir():
-    TOKEN_FILE.parent.mkdir(parents=True, exist_ok=True)
+# MANUAL STEALTH: hide the 'navigator.webdriver' flag
+# This acts exactly like playwright-stealth but without the import errors
+STEALTH_SCRIPT = """
+    Object.defineProperty(navigator, 'webdriver', {
+        get: () => undefined
+    });
+"""
 
 
 def _decode_jwt_payload(token: str) -> dict:
@@ -26,6 +43,14 @@ def _decode_jwt_payload(token: str) -> dict:
         return {}
 
 
+def _token_exp(token: str) -> float | None:
+    exp = _decode_jwt_payload(token).get('exp')
+    try:
+        return float(exp) if exp is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
 def _token_valid(token: str) -> bool:
     try:
         payload = _decode_jwt_payload(token)
@@ -39,8 +64,7 @@ def _token_valid(token: str) -> bool:
 
 
 def _save_token(token: str):
-    _ensure_data_dir()
-    TOKEN_FILE.write_text(json.dumps({"token": token}), encoding="utf-8")
+    atomic_write(TOKEN_FILE, json.dumps({"token": token}))
 
 
 def _load_token() -> str | None:
@@ -53,92 +77,278 @@ def _load_token() -> str | None:
         return None
 
 
-def _fetch_token_via_playwright() -> str | None:
-    with sync_playwright() as p:
-        # 1. Launch with flags to disable automation features in Chrome
-        browser = p.chromium.launch(
-            headless=True,
-            args=[
-                "--disable-blink-features=AutomationControlled",
-                "--no-sandbox", 
-                "--disable-setuid-sandbox"
-            ]
-        )
-        
-        # 2. Use a high-resolution viewport and standard User Agent
-        context = browser.new_context(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-            viewport={'width': 1920, 'height': 1080}
-        )
-        
-        page = context.new_page()
-        
-        # 3. MANUAL STEALTH: Inject JavaScript to hide the 'navigator.webdriver' flag
-        # This acts exactly like playwright-stealth but without the import errors
-        page.add_init_script("""
-            Object.defineProperty(navigator, 'webdriver', {
-                get: () => undefined
-            });
-        """)
-
-        token = None
-        try:
-            # Monitor requests
-            def request_handler(request):
-                nonlocal token
-                auth = request.headers.get('authorization')
-                if auth and DIGITAL_API_HOST in request.url:
-                    token = auth
-
-            page.on("request", request_handler)
-
-            print(f"Navigating to {BASE_URL}...")
-            # increased timeout to 90s for slower CI runners
-            page.goto(BASE_URL, wait_until="networkidle", timeout=90000)
-            
-            # 4. Human-like behavior: Move mouse slightly to prove we aren't a script
+def _fetch_token_from_url(url: str) -> str | None:
+    import requests
+    try:
+        resp = requests.get(url, timeout=30)
+        resp.raise_for_status()
+        return resp.json().get("token")
+    except Exception as e:
+        print(f"Error fetching token from {url}: {e}")
+        return None
+
+
+def _capture_token(context) -> str | None:
+    """Open BASE_URL in `context` and return the first Digital API authorization header."""
+    page = context.new_page()
+    try:
+        print(f"Navigating to {BASE_URL}...")
+        with page.expect_request(
+            lambda r: DIGITAL_API_HOST in r.url and r.headers.get('authorization'),
+            timeout=TOKEN_CAPTURE_TIMEOUT_MS,
+        ) as request_info:
+            page.goto(BASE_URL, wait_until="commit", timeout=TOKEN_CAPTURE_TIMEOUT_MS)
+            # Human-like behavior: Move mouse slightly to prove we aren't a script
             page.mouse.move(100, 200)
             page.mouse.down()
             page.mouse.up()
-            
-            # Wait a moment for any lazy-loaded APIs
-            time.sleep(5)
+        print("SUCCESS! Token captured")
+        return request_info.value.headers.get('authorization')
+    except Exception as e:
+        print(f"Error capturing token: {e}")
+        try:
+            page.screenshot(path="debug_error.png")
+        except Exception:
+            pass
+        return None
+    finally:
+        page.close()
 
-            if token:
-                print("SUCCESS! Token captured")
-            else:
-                print("Failed to capture token. Taking screenshot...")
-                page.screenshot(path="debug_final.png")
 
-        except Exception as e:
-            print(f"Error capturing token: {e}")
-            try:
-                page.screenshot(path="debug_error.png")
-            except:
-                pass
+def _fetch_token_via_playwright() -> str | None:
+    """Cold path: launch a throwaway browser and capture one token."""
+    # Playwright is only imported when a browser is actually needed
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=True, args=BROWSER_ARGS)
+        try:
+            context = browser.new_context(
+                user_agent=BROWSER_USER_AGENT,
+                viewport={'width': 1920, 'height': 1080}
+            )
+            context.add_init_script(STEALTH_SCRIPT)
+            return _capture_token(context)
         finally:
             browser.close()
 
-        return token
 
-def get_bearer_token(force_refresh: bool = False) -> str:
-    # ... [Keep your existing get_bearer_token logic] ...
-    # Copy/paste the rest of your original function here
-    if not force_refresh:
-        token = _load_token()
-        if token and _token_valid(token):
-            return token
+class _WarmBrowser:
+    """A persistent Chromium context kept alive between token refreshes.
+
+    Playwright's sync API is bound to the thread that started it, so the
+    browser lives on its own thread and callers hand it work through a queue.
+    A capture that gets no answer within `timeout` seconds (the thread died
+    before taking it, or Playwright hung) raises TimeoutError.
+    """
 
-    token = _fetch_token_via_playwright()
-    if token:
+    def __init__(self, profile_dir: Path = BROWSER_PROFILE_DIR, timeout: float = TOKEN_CAPTURE_TIMEOUT_MS / 1000 + 30):
+        self.profile_dir = profile_dir
+        self.timeout = timeout
+        self._jobs = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def capture(self) -> str | None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="warm-browser", daemon=True)
+                self._thread.start()
+        fut = Future()
+        self._jobs.put(fut)
         try:
-            _save_token(token)
-        except Exception:
-            pass
+            return fut.result(timeout=self.timeout)
+        except FutureTimeout:
+            # still queued: the browser thread skips it if it ever gets there
+            fut.cancel()
+            raise TimeoutError(f"Browser gave no token within {self.timeout:.0f}s")
+
+    def _run(self):
+        fut = None
+        try:
+            # imported here so a missing Playwright fails the capture instead of the thread
+            from playwright.sync_api import sync_playwright
+
+            with sync_playwright() as p:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                context = p.chromium.launch_persistent_context(
+                    str(self.profile_dir),
+                    headless=True,
+                    args=BROWSER_ARGS,
+                    user_agent=BROWSER_USER_AGENT,
+                    viewport={'width': 1920, 'height': 1080},
+                )
+                context.add_init_script(STEALTH_SCRIPT)
+                try:
+                    while True:
+                        fut = self._jobs.get()
+                        if fut is None:
+                            return
+                        if not fut.set_running_or_notify_cancel():
+                            # the caller gave up waiting
+                            fut = None
+                            continue
+                        fut.set_result(_capture_token(context))
+                        fut = None
+                finally:
+                    context.close()
+        except Exception as e:
+            # the thread exits; the next capture() starts a fresh browser
+            print(f"Browser error: {e}")
+            if fut is None:
+                # failed before taking the waiting capture off the queue
+                try:
+                    fut = self._jobs.get_nowait()
+                except queue.Empty:
+                    pass
+            if fut is not None and not fut.done() and (fut.running() or fut.set_running_or_notify_cancel()):
+                fut.set_exception(e)
+
+    def close(self, timeout: float = 10):
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            self._jobs.put(None)
+            thread.join(timeout)
+
+
+TOKEN_REFRESHES = metrics.counter("finnkino_token_refreshes_total", "Bearer token captures per source and result")
+
+
+class TokenProvider:
+    """Hands out the bearer token, refreshing it at most once at a time.
+
+    Concurrent callers that need a refresh wait on the same in-flight capture,
+    and an optional background thread renews the token before its JWT `exp`.
+    Set `source` to a callable returning a token to take tokens from elsewhere
+    (e.g. a shard coordinator) instead of capturing them.
+    """
+
+    def __init__(self, refresh_margin: int = TOKEN_REFRESH_MARGIN):
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._lock = threading.Lock()
+        self._inflight = None
+        self._browser = _WarmBrowser()
+        self._stop = threading.Event()
+        self._refresher = None
+        self.source = None
+
+    def get(self, force_refresh: bool = False) -> str:
+        if not force_refresh:
+            token = self._token or _load_token()
+            if token and _token_valid(token):
+                self._token = token
+                return token
+        return self.refresh(stale=self._token if force_refresh else None)
+
+    def refresh(self, stale: str | None = None) -> str:
+        """Capture a new token. If `stale` was already replaced, return the replacement."""
+        with self._lock:
+            if stale is not None and self._token and self._token != stale:
+                return self._token
+            fut = self._inflight
+            owner = fut is None
+            if owner:
+                fut = self._inflight = Future()
+        if not owner:
+            return fut.result()
+
+        seen = stale if stale is not None else self._token or _load_token()
+        try:
+            # one capture at a time across processes sharing the token file
+            with locked(TOKEN_FILE):
+                token = _load_token()
+                if token and token != seen and _token_valid(token):
+                    print("Using the token another process just refreshed")
+                else:
+                    token = self._capture()
+                    if token:
+                        try:
+                            _save_token(token)
+                        except Exception:
+                            pass
+                    else:
+                        token = _load_token()
+            if not token:
+                raise RuntimeError("Unable to obtain bearer token")
+            self._token = token
+            fut.set_result(token)
+            return token
+        except Exception as e:
+            fut.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight = None
+
+    def _capture(self) -> str | None:
+        started = time.monotonic()
+        with metrics.span("token_refresh"):
+            if self.source is not None:
+                token = self.source()
+                source = "shared"
+            elif TOKEN_URL:
+                token = _fetch_token_from_url(TOKEN_URL)
+                source = "url"
+            else:
+                try:
+                    token = self._browser.capture()
+                    source = "warm"
+                except Exception as e:
+                    print(f"Warm browser failed ({e}), capturing with a fresh one")
+                    token = _fetch_token_via_playwright()
+                    source = "cold"
+        TOKEN_REFRESHES.inc(source=source, result="ok" if token else "failed")
+        print(f"Token refresh took {time.monotonic() - started:.1f}s")
         return token
 
-    cached = _load_token()
-    if cached:
-        return cached
+    def start_background_refresh(self):
+        """Renew the token `refresh_margin` seconds before it expires."""
+        if self._refresher is not None and self._refresher.is_alive():
+            return
+        self._stop.clear()
+        self._refresher = threading.Thread(target=self._refresh_loop, name="token-refresh", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while not self._stop.is_set():
+            token = self._token or _load_token()
+            exp = _token_exp(token) if token else None
+            if token is None:
+                # nothing to renew yet; callers fetch the first token on demand
+                self._stop.wait(30)
+                continue
+            if exp is None:
+                wait = self.refresh_margin
+            else:
+                # never spin, even if the server hands out very short-lived tokens
+                wait = max(exp - self.refresh_margin - time.time(), 30)
+            if wait and self._stop.wait(wait):
+                return
+            try:
+                self.refresh(stale=token)
+            except Exception as e:
+                print(f"Background token refresh failed: {e}")
+                self._stop.wait(60)
 
-    raise RuntimeError("Unable to obtain bearer token")
+    def close(self):
+        self._stop.set()
+        self._browser.close()
+
+
+_provider = None
+_provider_lock = threading.Lock()
+
+
+def get_provider() -> TokenProvider:
+    global _provider
+    if _provider is None:
+        with _provider_lock:
+            if _provider is None:
+                _provider = TokenProvider()
+                atexit.register(_provider.close)
+    return _provider
+
+
+def get_bearer_token(force_refresh: bool = False) -> str:
+    return get_provider().get(force_refresh=force_refresh)
@@ -0,0 +1,86 @@
+"""Compare requests/sec of one-shot requests.get calls against the pooled client.
+
+Runs against a local mock server so no traffic reaches finnkino.fi:
+
+    python3 scraper/bench_http_client.py --requests 500 --workers 8
+"""
+import argparse
+import gzip
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import requests
+
+from http_client import HttpClient
+
+
+PAYLOAD = gzip.compress(json.dumps({
+    "showtimes": [{"id": str(i), "filmId": "HO1", "screenId": "1", "schedule": {"startsAt": "2026-01-02T12:00:00+02:00"}} for i in range(50)],
+    "relatedData": {"films": [], "screens": [], "attributes": []},
+}).encode("utf-8"))
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # seconds of delay per new connection, standing in for the TCP+TLS handshake
+    handshake_delay = 0.0
+
+    def setup(self):
+        super().setup()
+        # avoid Nagle/delayed-ACK stalls on reused connections
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self.handshake_delay:
+            time.sleep(self.handshake_delay)
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(PAYLOAD)))
+        self.end_headers()
+        self.wfile.write(PAYLOAD)
+
+    def log_message(self, *args):
+        pass
+
+
+def _run(label, get, url, n, workers):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda _: get(url).status_code, range(n)))
+    elapsed = time.perf_counter() - started
+    ok = sum(1 for r in results if r == 200)
+    print(f"{label:<22} {ok}/{n} ok  {elapsed:6.2f}s  {n / elapsed:8.1f} req/s")
+    return n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pooled HTTP client against a local mock server")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--handshake-ms", type=float, default=30.0,
+                        help="Delay per new connection, simulating TLS setup to a remote host (default 30)")
+    args = parser.parse_args()
+
+    _MockHandler.handshake_delay = args.handshake_ms / 1000
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _MockHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/showtimes/by-business-date/2026-01-02?siteIds=1004"
+
+    try:
+        before = _run("requests.get (no pool)", lambda u: requests.get(u, timeout=30), url, args.requests, args.workers)
+        client = HttpClient(pool_size=args.workers)
+        after = _run("HttpClient (pooled)", lambda u: client.get(u), url, args.requests, args.workers)
+        client.close()
+        print(f"speedup: {after / before:.2f}x")
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""Benchmark whole scrape runs against the local mock Finnkino API.
+
+Each scenario runs the real scripts in a subprocess, inside a scratch copy of
+this directory whose data/ is reset before every repeat, so nothing touches
+finnkino.fi or the real data directory:
+
+- week:  weekly_showtime_scrape.py for one Friday -> Thursday week
+- seats: seat_availability_scraper.py all <date> --include-started (sweep of every show)
+- parse: schedule_parse.py over --history-days of stored showtimes
+
+For each scenario the median over --repeat runs of wall time, requests/sec,
+peak RSS of the child and bytes written is reported, and --out saves the
+results as JSON (with the git commit) for comparison across commits:
+
+    python3 scraper/bench_scrape.py --sites 200 --latency-ms 30 --out bench.json
+"""
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import mock_finnkino
+
+
+HERE = Path(__file__).parent
+WEEK_START = "2026-01-02"  # a Friday; fixed so payloads are identical between runs
+SCENARIOS = ("week", "seats", "parse")
+
+
+def _tree_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Workspace:
+    """A scratch copy of the scraper sources with a resettable data/ dir."""
+
+    def __init__(self, root: Path, server: mock_finnkino.MockServer):
+        self.root = root
+        self.src = root / "scraper"
+        self.data = self.src / "data"
+        self.history = root / "history"
+        self.server = server
+        self.src.mkdir(parents=True)
+        for p in HERE.glob("*.py"):
+            shutil.copy2(p, self.src / p.name)
+
+    def reset(self):
+        shutil.rmtree(self.data, ignore_errors=True)
+        self.data.mkdir()
+        (self.data / "cinemas.json").write_text(json.dumps(mock_finnkino.cinemas(self.server.settings)), encoding="utf-8")
+        token = "Bearer " + mock_finnkino.make_token(self.server.settings.token_ttl)
+        (self.data / "bearer_token.json").write_text(json.dumps({"token": token}), encoding="utf-8")
+
+    def seeded_size(self) -> int:
+        return _tree_size(self.data)
+
+    def write_history(self, days: int):
+        """Stored showtimes for `days` days of every site, in the data/<year>/week_NN layout."""
+        shutil.rmtree(self.history, ignore_errors=True)
+        settings = self.server.settings
+        start = date.fromisoformat(WEEK_START) - timedelta(days=days)
+        for n in range(days):
+            d = start + timedelta(days=n)
+            year, week, _ = d.isocalendar()
+            out_dir = self.history / str(year) / f"week_{week:02d}"
+            out_dir.mkdir(parents=True, exist_ok=True)
+            for site_id in settings.site_ids():
+                payload = mock_finnkino.showtimes_payload(settings, site_id, d.isoformat())
+                (out_dir / f"showtimes_{site_id}_{d.isoformat()}.json").write_text(
+                    json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    def command(self, scenario: str, args) -> list[str]:
+        py = [sys.executable]
+        if scenario == "week":
+            cmd = py + [str(self.src / "weekly_showtime_scrape.py"), "--start", WEEK_START]
+        elif scenario == "seats":
+            # WEEK_START is in the past, so every show has "started"; sweep them all anyway
+            cmd = py + [str(self.src / "seat_availability_scraper.py"), "all", WEEK_START, "--include-started"]
+        elif scenario == "parse":
+            return py + [str(self.src / "schedule_parse.py"), "-i", str(self.history), "-f", "jsonl",
+                         "-o", str(self.data / "schedule.jsonl")]
+        else:
+            raise ValueError(scenario)
+        if args.concurrency:
+            cmd += ["--concurrency", str(args.concurrency)]
+        if args.rate:
+            cmd += ["--rate", str(args.rate)]
+        return cmd
+
+    def run(self, scenario: str, args) -> dict:
+        self.reset()
+        if scenario == "seats":
+            # the sweep reads show ids from stored showtimes; fetch them outside the measurement
+            self._exec(self.command("week", args), args.verbose)
+        seeded = self.seeded_size()
+        before = self.server.snapshot()
+        started = time.perf_counter()
+        returncode, peak_rss = self._exec(self.command(scenario, args), args.verbose)
+        wall = time.perf_counter() - started
+        after = self.server.snapshot()
+        requests = after["requests"] - before["requests"]
+        statuses = {s: n - before["status"].get(s, 0) for s, n in after["status"].items() if n - before["status"].get(s, 0)}
+        return {
+            "returncode": returncode,
+            "wall_seconds": round(wall, 3),
+            "requests": requests,
+            "requests_per_second": round(requests / wall, 1) if wall else 0.0,
+            "statuses": statuses,
+            "peak_rss_mb": round(peak_rss / 1024, 1),
+            "bytes_written": self.seeded_size() - seeded,
+        }
+
+    def _exec(self, cmd, verbose: bool):
+        env = {**os.environ, **self.server.env(), "PYTHONHASHSEED": "0"}
+        out = None if verbose else subprocess.DEVNULL
+        proc = subprocess.Popen(cmd, cwd=self.src, env=env, stdout=out, stderr=out)
+        # wait4 reports the child's own peak RSS (KiB on Linux)
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        return proc.returncode, usage.ru_maxrss
+
+
+def _median(runs: list[dict]) -> dict:
+    out = {}
+    for key in ("wall_seconds", "requests", "requests_per_second", "peak_rss_mb", "bytes_written"):
+        out[key] = statistics.median(r[key] for r in runs)
+    out["failed_runs"] = sum(1 for r in runs if r["returncode"] != 0)
+    out["statuses"] = runs[-1]["statuses"]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scrape runs against a local mock Finnkino API")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Scenario to run (repeatable; default all)")
+    parser.add_argument("--sites", type=int, default=17, help="Number of cinemas the mock serves")
+    parser.add_argument("--shows-per-site", type=int, default=30)
+    parser.add_argument("--history-days", type=int, default=28, help="Days of stored showtimes for the parse scenario")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Mock-side requests/sec before 429s")
+    parser.add_argument("--token-ttl", type=float, default=3600.0, help="Mock token lifetime; short values exercise 401 refresh")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Fraction of seat requests answered with 403")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--out", default=None, help="Write results as JSON to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory")
+    parser.add_argument("--verbose", action="store_true", help="Show the scripts' output")
+    args = parser.parse_args()
+
+    settings = mock_finnkino.MockSettings(
+        sites=args.sites, shows_per_site=args.shows_per_site, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        rate_limit=args.rate_limit, token_ttl=args.token_ttl, block_rate=args.block_rate,
+    )
+    server = mock_finnkino.start(settings)
+    root = Path(tempfile.mkdtemp(prefix="finnkino-bench-"))
+    results = {}
+    try:
+        ws = Workspace(root, server)
+        scenarios = args.scenario or list(SCENARIOS)
+        if "parse" in scenarios:
+            ws.write_history(args.history_days)
+        for scenario in scenarios:
+            runs = [ws.run(scenario, args) for _ in range(args.repeat)]
+            results[scenario] = {"median": _median(runs), "runs": runs}
+            m = results[scenario]["median"]
+            print(f"{scenario:<6} {m['wall_seconds']:8.2f}s  {m['requests']:7.0f} req  {m['requests_per_second']:8.1f} req/s  "
+                  f"{m['peak_rss_mb']:7.1f} MiB RSS  {m['bytes_written'] / 1e6:8.2f} MB written"
+                  + (f"  ({m['failed_runs']} failed runs)" if m["failed_runs"] else ""))
+    finally:
+        server.shutdown()
+        if args.keep:
+            print(f"Scratch directory kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    if args.out:
+        report = {
+            "commit": _git_commit(),
+            "python": sys.version.split()[0],
+            "settings": {k: v for k, v in vars(args).items() if k not in ("out", "keep", "verbose")},
+            "results": results,
+        }
+        Path(args.out).write_text(json.dumps(report, indent=2), encoding="utf-8")
+        print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""One entry point for the scrapers, the parser and the reference data.
+
+    python3 scraper/cli.py scrape week [--start 2026-01-02] [--incremental] [--batch]
+    python3 scraper/cli.py scrape day [--date 2026-01-02]
+    python3 scraper/cli.py scrape site 1004 [--date 2026-01-02]
+    python3 scraper/cli.py scrape seats all 2026-01-02
+    python3 scraper/cli.py parse -i scraper/data/2026/week_01 -f csv
+    python3 scraper/cli.py refresh-token
+    python3 scraper/cli.py refs show films
+    python3 scraper/cli.py shard work --partition 0
+
+Every command imports its modules only when it runs, so `parse`, `refs` and
+runs with a cached token never load Playwright, and `parse` does not load the
+HTTP stack either. `scrape week`, `scrape seats`, `parse` and `refs` take the
+same options as the scripts they wrap (weekly_showtime_scrape.py,
+seat_availability_scraper.py, schedule_parse.py, reference_data.py,
+shard.py).
+"""
+import argparse
+import sys
+
+
+def _scrape_week(args, rest):
+    from weekly_showtime_scrape import main
+    main(rest)
+
+
+def _scrape_day(args, rest):
+    import datetime
+    from async_scrape import scrape_showtimes
+    from bearer_token import get_bearer_token
+    from data_paths import load_keys
+
+    date = args.date or datetime.date.today().isoformat()
+    keys = load_keys()
+    print(f"Fetching showtimes for {date} ({len(keys)} cinemas)")
+    scrape_showtimes(get_bearer_token(), keys, [date], concurrency=args.concurrency, rate=args.rate)
+
+
+def _scrape_site(args, rest):
+    from single_theater_showtime_scrape import fetch_showtimes_for_key
+    fetch_showtimes_for_key(args.site_id, date=args.date, token=args.token)
+
+
+def _scrape_seats(args, rest):
+    from seat_availability_scraper import main
+    main(rest)
+
+
+def _parse(args, rest):
+    from schedule_parse import main
+    main(rest)
+
+
+def _refresh_token(args, rest):
+    import time
+    from bearer_token import get_provider, _token_exp
+
+    token = get_provider().refresh()
+    exp = _token_exp(token)
+    print("Token refreshed" + (f", expires {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(exp))}" if exp else ""))
+
+
+def _refs(args, rest):
+    from reference_data import main
+    main(rest)
+
+
+def _shard(args, rest):
+    from shard import main
+    main(rest)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="cli.py", description="Finnkino scraper")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    scrape = sub.add_parser("scrape", help="Fetch showtimes or seat availability")
+    kinds = scrape.add_subparsers(dest="kind", required=True)
+    # these wrap a script's own parser, which also handles --help
+    kinds.add_parser("week", add_help=False, help="Friday->Thursday week for all cinemas").set_defaults(run=_scrape_week)
+    kinds.add_parser("seats", add_help=False, help="Seat maps for a site (or 'all') and date").set_defaults(run=_scrape_seats)
+    p = kinds.add_parser("day", help="One date for all cinemas")
+    p.add_argument("--date", default=None, help="Date (YYYY-MM-DD). Defaults to today")
+    p.add_argument("--concurrency", type=int, default=None)
+    p.add_argument("--rate", type=float, default=None)
+    p.set_defaults(run=_scrape_day)
+    p = kinds.add_parser("site", help="One cinema and date")
+    p.add_argument("site_id", help="Cinema site key (e.g. '1004')")
+    p.add_argument("--date", default=None, help="Date (YYYY-MM-DD). Defaults to today")
+    p.add_argument("--token", default=None, help="Bearer token to reuse")
+    p.set_defaults(run=_scrape_site)
+
+    sub.add_parser("parse", add_help=False, help="Parse stored showtimes (see schedule_parse.py)").set_defaults(run=_parse)
+    sub.add_parser("refresh-token", help="Capture a new bearer token now").set_defaults(run=_refresh_token)
+    sub.add_parser("refs", add_help=False, help="Fetch or query reference data (see reference_data.py)").set_defaults(run=_refs)
+    sub.add_parser("shard", add_help=False, help="Sharded coordinator/worker scraping (see shard.py)").set_defaults(run=_shard)
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    args, rest = build_parser().parse_known_args(argv)
+    wraps = args.run in (_scrape_week, _scrape_seats, _parse, _refs, _shard)
+    if rest and not wraps:
+        build_parser().error(f"unrecognized arguments: {' '.join(rest)}")
+    args.run(args, rest)
+
+
+if __name__ == "__main__":
+    main()
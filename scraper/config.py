@@ -65,3 +65,145 @@ DEFAULT_USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko)"
     " Chrome/119.0.0.0 Safari/537.36"
 )
+
+# Async scrape engine
+MAX_CONCURRENCY = int(os.getenv("FINNKINO_MAX_CONCURRENCY", "8"))
+# per host. A full week (one request per cinema and day, ~120) takes about
+# 6 s at 20/s; 429s halve a host's rate until it recovers. Lower this to be
+# gentler on the site at the cost of wall time (5/s: ~25 s).
+REQUESTS_PER_SECOND = float(os.getenv("FINNKINO_REQUESTS_PER_SECOND", "20"))
+RATE_BURST = int(os.getenv("FINNKINO_RATE_BURST", "10"))
+
+# Shared HTTP client
+HTTP_POOL_SIZE = int(os.getenv("FINNKINO_HTTP_POOL_SIZE", "32"))
+HTTP_TIMEOUT = float(os.getenv("FINNKINO_HTTP_TIMEOUT", "30"))
+HTTP2_ENABLED = os.getenv("FINNKINO_HTTP2", "1") != "0"
+
+# Bearer token provider
+TOKEN_REFRESH_MARGIN = int(os.getenv("FINNKINO_TOKEN_REFRESH_MARGIN", "300"))
+TOKEN_CAPTURE_TIMEOUT_MS = int(os.getenv("FINNKINO_TOKEN_CAPTURE_TIMEOUT_MS", "90000"))
+# fetch {"token": ...} from this URL instead of capturing it in a browser (e.g. mock_finnkino.py)
+TOKEN_URL = os.getenv("FINNKINO_TOKEN_URL", "")
+
+# HTTP response cache: (url substring, ttl seconds). None = never cache.
+# First match wins; urls matching nothing are not cached.
+# Showtimes bodies are already saved as artifacts, so they are only cached
+# when FINNKINO_CACHE_TTL_SHOWTIMES is set.
+_SHOWTIMES_TTL = os.getenv("FINNKINO_CACHE_TTL_SHOWTIMES", "")
+HTTP_CACHE_TTLS = [
+    ("/seat-availability", None),
+    ("/showtimes/by-business-date/", int(_SHOWTIMES_TTL) if _SHOWTIMES_TTL else None),
+    (CINEMAS_LIST, 86400),
+    ("/pageList?friendly=/teatterit/", 86400),
+    (THEATERS_LIST_DIGITAL_API, 86400),
+    (FILM_GENRES, 86400),
+    (CINEMA_FEATURE, 86400),
+    (FILMS_LIST, 3600),
+]
+HTTP_CACHE_ENABLED = os.getenv("FINNKINO_HTTP_CACHE", "1") != "0"
+HTTP_CACHE_MAX_BYTES = int(os.getenv("FINNKINO_HTTP_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("FINNKINO_HTTP_CACHE_MAX_ENTRIES", "20000"))
+
+# Incremental scrape freshness: (max days ahead, max age in seconds).
+# A (site, date) is refetched once its last fetch is older than the age
+# for the first row whose days-ahead bound it falls under.
+FRESHNESS_POLICY = [
+    (0, 3600),
+    (2, 3 * 3600),
+    (6, 6 * 3600),
+    (None, 12 * 3600),
+]
+
+# Where showtime payloads are stored: "json" (one file per site/date),
+# "sqlite" (data/showtimes.sqlite, see showtime_store.py) or "both".
+SHOWTIME_STORE = os.getenv("FINNKINO_SHOWTIME_STORE", "json")
+
+# Where seat maps are stored: "files" (one JSON per poll), "series"
+# (base map plus per-poll deltas, see seat_snapshots.py) or "both".
+SEAT_STORE = os.getenv("FINNKINO_SEAT_STORE", "files")
+# seat sweeps only fetch shows starting within this many hours; 0 means no limit
+SEAT_SWEEP_WINDOW_HOURS = float(os.getenv("FINNKINO_SEAT_SWEEP_WINDOW_HOURS", "0"))
+
+# Artifact files (artifact_writer.py) are always written to a temporary name
+# and renamed into place.
+# Compress showtimes and per-poll seat files: "" (plain .json), "gzip"
+# (.json.gz) or "zstd" (.json.zst, needs zstandard). Readers accept all forms.
+ARTIFACT_COMPRESSION = os.getenv("FINNKINO_ARTIFACT_COMPRESSION", "")
+# 0 uses the codec's default level
+ARTIFACT_COMPRESSION_LEVEL = int(os.getenv("FINNKINO_ARTIFACT_COMPRESSION_LEVEL", "0"))
+# fsync artifacts and their directory on write (survives power loss, costs latency)
+ARTIFACT_FSYNC = os.getenv("FINNKINO_ARTIFACT_FSYNC", "0") == "1"
+
+# Change feed (showtime_changes.py): every saved showtimes payload is diffed
+# by show id against the previous one and the changes appended to
+# data/changes/<date>.jsonl; off by default, 1 turns it on
+CHANGE_FEED = os.getenv("FINNKINO_CHANGE_FEED", "0") == "1"
+
+# Multi-site showtimes: /showtimes/by-business-date/{date}?siteIds=A&siteIds=B...
+THEATER_SHOWTIMES_BY_DATE = (
+    DIGITAL_API_HOST +
+    "/showtimes/by-business-date/{date}"
+)
+SHOWTIMES_BATCH_SIZE = int(os.getenv("FINNKINO_SHOWTIMES_BATCH_SIZE", "20"))
+SHOWTIMES_BATCH_MAX = int(os.getenv("FINNKINO_SHOWTIMES_BATCH_MAX", "50"))
+# Batches shrink when a response is slower or larger than this, and grow when well under
+SHOWTIMES_BATCH_TARGET_SECONDS = float(os.getenv("FINNKINO_SHOWTIMES_BATCH_TARGET_SECONDS", "3"))
+SHOWTIMES_BATCH_TARGET_BYTES = int(os.getenv("FINNKINO_SHOWTIMES_BATCH_TARGET_BYTES", str(4 * 1024 * 1024)))
+
+# Staged pipeline (pipeline.py)
+PIPELINE_QUEUE_SIZE = int(os.getenv("FINNKINO_PIPELINE_QUEUE_SIZE", "64"))
+PIPELINE_WRITE_BATCH = int(os.getenv("FINNKINO_PIPELINE_WRITE_BATCH", "64"))
+PIPELINE_PARSE_WORKERS = int(os.getenv("FINNKINO_PIPELINE_PARSE_WORKERS", "0")) or None
+
+# Scheduler daemon (daemon.py)
+DAEMON_DAYS_AHEAD = int(os.getenv("FINNKINO_DAEMON_DAYS_AHEAD", "7"))
+DAEMON_MAX_JOBS_PER_TICK = int(os.getenv("FINNKINO_DAEMON_MAX_JOBS_PER_TICK", "200"))
+# Seat polling: (minutes before showtime, poll interval in seconds). Polling
+# speeds up as the show approaches and stops once it has started.
+SEAT_POLL_POLICY = [
+    (30, 120),
+    (120, 300),
+    (360, 900),
+    (1440, 3600),
+    (None, 4 * 3600),
+]
+
+# Retries, backoff and circuit breaking (retry_policy.py)
+RETRY_MAX_ATTEMPTS = int(os.getenv("FINNKINO_RETRY_MAX_ATTEMPTS", "5"))
+RETRY_BASE_DELAY = float(os.getenv("FINNKINO_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("FINNKINO_RETRY_MAX_DELAY", "60"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# retries may add at most this fraction on top of the requests made
+RETRY_BUDGET_RATIO = float(os.getenv("FINNKINO_RETRY_BUDGET_RATIO", "0.2"))
+RETRY_BUDGET_MIN_PER_SECOND = float(os.getenv("FINNKINO_RETRY_BUDGET_MIN_PER_SECOND", "1"))
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("FINNKINO_CIRCUIT_FAILURE_THRESHOLD", "10"))
+CIRCUIT_RESET_SECONDS = float(os.getenv("FINNKINO_CIRCUIT_RESET_SECONDS", "30"))
+
+# Metrics and tracing (metrics.py)
+METRICS_ENABLED = os.getenv("FINNKINO_METRICS", "1") != "0"
+# defaults to data/metrics
+METRICS_DIR = os.getenv("FINNKINO_METRICS_DIR", "")
+# append one JSON line per finished span to this file; empty disables tracing
+METRICS_TRACE_FILE = os.getenv("FINNKINO_METRICS_TRACE", "")
+
+# Reference data catalog (reference_data.py)
+REFERENCE_TTL = int(os.getenv("FINNKINO_REFERENCE_TTL", "3600"))
+# learn films, screens and attributes from the relatedData of every saved showtimes payload
+REFERENCE_ABSORB = os.getenv("FINNKINO_REFERENCE_ABSORB", "1") == "1"
+
+# JSON handling (json_stream.py)
+# "auto" uses orjson when installed, "json" forces the standard library
+JSON_BACKEND = os.getenv("FINNKINO_JSON_BACKEND", "auto")
+# responses are stored byte-for-byte as received; 1 re-indents them first
+PRETTY_JSON = os.getenv("FINNKINO_PRETTY_JSON", "0") == "1"
+
+# Sharded scraping (work_queue.py, shard.py)
+# sqlite:///path/to/queue.sqlite (default data/work_queue.sqlite) or redis://host:port/db
+QUEUE_URL = os.getenv("FINNKINO_QUEUE_URL", "")
+# a leased unit is delivered again if its worker has not acked it within this time
+QUEUE_LEASE_SECONDS = float(os.getenv("FINNKINO_QUEUE_LEASE_SECONDS", "120"))
+QUEUE_MAX_ATTEMPTS = int(os.getenv("FINNKINO_QUEUE_MAX_ATTEMPTS", "5"))
+# units are spread over this many partitions by site; workers may serve a subset
+SHARD_PARTITIONS = int(os.getenv("FINNKINO_SHARD_PARTITIONS", "1"))
+# how long a worker waits for the coordinator to publish a fresh token after a 401
+SHARD_TOKEN_WAIT = float(os.getenv("FINNKINO_SHARD_TOKEN_WAIT", "60"))
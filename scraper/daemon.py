@@ -0,0 +1,244 @@
+"""Long-running scrape scheduler.
+
+Keeps the bearer token, HTTP connection pool and caches warm in one
+process instead of cron starting a fresh script for every run. Two kinds
+of jobs live in a persistent schedule (data/daemon_schedule.sqlite):
+
+- showtimes per (site, date) over a rolling window, refreshed on the
+  config.FRESHNESS_POLICY ages;
+- seat availability per show, polled on config.SEAT_POLL_POLICY, more
+  often as the show approaches, and dropped once it has started.
+
+The schedule survives restarts; on start the daemon picks up where it left.
+"""
+import asyncio
+import signal
+import sqlite3
+import time
+from datetime import date as Date, datetime, timedelta
+
+from config import SEAT_AVAILABILITY, SEAT_POLL_POLICY, DAEMON_DAYS_AHEAD, DAEMON_MAX_JOBS_PER_TICK
+from data_paths import DATA_DIR
+from scrape_manifest import ScrapeManifest, max_age_for
+import metrics
+
+
+SCHEDULE_FILE = DATA_DIR / "daemon_schedule.sqlite"
+
+# how often the rolling window of showtime jobs is re-planned
+PLAN_INTERVAL = 3600
+# longest idle sleep, so signals and new plans are picked up promptly
+MAX_SLEEP = 30
+
+
+def seat_poll_interval(seconds_to_start: float, policy=SEAT_POLL_POLICY) -> float:
+    minutes = seconds_to_start / 60
+    for bound, interval in policy:
+        if bound is None or minutes <= bound:
+            return interval
+    return policy[-1][1]
+
+
+class Schedule:
+    def __init__(self, path=SCHEDULE_FILE):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                site_id TEXT,
+                date TEXT,
+                show_id TEXT,
+                starts_at REAL,
+                next_run REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_next_run ON jobs (next_run);
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value REAL);
+        """)
+
+    def add(self, key, kind, next_run, site_id=None, date=None, show_id=None, starts_at=None):
+        """Insert a job, keeping the existing next_run if it is already scheduled."""
+        with self.db:
+            self.db.execute(
+                "INSERT INTO jobs (key, kind, site_id, date, show_id, starts_at, next_run) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET starts_at = excluded.starts_at",
+                (key, kind, site_id, date, show_id, starts_at, next_run),
+            )
+
+    def due(self, now: float, limit: int):
+        return self.db.execute(
+            "SELECT key, kind, site_id, date, show_id, starts_at FROM jobs WHERE next_run <= ? ORDER BY next_run LIMIT ?",
+            (now, limit),
+        ).fetchall()
+
+    def next_run(self) -> float | None:
+        row = self.db.execute("SELECT MIN(next_run) FROM jobs").fetchone()
+        return row[0]
+
+    def reschedule(self, key: str, next_run: float):
+        with self.db:
+            self.db.execute("UPDATE jobs SET next_run = ? WHERE key = ?", (next_run, key))
+
+    def remove(self, key: str):
+        with self.db:
+            self.db.execute("DELETE FROM jobs WHERE key = ?", (key,))
+
+    def prune(self, today: str, now: float):
+        """Drop showtime jobs for past dates and seat jobs for started shows."""
+        with self.db:
+            self.db.execute("DELETE FROM jobs WHERE kind = 'showtimes' AND date < ?", (today,))
+            self.db.execute("DELETE FROM jobs WHERE kind = 'seats' AND starts_at IS NOT NULL AND starts_at <= ?", (now,))
+
+    def get_meta(self, name: str) -> float | None:
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, name: str, value: float):
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def counts(self) -> dict:
+        return dict(self.db.execute("SELECT kind, COUNT(*) FROM jobs GROUP BY kind").fetchall())
+
+
+class ScrapeDaemon:
+    def __init__(self, days_ahead: int = DAEMON_DAYS_AHEAD, seats: bool = True, token: str | None = None,
+                 concurrency: int | None = None, rate: float | None = None):
+        from async_scrape import ScrapeEngine
+        from bearer_token import get_bearer_token
+        from data_paths import load_keys
+
+        self.days_ahead = days_ahead
+        self.seats = seats
+        self.schedule = Schedule()
+        self.manifest = ScrapeManifest()
+        self.site_ids = [e["key"] for e in load_keys() if e.get("key")]
+        if token is None:
+            token = get_bearer_token()
+        self.engine = ScrapeEngine(token, concurrency=concurrency, rate=rate)
+        self._stop = asyncio.Event()
+
+    def plan(self, now: float):
+        today = Date.today()
+        self.schedule.prune(today.isoformat(), now)
+        for n in range(self.days_ahead):
+            d = (today + timedelta(n)).isoformat()
+            for site_id in self.site_ids:
+                # pairs fetched recently (e.g. before a restart) wait out their freshness age
+                next_run = now if self.manifest.is_due(site_id, d) else now + max_age_for(n)
+                self.schedule.add(f"showtimes|{site_id}|{d}", "showtimes", next_run, site_id=site_id, date=d)
+        self.schedule.set_meta("planned_at", now)
+        print(f"Planned {self.days_ahead} days x {len(self.site_ids)} sites; jobs: {self.schedule.counts()}")
+
+    async def run_showtimes(self, key, site_id, date):
+        from seat_availability_scraper import get_show_ids_from_existing
+
+        await self.engine.fetch_showtimes({"key": site_id}, date, self.manifest)
+        days_ahead = (Date.fromisoformat(date) - Date.today()).days
+        self.schedule.reschedule(key, time.time() + max_age_for(days_ahead))
+        if not self.seats:
+            return
+        now = time.time()
+        # file I/O and JSON parsing; keep it off the loop the seat jobs run on
+        for show in await self.engine.in_executor(get_show_ids_from_existing, site_id, date):
+            try:
+                starts_at = datetime.fromisoformat(show["startsAt"]).timestamp()
+            except (TypeError, ValueError):
+                continue
+            if starts_at > now:
+                self.schedule.add(f"seats|{show['id']}", "seats", now, site_id=site_id, date=date,
+                                  show_id=show["id"], starts_at=starts_at)
+
+    async def run_seats(self, key, site_id, date, show_id, starts_at):
+        from seat_availability_scraper import _save_seat_availability
+
+        now = time.time()
+        if starts_at is not None and starts_at <= now:
+            self.schedule.remove(key)
+            return
+        try:
+            resp = await self.engine.fetch(SEAT_AVAILABILITY.format(show_id=show_id), headers={"Accept": "application/json"})
+            if resp.status_code == 200:
+                await self.engine.in_executor(_save_seat_availability, resp.content, show_id, date, site_id)
+            else:
+                print(f"Seat availability {show_id} returned HTTP {resp.status_code}")
+        except Exception as e:
+            print(f"Request error for seat availability {show_id}: {e}")
+        now = time.time()
+        if starts_at is None:
+            self.schedule.remove(key)
+            return
+        next_run = now + seat_poll_interval(starts_at - now)
+        if next_run >= starts_at:
+            # one last poll right before the show starts
+            next_run = max(now + 1, starts_at - 60)
+        self.schedule.reschedule(key, next_run)
+
+    async def tick(self):
+        now = time.time()
+        planned_at = self.schedule.get_meta("planned_at")
+        if planned_at is None or now - planned_at >= PLAN_INTERVAL:
+            self.plan(now)
+        jobs = self.schedule.due(now, DAEMON_MAX_JOBS_PER_TICK)
+        tasks = []
+        for key, kind, site_id, date, show_id, starts_at in jobs:
+            if kind == "showtimes":
+                tasks.append(self.run_showtimes(key, site_id, date))
+            else:
+                tasks.append(self.run_seats(key, site_id, date, show_id, starts_at))
+        await asyncio.gather(*tasks)
+        if any(kind == "showtimes" for _, kind, *_ in jobs):
+            self.manifest.save()
+        if jobs:
+            # keep the textfile current for node_exporter between runs
+            metrics.export_run("daemon", summary=False)
+        return len(jobs)
+
+    async def run(self, once: bool = False):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        print(f"Scrape daemon started; jobs: {self.schedule.counts()}")
+        while not self._stop.is_set():
+            ran = await self.tick()
+            if once:
+                break
+            if ran >= DAEMON_MAX_JOBS_PER_TICK:
+                continue
+            next_run = self.schedule.next_run()
+            sleep = MAX_SLEEP if next_run is None else min(MAX_SLEEP, max(0.0, next_run - time.time()))
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=sleep)
+            except asyncio.TimeoutError:
+                pass
+        print("Scrape daemon stopped")
+
+    def close(self):
+        self.engine.close()
+        metrics.export_run("daemon")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the continuous scrape scheduler")
+    parser.add_argument("--days", type=int, default=DAEMON_DAYS_AHEAD, help="Days ahead to keep showtimes fresh for")
+    parser.add_argument("--no-seats", action="store_true", help="Only refresh showtimes, do not poll seat availability")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--once", action="store_true", help="Run the jobs that are due now and exit")
+    args = parser.parse_args()
+
+    daemon = ScrapeDaemon(days_ahead=args.days, seats=not args.no_seats, concurrency=args.concurrency, rate=args.rate)
+    try:
+        asyncio.run(daemon.run(once=args.once))
+    finally:
+        daemon.close()
+
+
+if __name__ == "__main__":
+    main()
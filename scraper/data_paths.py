@@ -0,0 +1,66 @@
+"""Where scraped artifacts live under data/<year>/week_NN/.
+
+The path of every artifact follows from its date, so lookups never need to
+walk the data tree.
+"""
+import datetime
+import json
+from pathlib import Path
+
+
+DATA_DIR = Path(__file__).parent / "data"
+CINEMAS_FILE = DATA_DIR / "cinemas.json"
+
+# path -> (mtime_ns, parsed cinema list)
+_keys_cache: dict = {}
+
+
+def parse_date(date: str | None) -> datetime.date:
+    """Parse YYYY-MM-DD or D.M.YYYY, falling back to today."""
+    if date is None:
+        return datetime.date.today()
+    try:
+        return datetime.date.fromisoformat(date)
+    except Exception:
+        try:
+            parts = date.split('.')
+            if len(parts) == 3:
+                d = int(parts[0])
+                m = int(parts[1])
+                y = int(parts[2])
+                return datetime.date(y, m, d)
+        except Exception:
+            pass
+    return datetime.date.today()
+
+
+def week_dir(date: str | None, create: bool = False) -> Path:
+    iso_year, iso_week, _ = parse_date(date).isocalendar()
+    path = DATA_DIR / str(iso_year) / f"week_{iso_week:02d}"
+    if create:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def showtimes_path(site_id: str, date: str, create: bool = False) -> Path:
+    return week_dir(date, create) / f"showtimes_{site_id}_{date}.json"
+
+
+def seat_availability_dir(date: str, create: bool = False) -> Path:
+    path = week_dir(date) / "seat_availability"
+    if create:
+        path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def load_keys(path: str | None = None) -> list:
+    """Return the cinema list ({"key": site id, "value": name} entries) from cinemas.json.
+
+    The parsed list is cached per process until the file changes.
+    """
+    p = Path(path) if path else CINEMAS_FILE
+    mtime = p.stat().st_mtime_ns
+    cached = _keys_cache.get(p)
+    if cached is None or cached[0] != mtime:
+        cached = _keys_cache[p] = (mtime, json.loads(p.read_bytes()))
+    return cached[1]
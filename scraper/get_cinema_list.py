@@ -1,53 +1,65 @@
-import json
 from pathlib import Path
-from config import CINEMAS_LIST
-import urllib.error
+from config import CINEMAS_LIST, RETRY_MAX_ATTEMPTS
+from http_client import get_client
+from json_stream import encode_payload, loads
+from artifact_writer import atomic_write
+from retry_policy import get_policy
 import time
 import ua_generator
 
-from urllib.request import Request, urlopen
+OUT_PATH = Path(__file__).parent / "data" / "cinemas.json"
 
 def get_page_content(url, head):
-  req = Request(url, headers=head)
-  return urlopen(req)
+  return get_client().get(url, headers=head, cache=True)
 
-attempt = 0
-data = None
-while True:
-  attempt += 1
-  ua = ua_generator.generate()
-  head = {
-    'User-Agent': ua.text,
-    'Accept': 'text/html',
-  }
-  try:
-    print(f"Attempt {attempt}: fetching with User-Agent: {ua.text}")
-    resp = get_page_content(CINEMAS_LIST, head)
-    data = resp.read()
-    break
-  except urllib.error.HTTPError as e:
-    if e.code == 403:
+def fetch_cinema_list_bytes():
+  # the client already retries timeouts, 429 and 5xx; this loop only handles
+  # bot blocks (403) with a fresh User-Agent, and gives up after a few attempts
+  policy = get_policy()
+  for attempt in range(1, RETRY_MAX_ATTEMPTS + 1):
+    ua = ua_generator.generate()
+    head = {
+      'User-Agent': ua.text,
+      'Accept': 'text/html',
+    }
+    try:
+      print(f"Attempt {attempt}: fetching with User-Agent: {ua.text}")
+      resp = get_page_content(CINEMAS_LIST, head)
+    except Exception as e:
+      print(f"Attempt {attempt} encountered error: {e}; retrying")
+      time.sleep(policy.backoff(attempt))
+      continue
+    if resp.status_code == 403:
       print(f"Attempt {attempt} got 403 Forbidden — generating new User-Agent and retrying")
-      time.sleep(1)
+      time.sleep(policy.backoff(attempt))
       continue
-    else:
-      raise
-  except Exception as e:
-    print(f"Attempt {attempt} encountered error: {e}; retrying")
-    time.sleep(1)
-    continue
+    resp.raise_for_status()
+    return resp.content
+  raise RuntimeError(f"Could not fetch the cinema list after {RETRY_MAX_ATTEMPTS} attempts")
+
+def save_cinema_list(data, out_path=OUT_PATH):
+  try:
+    parsed = loads(data)
+    atomic_write(out_path, encode_payload(parsed, data))
+    print(f"Success! Wrote cinemas JSON to {out_path}")
+    return parsed
+  except Exception:
+    try:
+      atomic_write(out_path, data if isinstance(data, (bytes, bytearray)) else str(data))
+      print(f"Wrote raw response to {out_path}")
+    except Exception as e:
+      print(f"Failed to write response to {out_path}: {e}")
+  return None
 
-out_path = Path(__file__).parent / "data" / "cinemas.json"
-out_path.parent.mkdir(parents=True, exist_ok=True)
+def fetch_cinema_list(save=True, out_path=OUT_PATH):
+  """Fetch the cinema list; with save=True also rewrite cinemas.json. Returns the parsed list."""
+  data = fetch_cinema_list_bytes()
+  if save:
+    return save_cinema_list(data, out_path)
+  return loads(data)
 
-try:
-  text = data.decode("utf-8")
-  parsed = json.loads(text)
-  out_path.write_text(json.dumps(parsed, ensure_ascii=False, indent=2), encoding="utf-8")
-  print(f"Success! Wrote cinemas JSON to {out_path}")
-except Exception:
+if __name__ == "__main__":
   try:
-    out_path.write_bytes(data if isinstance(data, (bytes, bytearray)) else str(data).encode("utf-8"))
-    print(f"Wrote raw response to {out_path}")
-  except Exception as e:
-    print(f"Failed to write response to {out_path}: {e}")
+    fetch_cinema_list()
+  except RuntimeError as e:
+    raise SystemExit(str(e))
@@ -0,0 +1,230 @@
+"""On-disk HTTP cache with ETag / Last-Modified revalidation.
+
+Entries are keyed by URL plus an auth scope, so responses fetched with a
+bearer token never leak into anonymous lookups. Bodies live in one file
+per entry; metadata, LRU order and hit/miss stats live in SQLite.
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from artifact_writer import atomic_write
+from config import HTTP_CACHE_TTLS, HTTP_CACHE_MAX_BYTES, HTTP_CACHE_MAX_ENTRIES
+
+
+CACHE_DIR = Path(__file__).parent / "data" / "http_cache"
+
+_STAT_NAMES = ("hits", "revalidated", "misses", "stores", "bytes_saved")
+
+
+def ttl_for(url: str) -> int | None:
+    """Return the configured TTL for `url`, or None when it must not be cached."""
+    for pattern, ttl in HTTP_CACHE_TTLS:
+        if pattern in url:
+            return ttl
+    return None
+
+
+def auth_scope(token: str | None) -> str:
+    if not token:
+        return "anon"
+    from bearer_token import _decode_jwt_payload
+    claims = _decode_jwt_payload(token)
+    for claim in ("sub", "client_id", "azp"):
+        if claims.get(claim):
+            return f"{claim}:{claims[claim]}"
+    return "bearer"
+
+
+class CachedResponse:
+    """Response served from the cache; mirrors the bits of requests.Response we use."""
+
+    from_cache = True
+    status_code = 200
+
+    def __init__(self, url: str, content: bytes, headers: dict, not_modified: bool = False):
+        self.url = url
+        self.content = content
+        self.headers = headers
+        # True when the server answered 304 for this entry
+        self.not_modified = not_modified
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        pass
+
+
+class HttpCache:
+    def __init__(self, root: Path = CACHE_DIR, max_bytes: int = HTTP_CACHE_MAX_BYTES, max_entries: int = HTTP_CACHE_MAX_ENTRIES):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.root / "index.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                headers TEXT,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+            CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+        """)
+        self.session_stats = dict.fromkeys(_STAT_NAMES, 0)
+
+    @staticmethod
+    def key(url: str, scope: str) -> str:
+        return hashlib.sha256(f"{scope}\0{url}".encode("utf-8")).hexdigest()
+
+    def _body_path(self, key: str) -> Path:
+        return self.root / key[:2] / f"{key}.body"
+
+    def _count(self, name: str, n: int = 1):
+        self.session_stats[name] += n
+        self._db.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+            (name, n, n),
+        )
+
+    def lookup(self, url: str, scope: str):
+        """Return (entry dict, fresh) or (None, False)."""
+        key = self.key(url, scope)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, headers, size, stored_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None, False
+        etag, last_modified, headers, size, stored_at = row
+        ttl = ttl_for(url) or 0
+        entry = {"key": key, "url": url, "etag": etag, "last_modified": last_modified,
+                 "headers": json.loads(headers or "{}"), "size": size}
+        return entry, time.time() < stored_at + ttl
+
+    def conditional_headers(self, entry) -> dict:
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def hit(self, entry, revalidated: bool = False) -> CachedResponse | None:
+        """Serve `entry` from disk and record the hit. None if the body vanished."""
+        try:
+            content = self._body_path(entry["key"]).read_bytes()
+        except OSError:
+            self.discard(entry["key"])
+            return None
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute("UPDATE entries SET stored_at = ?, accessed_at = ? WHERE key = ?", (now, now, entry["key"]))
+                self._count("revalidated")
+            else:
+                self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, entry["key"]))
+                self._count("hits")
+            self._count("bytes_saved", len(content))
+            self._db.commit()
+        return CachedResponse(entry["url"], content, entry["headers"], not_modified=revalidated)
+
+    def miss(self):
+        with self._lock:
+            self._count("misses")
+            self._db.commit()
+
+    def store(self, url: str, scope: str, resp):
+        if ttl_for(url) is None or resp.status_code != 200:
+            return
+        key = self.key(url, scope)
+        content = resp.content
+        body = self._body_path(key)
+        atomic_write(body, content)
+        headers = {k: v for k, v in resp.headers.items() if k.lower() in ("content-type", "etag", "last-modified")}
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, url, etag, last_modified, headers, size, stored_at, accessed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, resp.headers.get("ETag"), resp.headers.get("Last-Modified"),
+                 json.dumps(headers), len(content), now, now),
+            )
+            self._count("stores")
+            self._evict()
+            self._db.commit()
+
+    def discard(self, key: str):
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+        self._body_path(key).unlink(missing_ok=True)
+
+    def _evict(self):
+        """Drop least recently used entries until under the size and count limits."""
+        total, count = self._db.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM entries").fetchone()
+        if total <= self.max_bytes and count <= self.max_entries:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes and count <= self.max_entries:
+                break
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._body_path(key).unlink(missing_ok=True)
+            total -= size
+            count -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            rows = dict(self._db.execute("SELECT name, value FROM stats").fetchall())
+            entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        out = {name: rows.get(name, 0) for name in _STAT_NAMES}
+        out["entries"] = entries
+        out["size"] = size
+        return out
+
+    def clear(self):
+        with self._lock:
+            keys = [k for (k,) in self._db.execute("SELECT key FROM entries").fetchall()]
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM stats")
+            self._db.commit()
+        for key in keys:
+            self._body_path(key).unlink(missing_ok=True)
+
+
+def format_stats(stats: dict) -> str:
+    lookups = stats["hits"] + stats["revalidated"] + stats["misses"]
+    ratio = (stats["hits"] + stats["revalidated"]) / lookups if lookups else 0.0
+    return (f"cache: {stats['hits']} hits, {stats['revalidated']} revalidated (304), {stats['misses']} misses"
+            f" ({ratio:.0%} hit rate), {stats['bytes_saved'] / 1024:.1f} KiB saved")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clear the HTTP response cache")
+    parser.add_argument("command", choices=["stats", "clear"])
+    args = parser.parse_args()
+
+    cache = HttpCache()
+    if args.command == "clear":
+        cache.clear()
+        print(f"Cleared {cache.root}")
+    else:
+        stats = cache.stats()
+        print(format_stats(stats))
+        print(f"{stats['entries']} entries, {stats['size'] / 1024:.1f} KiB on disk")
@@ -0,0 +1,202 @@
+"""Shared, pooled HTTP client used by every scraper.
+
+Uses httpx with HTTP/2 when `httpx` and `h2` are installed, otherwise a
+`requests.Session` with a keep-alive connection pool. Both backends decode
+gzip, and brotli when the `brotli` package is available.
+"""
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import DEFAULT_USER_AGENT, HTTP_POOL_SIZE, HTTP_TIMEOUT, HTTP2_ENABLED, HTTP_CACHE_ENABLED
+from http_cache import HttpCache, auth_scope, ttl_for
+from retry_policy import get_policy, endpoint_key
+import metrics
+
+try:
+    import httpx
+    import h2  # noqa: F401  (httpx needs it for http2=True)
+except ImportError:
+    httpx = None
+
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+# transport failures worth retrying; anything else (bad url, decoding) is raised at once
+TRANSIENT_ERRORS = (requests.ConnectionError, requests.Timeout)
+if httpx is not None:
+    TRANSIENT_ERRORS += (httpx.TransportError,)
+
+HTTP_SECONDS = metrics.histogram("finnkino_http_request_seconds", "Latency of HTTP requests sent, per endpoint")
+HTTP_RESPONSES = metrics.counter("finnkino_http_responses_total", "HTTP responses per endpoint and status")
+HTTP_BYTES = metrics.counter("finnkino_http_response_bytes_total", "Response body bytes received per endpoint")
+HTTP_ERRORS = metrics.counter("finnkino_http_errors_total", "Requests that failed without a response")
+HTTP_CACHE_RESULTS = metrics.counter("finnkino_http_cache_total", "Responses served from the HTTP cache")
+
+
+class HttpClient:
+    def __init__(self, pool_size: int = HTTP_POOL_SIZE, http2: bool = HTTP2_ENABLED, timeout: float = HTTP_TIMEOUT,
+                 cache_enabled: bool = HTTP_CACHE_ENABLED):
+        self.timeout = timeout
+        self.cache_enabled = cache_enabled
+        self._cache = None
+        self.retry = get_policy()
+        self.http2 = bool(http2 and httpx is not None)
+        default_headers = {
+            "User-Agent": DEFAULT_USER_AGENT,
+            "Accept-Encoding": ACCEPT_ENCODING,
+        }
+        if self.http2:
+            limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+            self._session = httpx.Client(http2=True, limits=limits, headers=default_headers)
+        else:
+            self._session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            self._session.mount("https://", adapter)
+            self._session.mount("http://", adapter)
+            self._session.headers.update(default_headers)
+        self._token = None
+        self._token_exp = None
+        self._stale_tokens = set()
+        self._token_lock = threading.Lock()
+
+    def _use_token(self, token: str):
+        from bearer_token import _token_exp
+        self._token = token
+        self._token_exp = _token_exp(token)
+
+    def set_token(self, token: str | None):
+        """Use `token` for authenticated requests unless it already got a 401."""
+        if token and token not in self._stale_tokens:
+            self._use_token(token)
+
+    def _token_expired(self) -> bool:
+        return self._token_exp is not None and time.time() >= self._token_exp
+
+    def token(self) -> str:
+        if self._token is None or self._token_expired():
+            with self._token_lock:
+                if self._token is None or self._token_expired():
+                    # picks up a token the provider already renewed in the background
+                    from bearer_token import get_bearer_token
+                    self._use_token(get_bearer_token())
+        return self._token
+
+    def refresh_token(self, stale: str | None) -> str:
+        """Refresh the bearer token once, even if many threads saw the same 401."""
+        with self._token_lock:
+            if self._token == stale or self._token is None:
+                from bearer_token import get_provider
+                print("401 Unauthorized, refreshing token")
+                if stale:
+                    self._stale_tokens.add(stale)
+                self._use_token(get_provider().refresh(stale=stale))
+            return self._token
+
+    def _send(self, url, headers, timeout, **kwargs):
+        endpoint = endpoint_key(url)
+        started = time.perf_counter()
+        try:
+            resp = self._session.get(url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+        except Exception as e:
+            HTTP_ERRORS.inc(endpoint=endpoint, error=type(e).__name__)
+            raise
+        HTTP_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+        HTTP_RESPONSES.inc(endpoint=endpoint, status=resp.status_code)
+        HTTP_BYTES.inc(len(resp.content), endpoint=endpoint)
+        return resp
+
+    def _fetch(self, url, headers, timeout, **kwargs):
+        # one logical request: transient errors, 429 and 5xx are retried under the shared policy
+        return self.retry.call(lambda: self._send(url, headers, timeout, **kwargs), url, TRANSIENT_ERRORS)
+
+    @property
+    def cache(self) -> HttpCache | None:
+        if self.cache_enabled and self._cache is None:
+            with self._token_lock:
+                if self._cache is None:
+                    self._cache = HttpCache()
+        return self._cache
+
+    def get_cached(self, url: str, auth: bool = False):
+        """Return a fresh cached response for `url` without touching the network, else None."""
+        store = self.cache if ttl_for(url) is not None else None
+        if store is None:
+            return None
+        entry, fresh = store.lookup(url, auth_scope(self.token() if auth else None))
+        resp = store.hit(entry) if entry and fresh else None
+        if resp is not None:
+            HTTP_CACHE_RESULTS.inc(endpoint=endpoint_key(url), result="fresh")
+        return resp
+
+    def get(self, url: str, headers: dict | None = None, auth: bool = False, timeout: float | None = None,
+            cache: bool = False, **kwargs):
+        """GET `url`. With auth=True the bearer token is injected and a 401 is retried once.
+
+        Connection errors, timeouts, 429 and 5xx are retried with backoff (see
+        retry_policy); raises CircuitOpenError while the endpoint is failing.
+
+        With cache=True, endpoints that have a TTL in config.HTTP_CACHE_TTLS are
+        served from the on-disk cache while fresh and revalidated with
+        If-None-Match / If-Modified-Since afterwards. Cached responses have
+        `from_cache = True`.
+        """
+        headers = dict(headers or {})
+        token = self.token() if auth else None
+        if token:
+            headers["Authorization"] = f"{token}"
+
+        store = self.cache if cache and ttl_for(url) is not None else None
+        entry = None
+        if store is not None:
+            entry, fresh = store.lookup(url, auth_scope(token))
+            if entry and fresh:
+                resp = store.hit(entry)
+                if resp is not None:
+                    HTTP_CACHE_RESULTS.inc(endpoint=endpoint_key(url), result="fresh")
+                    return resp
+                entry = None
+            if entry:
+                headers.update(store.conditional_headers(entry))
+
+        resp = self._fetch(url, headers, timeout, **kwargs)
+        if auth and resp.status_code == 401:
+            token = self.refresh_token(token)
+            headers["Authorization"] = f"{token}"
+            resp = self._fetch(url, headers, timeout, **kwargs)
+
+        if store is not None:
+            if resp.status_code == 304 and entry:
+                cached = store.hit(entry, revalidated=True)
+                if cached is not None:
+                    HTTP_CACHE_RESULTS.inc(endpoint=endpoint_key(url), result="revalidated")
+                    return cached
+                # the cached body is gone, ask again without validators
+                headers.pop("If-None-Match", None)
+                headers.pop("If-Modified-Since", None)
+                resp = self._fetch(url, headers, timeout, **kwargs)
+            store.miss()
+            store.store(url, auth_scope(token), resp)
+        return resp
+
+    def close(self):
+        self._session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """Return the process-wide client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
@@ -0,0 +1,127 @@
+"""JSON backend and streaming helpers shared by the scrapers.
+
+loads() and dumps() use orjson when it is installed (FINNKINO_JSON_BACKEND=json
+forces the standard library) and work on bytes, so a response body is never
+decoded to a str first. Responses are stored as the bytes the server sent;
+pretty-printing (FINNKINO_PRETTY_JSON=1) is opt-in because it means parsing
+and re-serializing every payload.
+
+iter_items() and iter_documents() parse incrementally with ijson when it is
+installed: only the current item is materialized, so walking a large file or
+a stream of concatenated payloads on stdin keeps memory flat. Without ijson
+they fall back to parsing whole documents.
+"""
+import io
+import json
+from pathlib import Path
+
+from artifact_writer import open_artifact
+from config import JSON_BACKEND, PRETTY_JSON
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+
+BACKEND = "orjson" if orjson is not None and JSON_BACKEND != "json" else "json"
+
+
+def loads(raw):
+    """Parse a JSON document from bytes or str."""
+    if BACKEND == "orjson":
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps(obj, pretty: bool = False) -> bytes:
+    """Serialize to UTF-8 bytes: compact, or indented by two spaces."""
+    if BACKEND == "orjson":
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def encode_payload(data=None, raw: bytes | None = None, pretty: bool = PRETTY_JSON) -> bytes:
+    """Bytes to store for a payload.
+
+    The raw body is returned untouched unless pretty-printing is on; `data` is
+    only serialized when there is no raw body. A raw body that is not valid
+    JSON is stored as is.
+    """
+    if raw is not None:
+        if not pretty:
+            return raw
+        if data is None:
+            try:
+                data = loads(raw)
+            except ValueError:
+                return raw
+    return dumps(data, pretty=pretty)
+
+
+def looks_like_object(raw: bytes) -> bool:
+    """Cheap check that a body is a JSON object, without parsing it."""
+    return raw.lstrip()[:1] == b"{"
+
+
+def _open(source):
+    if isinstance(source, (bytes, bytearray)):
+        return io.BytesIO(source), False
+    if isinstance(source, (str, Path)):
+        # .json.gz / .json.zst artifacts are decompressed on the fly
+        return open_artifact(source), True
+    return source, False
+
+
+def _walk(value, parts):
+    if not parts:
+        yield value
+        return
+    head, rest = parts[0], parts[1:]
+    if head == "item":
+        for item in value if isinstance(value, list) else ():
+            yield from _walk(item, rest)
+    elif isinstance(value, dict) and head in value:
+        yield from _walk(value[head], rest)
+
+
+def iter_items(source, prefix: str):
+    """Yield the values at `prefix` of one JSON document, e.g. "showtimes.item".
+
+    `source` is a path, a binary file or bytes. Prefixes use ijson syntax:
+    dotted keys, with "item" for each element of an array.
+    """
+    f, owned = _open(source)
+    try:
+        if ijson is not None:
+            yield from ijson.items(f, prefix, use_float=True)
+        else:
+            yield from _walk(loads(f.read()), prefix.split(".") if prefix else [])
+    finally:
+        if owned:
+            f.close()
+
+
+def iter_documents(stream):
+    """Yield every JSON document of a binary stream: one document, JSON Lines,
+    or payloads simply concatenated."""
+    if ijson is not None:
+        yield from ijson.items(stream, "", multiple_values=True, use_float=True)
+        return
+    text = stream.read().decode("utf-8")
+    decoder = json.JSONDecoder()
+    pos = 0
+    while True:
+        while pos < len(text) and text[pos].isspace():
+            pos += 1
+        if pos >= len(text):
+            return
+        obj, pos = decoder.raw_decode(text, pos)
+        yield obj
@@ -0,0 +1,245 @@
+"""Counters, histograms and spans for scrape runs.
+
+Everything lives in one in-process registry and costs a dict lookup and a
+lock per observation, so it stays on in production (FINNKINO_METRICS=0 turns
+it off). At the end of a run, export_run() writes:
+
+- data/metrics/finnkino.prom, a Prometheus textfile for node_exporter's
+  textfile collector;
+- data/metrics/run_<name>_<timestamp>.json, a run summary with counts, sums
+  and approximate percentiles.
+
+With FINNKINO_METRICS_TRACE set to a path, every finished span is appended
+there as one JSON line (name, parent, start, duration, status, attributes).
+"""
+import bisect
+import contextvars
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from artifact_writer import atomic_write
+from config import METRICS_ENABLED, METRICS_DIR as _METRICS_DIR, METRICS_TRACE_FILE
+from data_paths import DATA_DIR
+
+
+METRICS_DIR = Path(_METRICS_DIR) if _METRICS_DIR else DATA_DIR / "metrics"
+
+# seconds; wide enough for a cached hit and a cold browser token capture
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    return "{" + ",".join('%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in items) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def prometheus(self) -> list[str]:
+        return [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self.values.items())]
+
+    def summary(self) -> list[dict]:
+        return [{"labels": dict(k), "value": v} for k, v in sorted(self.values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # label key -> [per-bucket counts (+Inf last), sum, count, max]
+        self.values: dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = _label_key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            v = self.values.get(key)
+            if v is None:
+                v = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0, 0.0]
+            v[0][i] += 1
+            v[1] += value
+            v[2] += 1
+            if value > v[3]:
+                v[3] = value
+
+    def _quantile(self, counts, total, q: float) -> float:
+        # upper bound of the bucket holding the q-th observation
+        rank = q * total
+        seen = 0
+        for bound, n in zip(self.buckets, counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def prometheus(self) -> list[str]:
+        lines = []
+        for key, (counts, total, count, _) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, n in zip(self.buckets + ("+Inf",), counts):
+                cumulative += n
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+    def summary(self) -> list[dict]:
+        out = []
+        for key, (counts, total, count, peak) in sorted(self.values.items()):
+            out.append({
+                "labels": dict(key),
+                "count": count,
+                "sum": round(total, 6),
+                "p50": min(self._quantile(counts, count, 0.5), peak),
+                "p95": min(self._quantile(counts, count, 0.95), peak),
+                "max": round(peak, 6),
+            })
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: dict[str, Counter | Histogram] = {}
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.get(name)
+                if metric is None:
+                    metric = self.metrics[name] = cls(name, help, **kwargs)
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def prometheus(self) -> str:
+        lines = []
+        for name, metric in sorted(self.metrics.items()):
+            if not metric.values:
+                continue
+            lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> dict:
+        return {
+            "started": datetime.fromtimestamp(self.started).isoformat(timespec="seconds"),
+            "duration": round(time.time() - self.started, 3),
+            "counters": {n: m.summary() for n, m in sorted(self.metrics.items()) if m.kind == "counter" and m.values},
+            "histograms": {n: m.summary() for n, m in sorted(self.metrics.items()) if m.kind == "histogram" and m.values},
+        }
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str = "") -> Counter:
+    return REGISTRY.counter(name, help)
+
+
+def histogram(name: str, help: str = "", buckets=LATENCY_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help, buckets)
+
+
+SPAN_SECONDS = histogram("finnkino_span_seconds", "Duration of traced operations")
+SPAN_ERRORS = counter("finnkino_span_errors_total", "Traced operations that raised")
+
+_current_span = contextvars.ContextVar("finnkino_span", default=None)
+_trace_lock = threading.Lock()
+
+
+def _write_trace(record: dict):
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    with _trace_lock:
+        with open(METRICS_TRACE_FILE, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Time a block into finnkino_span_seconds{span=name}; also usable as a decorator."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    parent = _current_span.get()
+    reset = _current_span.set(name)
+    started = time.time()
+    t0 = time.perf_counter()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        SPAN_ERRORS.inc(span=name)
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        _current_span.reset(reset)
+        SPAN_SECONDS.observe(elapsed, span=name)
+        if METRICS_TRACE_FILE:
+            _write_trace({"name": name, "parent": parent, "start": round(started, 6), "duration": round(elapsed, 6),
+                          "status": status, **attrs})
+
+
+def write_prometheus(path: Path | None = None) -> Path:
+    path = Path(path) if path else METRICS_DIR / "finnkino.prom"
+    # the textfile collector must never read a half-written file
+    return atomic_write(path, REGISTRY.prometheus())
+
+
+def write_summary(run: str, path: Path | None = None) -> Path:
+    summary = {"run": run, **REGISTRY.summary()}
+    if path is None:
+        stamp = datetime.fromtimestamp(REGISTRY.started).strftime("%Y%m%dT%H%M%S")
+        path = METRICS_DIR / f"run_{run}_{stamp}.json"
+    return atomic_write(path, json.dumps(summary, ensure_ascii=False, indent=1))
+
+
+def export_run(run: str, summary: bool = True):
+    """Write the Prometheus textfile and, with `summary`, the JSON summary for this process so far."""
+    if not METRICS_ENABLED:
+        return
+    try:
+        write_prometheus()
+        if summary:
+            path = write_summary(run)
+            print(f"Wrote metrics to {path}")
+    except OSError as e:
+        print(f"Failed to write metrics: {e}")
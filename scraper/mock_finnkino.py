@@ -0,0 +1,348 @@
+"""Local stand-in for the Finnkino APIs, for benchmarks and offline runs.
+
+Serves deterministic, realistically shaped payloads for:
+
+- /                                   token page: its script calls the Digital
+                                      API with a bearer token, like finnkino.fi
+- /token                              the same token as JSON (FINNKINO_TOKEN_URL)
+- /api/omnia/connect/v1/cinemas       cinema list in cinemas.json format
+- /api/omnia/connect/v1/filmGenres, /api/omnia/v1/extensions/cinemaFeature,
+  /api/omnia/v1/pageList              reference data for reference_data.py
+- /ocapi/v1/showtimes/by-business-date/<date>?siteIds=...
+- /ocapi/v1/showtimes/<show_id>/seat-availability
+- /ocapi/v1/sites, /ocapi/v1/films
+
+Latency, a per-server rate limit (429 + Retry-After), token expiry (401) and
+bot blocks (403) are configurable. Payloads depend only on site, date and
+show id, so runs are comparable across commits.
+
+    python3 scraper/mock_finnkino.py --port 8765 --sites 200 --latency-ms 40
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import threading
+import time
+import zlib
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+API_PREFIX = "/ocapi/v1"
+CINEMAS_PATH = "/api/omnia/connect/v1/cinemas"
+GENRES_PATH = "/api/omnia/connect/v1/filmGenres"
+FEATURES_PATH = "/api/omnia/v1/extensions/cinemaFeature"
+PAGES_PATH = "/api/omnia/v1/pageList"
+
+GENRES = ["Draama", "Komedia", "Toiminta", "Animaatio", "Kauhu", "Dokumentti"]
+ATTRIBUTES = ["2D", "3D", "IMAX", "Dolby Atmos", "Puhuttu suomeksi", "Original version", "Sali 1", "4DX"]
+SEAT_STATUSES = ("Available", "Sold", "Reserved")
+
+
+class MockSettings:
+    def __init__(self, sites: int = 17, shows_per_site: int = 30, films: int = 40, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, rate_limit: float = 0.0, token_ttl: float = 3600.0, block_rate: float = 0.0,
+                 seed: int = 1):
+        self.sites = sites
+        self.shows_per_site = shows_per_site
+        self.films = films
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        # requests per second over all clients; 0 disables the limit
+        self.rate_limit = rate_limit
+        self.token_ttl = token_ttl
+        # fraction of seat-availability requests answered with 403
+        self.block_rate = block_rate
+        self.seed = seed
+
+    def site_ids(self) -> list[str]:
+        # the 17 real ids first, then synthetic ones
+        real = ["1004", "1094", "1095", "1100", "1101", "1102", "1103", "1107", "1108", "1111",
+                "1140", "1150", "1151", "1155", "1157", "1162", "1166"]
+        return (real + [str(2000 + i) for i in range(max(0, self.sites - len(real)))])[:self.sites]
+
+
+def _rng(*parts) -> random.Random:
+    return random.Random(zlib.crc32("|".join(str(p) for p in parts).encode("utf-8")))
+
+
+def _b64(obj) -> str:
+    return base64.urlsafe_b64encode(json.dumps(obj).encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def make_token(ttl: float, sub: str = "mock-client") -> str:
+    """An unsigned JWT whose `exp` the server enforces."""
+    return ".".join([_b64({"alg": "none", "typ": "JWT"}), _b64({"sub": sub, "exp": int(time.time() + ttl)}), "mock"])
+
+
+def token_exp(token: str) -> float | None:
+    try:
+        part = token.split()[-1].split(".")[1]
+        return float(json.loads(base64.urlsafe_b64decode(part + "=" * (-len(part) % 4)))["exp"])
+    except Exception:
+        return None
+
+
+def cinemas(settings: MockSettings) -> list[dict]:
+    return [{"key": sid, "value": f"Mock Cinema {sid}"} for sid in settings.site_ids()]
+
+
+def films(settings: MockSettings) -> list[dict]:
+    out = []
+    for i in range(settings.films):
+        r = _rng(settings.seed, "film", i)
+        out.append({
+            "id": f"HO{i:08d}",
+            "title": {"text": f"Mock Film {i}", "translations": [{"languageTag": "en", "text": f"Mock Film {i}"}]},
+            "runtimeInMinutes": r.randint(80, 180),
+            "genreIds": sorted(r.sample(range(len(GENRES)), r.randint(1, 2))),
+            "censorRatingId": r.choice(["S", "7", "12", "16", "18"]),
+            "synopsis": {"text": "Lorem ipsum " * r.randint(10, 40)},
+        })
+    return out
+
+
+def showtimes_payload(settings: MockSettings, site_id: str, date: str) -> dict:
+    r = _rng(settings.seed, site_id, date)
+    all_films = films(settings)
+    site_films = r.sample(all_films, min(len(all_films), r.randint(8, 16)))
+    screens = [{"id": f"{site_id}{i:02d}", "siteId": site_id, "name": {"text": f"Sali {i}"}, "seatCount": r.randint(60, 400)}
+               for i in range(1, r.randint(4, 10))]
+    attrs = [{"id": f"attr{i}", "name": {"text": name}, "shortName": {"text": name[:4]}} for i, name in enumerate(ATTRIBUTES)]
+    shows = []
+    for i in range(settings.shows_per_site):
+        film = r.choice(site_films)
+        h, m = r.randint(10, 23), r.choice((0, 15, 30, 45))
+        end_h = min(23, h + film["runtimeInMinutes"] // 60)
+        shows.append({
+            "id": f"{site_id}-{date.replace('-', '')}-{i:03d}",
+            "filmId": film["id"],
+            "screenId": r.choice(screens)["id"],
+            "siteId": site_id,
+            "schedule": {
+                "businessDate": date,
+                "startsAt": f"{date}T{h:02d}:{m:02d}:00+02:00",
+                "endsAt": f"{date}T{end_h:02d}:{m:02d}:00+02:00",
+            },
+            "attributeIds": sorted(r.sample([a["id"] for a in attrs], r.randint(0, 3))),
+            "isSoldOut": r.random() < 0.03,
+            "isRestricted": False,
+        })
+    return {
+        "businessDate": date,
+        "showtimes": shows,
+        "relatedData": {"films": site_films, "screens": screens, "attributes": attrs,
+                        "sites": [{"id": site_id, "name": {"text": f"Mock Cinema {site_id}"}}]},
+    }
+
+
+def seat_payload(settings: MockSettings, show_id: str, sold_fraction: float) -> dict:
+    r = _rng(settings.seed, show_id)
+    rows = []
+    for row in range(r.randint(6, 16)):
+        letter = chr(ord("A") + row)
+        seats = []
+        for n in range(1, r.randint(10, 24)):
+            # a seat's sale point is fixed, so later polls only ever sell more seats
+            sold_at = _rng(settings.seed, show_id, letter, n).random()
+            status = SEAT_STATUSES[1] if sold_at < sold_fraction else SEAT_STATUSES[0]
+            seats.append({"id": f"{letter}-{n}", "status": status, "position": {"row": row, "column": n}})
+        rows.append({"name": letter, "seats": seats})
+    return {"showtimeId": show_id, "seatLayoutData": {"areas": [{"id": "main", "rows": rows}]}}
+
+
+TOKEN_PAGE = """<!doctype html><html><head><title>Finnkino (mock)</title></head><body>
+<script>
+fetch("{api}/sites", {{headers: {{"Authorization": "Bearer {token}"}}}});
+</script></body></html>
+"""
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, settings: MockSettings):
+        super().__init__(address, _Handler)
+        self.settings = settings
+        self.stats = {"requests": 0, "bytes": 0, "status": {}}
+        self.seat_polls = {}
+        self._lock = threading.Lock()
+        self._tokens = float(max(1.0, settings.rate_limit))
+        self._updated = time.monotonic()
+        self._rng = random.Random(settings.seed)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def env(self) -> dict:
+        """Environment that points the scrapers at this server."""
+        return {
+            "FINNKINO_BASE_URL": self.base_url,
+            "DIGITAL_API_HOST": self.base_url + API_PREFIX,
+            "FINNKINO_TOKEN_URL": self.base_url + "/token",
+        }
+
+    def take(self) -> float:
+        """Rate limiter: 0 if the request may proceed, else seconds until it could."""
+        rate = self.settings.rate_limit
+        if not rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(max(1.0, rate), self._tokens + (now - self._updated) * rate)
+            self._updated = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / rate
+
+    def record(self, status: int, nbytes: int):
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["bytes"] += nbytes
+            self.stats["status"][status] = self.stats["status"].get(status, 0) + 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"requests": self.stats["requests"], "bytes": self.stats["bytes"], "status": dict(self.stats["status"])}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: MockServer
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, body: bytes = b"", content_type: str = "application/json", headers: dict | None = None):
+        etag = '"' + hashlib.md5(body).hexdigest() + '"' if status == 200 else None
+        if etag and self.headers.get("If-None-Match") == etag:
+            status, body = 304, b""
+        self.send_response(status)
+        if body:
+            self.send_header("Content-Type", content_type)
+        if etag:
+            self.send_header("ETag", etag)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+        self.server.record(status, len(body))
+
+    def _json(self, obj):
+        self._send(200, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    def _authorized(self) -> bool:
+        exp = token_exp(self.headers.get("Authorization") or "")
+        return exp is not None and exp > time.time()
+
+    def do_GET(self):
+        settings = self.server.settings
+        if settings.latency_ms or settings.jitter_ms:
+            time.sleep(max(0.0, settings.latency_ms + random.uniform(-settings.jitter_ms, settings.jitter_ms)) / 1000)
+        wait = self.server.take()
+        if wait:
+            self._send(429, headers={"Retry-After": str(max(1, round(wait)))})
+            return
+
+        url = urlsplit(self.path)
+        path = url.path
+        if path == "/":
+            page = TOKEN_PAGE.format(api=self.server.base_url + API_PREFIX, token=make_token(settings.token_ttl))
+            self._send(200, page.encode("utf-8"), "text/html")
+        elif path == "/token":
+            # same shape as the captured Authorization header
+            self._json({"token": "Bearer " + make_token(settings.token_ttl)})
+        elif path == CINEMAS_PATH:
+            self._json(cinemas(settings))
+        elif path == GENRES_PATH:
+            self._json([{"id": i, "name": name} for i, name in enumerate(GENRES)])
+        elif path == FEATURES_PATH:
+            self._json([{"id": f"attr{i}", "name": name} for i, name in enumerate(ATTRIBUTES)])
+        elif path == PAGES_PATH:
+            self._json([{"nodeId": 5000 + i, "name": c["value"], "url": f"/teatterit/{c['key']}",
+                         "vistaCinema": {"key": c["key"]}, "addressLine1": f"Katu {i}", "postCode": "00100",
+                         "latitude": 60.17, "longitude": 24.94} for i, c in enumerate(cinemas(settings))])
+        elif not path.startswith(API_PREFIX):
+            self._send(404)
+        elif not self._authorized():
+            self._send(401)
+        else:
+            self._api(path[len(API_PREFIX):], parse_qs(url.query))
+
+    def _api(self, path: str, query: dict):
+        settings = self.server.settings
+        parts = path.strip("/").split("/")
+        if parts == ["sites"]:
+            self._json([{"id": c["key"], "name": {"text": c["value"]}} for c in cinemas(settings)])
+        elif parts == ["films"]:
+            self._json(films(settings))
+        elif len(parts) == 3 and parts[:2] == ["showtimes", "by-business-date"]:
+            date = parts[2]
+            merged = None
+            for site_id in query.get("siteIds", []):
+                payload = showtimes_payload(settings, site_id, date)
+                if merged is None:
+                    merged = payload
+                else:
+                    merged["showtimes"] += payload["showtimes"]
+                    for key in ("films", "screens", "sites"):
+                        merged["relatedData"][key] += payload["relatedData"][key]
+            self._json(merged or {"businessDate": date, "showtimes": [], "relatedData": {}})
+        elif len(parts) == 3 and parts[0] == "showtimes" and parts[2] == "seat-availability":
+            show_id = parts[1]
+            with self.server._lock:
+                blocked = self.server._rng.random() < settings.block_rate
+                polls = self.server.seat_polls[show_id] = self.server.seat_polls.get(show_id, 0) + 1
+            if blocked:
+                self._send(403, b"<html>Access denied</html>", "text/html")
+                return
+            self._json(seat_payload(settings, show_id, min(1.0, 0.1 * polls)))
+        else:
+            self._send(404)
+
+
+def start(settings: MockSettings | None = None, port: int = 0) -> MockServer:
+    server = MockServer(("127.0.0.1", port), settings or MockSettings())
+    threading.Thread(target=server.serve_forever, name="mock-finnkino", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local mock of the Finnkino APIs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sites", type=int, default=17)
+    parser.add_argument("--shows-per-site", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Requests per second before answering 429")
+    parser.add_argument("--token-ttl", type=float, default=3600.0, help="Seconds until issued tokens get 401")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Fraction of seat requests answered with 403")
+    args = parser.parse_args()
+
+    settings = MockSettings(sites=args.sites, shows_per_site=args.shows_per_site, latency_ms=args.latency_ms,
+                            jitter_ms=args.jitter_ms, rate_limit=args.rate_limit, token_ttl=args.token_ttl,
+                            block_rate=args.block_rate)
+    server = start(settings, args.port)
+    for k, v in server.env().items():
+        print(f"export {k}={v}")
+    try:
+        while True:
+            time.sleep(60)
+            print(server.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+"""Staged scrape pipeline: fetch -> parse -> write.
+
+    fetch queue --> fetchers (async, I/O)  --parse queue-->  parsers (process pool, CPU)
+                                           --write queue-->  writer (batched disk I/O)
+
+A fixed pool of fetchers (one per engine concurrency slot) takes URLs from
+the fetch queue, and the parse and write queues are bounded. A fetcher
+whose response cannot be queued waits before taking the next URL, so a
+slow disk or slow parsers stall the fetchers instead of buffering
+responses in memory: at most fetchers + 2 * queue size + parsers bodies
+are held at once. With seats enabled, the shows the showtimes parser finds
+are filtered like a seat sweep (seat_availability_scraper.select_shows:
+started shows and shows outside SEAT_SWEEP_WINDOW_HOURS are skipped) and
+added to the fetch queue, which only holds URLs.
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date, timedelta
+
+from artifact_index import get_index, SHOWTIMES, SEAT_SERIES as SEAT_SERIES_KIND, SEAT_AVAILABILITY as SEAT_AVAILABILITY_KIND
+from artifact_writer import BatchWriter
+from async_scrape import ScrapeEngine
+from config import (
+    THEATER_SHOWTIMES, SEAT_AVAILABILITY, SHOWTIME_STORE, SEAT_STORE,
+    PIPELINE_QUEUE_SIZE, PIPELINE_WRITE_BATCH, PIPELINE_PARSE_WORKERS, PRETTY_JSON, CHANGE_FEED, REFERENCE_ABSORB,
+    SEAT_SWEEP_WINDOW_HOURS,
+)
+from data_paths import showtimes_path, week_dir
+from json_stream import loads, dumps
+from schedule_parse import iter_schedule_rows
+from seat_availability_scraper import _make_output_path_for_show, select_shows, shows_from_payload
+from showtime_changes import show_states
+import metrics
+
+
+_DONE = object()
+
+
+def parse_showtimes_payload(raw: bytes, site_id: str, date: str, want_rows: bool, want_data: bool):
+    """CPU stage for one showtimes response (runs in a worker process).
+
+    The body to write is None when the raw response is stored as received,
+    so it is not sent back from the worker. For the change feed only the
+    compact per-show states are sent back, and for the reference data
+    catalog only relatedData, not the payload.
+    """
+    data = loads(raw)
+    body = dumps(data, pretty=True) if PRETTY_JSON else None
+    # only shows a seat sweep would poll, earliest first
+    show_ids = [s["id"] for s in select_shows(shows_from_payload(data), window_hours=SEAT_SWEEP_WINDOW_HOURS or None)]
+    rows = None
+    if want_rows:
+        rows = "".join(
+            json.dumps({**r, "starts_at": r["starts_at"].isoformat() if r["starts_at"] else None}, ensure_ascii=False) + "\n"
+            for r in iter_schedule_rows(data, site_id, date)
+        )
+    states = show_states(data) if CHANGE_FEED else None
+    related = data.get("relatedData") if REFERENCE_ABSORB else None
+    return body, show_ids, rows, (data if want_data else None), states, related
+
+
+def parse_seat_payload(raw: bytes, want_data: bool):
+    """CPU stage for one seat-availability response."""
+    try:
+        data = loads(raw)
+    except ValueError:
+        return None, None
+    return (dumps(data, pretty=True) if PRETTY_JSON else None), data if want_data else None
+
+
+class Pipeline:
+    def __init__(self, token: str, concurrency: int | None = None, rate: float | None = None,
+                 parse_workers: int | None = PIPELINE_PARSE_WORKERS, queue_size: int = PIPELINE_QUEUE_SIZE,
+                 write_batch: int = PIPELINE_WRITE_BATCH, seats: bool = False, rows: bool = False):
+        self.engine = ScrapeEngine(token, concurrency=concurrency, rate=rate)
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self.queue_size = queue_size
+        self.write_batch = write_batch
+        self.seats = seats
+        self.rows = rows
+        self.stats = {"fetched": 0, "parsed": 0, "written": 0, "failed": 0, "bytes": 0}
+        self._queued = 0
+
+    # -- stage 1: fetch -------------------------------------------------
+    async def _fetch(self, kind: str, url: str, meta: dict):
+        try:
+            resp = await self.engine.fetch(url, headers={"Accept": "application/json"})
+        except Exception as e:
+            print(f"Request error for {url}: {e}")
+            self.stats["failed"] += 1
+            return
+        if resp.status_code != 200:
+            print(f"HTTP {resp.status_code} for {url}")
+            self.stats["failed"] += 1
+            return
+        self.stats["fetched"] += 1
+        self.stats["bytes"] += len(resp.content)
+        # blocks while parsers are behind: this is the backpressure point
+        await self.parse_q.put((kind, meta, resp.content))
+
+    async def _fetcher(self):
+        while True:
+            kind, url, meta = await self.fetch_q.get()
+            try:
+                await self._fetch(kind, url, meta)
+            finally:
+                self.fetch_q.task_done()
+
+    def _queue_fetch(self, kind: str, url: str, meta: dict):
+        # unbounded, but only URLs: a parser must never wait on the fetchers it is holding up
+        self.fetch_q.put_nowait((kind, url, meta))
+        self._queued += 1
+
+    def _queue_showtimes_fetch(self, site_id: str, date: str):
+        url = THEATER_SHOWTIMES.format(date=date, site_id=site_id)
+        self._queue_fetch("showtimes", url, {"site_id": site_id, "date": date})
+
+    def _queue_seat_fetch(self, site_id: str, date: str, show_id: str):
+        url = SEAT_AVAILABILITY.format(show_id=show_id)
+        self._queue_fetch("seats", url, {"site_id": site_id, "date": date, "show_id": show_id})
+
+    # -- stage 2: parse -------------------------------------------------
+    async def _parser(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            kind, meta, raw = await self.parse_q.get()
+            try:
+                if kind == "showtimes":
+                    want_data = SHOWTIME_STORE in ("sqlite", "both")
+                    body, show_ids, rows, data, states, related = await loop.run_in_executor(
+                        self.pool, parse_showtimes_payload, raw, meta["site_id"], meta["date"], self.rows, want_data)
+                    await self.write_q.put(("showtimes", meta, body or raw, rows, data, (states, related)))
+                    if self.seats:
+                        for show_id in show_ids:
+                            self._queue_seat_fetch(meta["site_id"], meta["date"], show_id)
+                else:
+                    want_data = SEAT_STORE in ("series", "both")
+                    body, data = await loop.run_in_executor(self.pool, parse_seat_payload, raw, want_data)
+                    await self.write_q.put(("seats", meta, body or raw, None, data, None))
+                self.stats["parsed"] += 1
+            except Exception as e:
+                print(f"Parse error for {meta}: {e}")
+                self.stats["failed"] += 1
+            finally:
+                self.parse_q.task_done()
+
+    # -- stage 3: write -------------------------------------------------
+    @metrics.span("write_batch")
+    def _write_batch(self, batch):
+        """Write one batch of artifacts, rename them into place together and index them in one transaction."""
+        index_rows = []
+        changes = []
+        now = time.time()
+        with BatchWriter(max_files=len(batch) * 2) as writer:
+            for kind, meta, body, rows, data, extra in batch:
+                if kind == "showtimes":
+                    states, related = extra
+                    if SHOWTIME_STORE in ("json", "both"):
+                        path = writer.write(showtimes_path(meta["site_id"], meta["date"]), body)
+                        index_rows.append((SHOWTIMES, path, meta["site_id"], meta["date"], None, now))
+                    if data is not None:
+                        from showtime_store import get_store
+                        get_store().ingest(meta["site_id"], meta["date"], data)
+                    if states is not None:
+                        changes.append((meta["site_id"], meta["date"], states))
+                    if related is not None:
+                        from reference_data import absorb_payload
+                        absorb_payload({"relatedData": related})
+                    if rows is not None:
+                        writer.write(week_dir(meta["date"]) / f"schedule_{meta['site_id']}_{meta['date']}.jsonl", rows,
+                                     compressed=False)
+                else:
+                    if data is not None:
+                        from seat_snapshots import get_store as get_seat_store
+                        seat_store = get_seat_store()
+                        seat_store.append(meta["show_id"], meta["date"], data)
+                        index_rows.append((SEAT_SERIES_KIND, seat_store.base_path(meta["show_id"], meta["date"]),
+                                           meta["site_id"], meta["date"], meta["show_id"], now))
+                    if SEAT_STORE in ("files", "both") or data is None:
+                        path = writer.write(_make_output_path_for_show(meta["show_id"], meta["date"]), body)
+                        index_rows.append((SEAT_AVAILABILITY_KIND, path, meta["site_id"], meta["date"], meta["show_id"], now))
+        get_index().record_many(index_rows)
+        if changes:
+            from showtime_changes import get_feed
+            get_feed().record_many(changes)
+        return len(batch)
+
+    async def _writer(self):
+        done = False
+        while not done:
+            batch = []
+            item = await self.write_q.get()
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.write_batch or self.write_q.empty():
+                    break
+                item = self.write_q.get_nowait()
+            if batch:
+                try:
+                    self.stats["written"] += await self.engine.in_executor(self._write_batch, batch)
+                except Exception as e:
+                    print(f"Write error: {e}")
+                    self.stats["failed"] += len(batch)
+
+    # -- driver ---------------------------------------------------------
+    async def run(self, site_ids, dates):
+        self.fetch_q = asyncio.Queue()
+        self.parse_q = asyncio.Queue(maxsize=self.queue_size)
+        self.write_q = asyncio.Queue(maxsize=self.queue_size)
+        fetchers = [asyncio.create_task(self._fetcher()) for _ in range(self.engine.concurrency)]
+        parsers = [asyncio.create_task(self._parser()) for _ in range(self.parse_workers)]
+        writer = asyncio.create_task(self._writer())
+
+        for d in dates:
+            for sid in site_ids:
+                self._queue_showtimes_fetch(sid, d)
+        # parsers queue seat fetches before finishing their item; done once a round queues nothing new
+        while True:
+            queued = self._queued
+            await self.fetch_q.join()
+            await self.parse_q.join()
+            if self._queued == queued:
+                break
+
+        for t in fetchers + parsers:
+            t.cancel()
+        await self.write_q.put(_DONE)
+        await writer
+        return self.stats
+
+    def close(self):
+        self.engine.close()
+        self.pool.shutdown()
+
+
+def run_pipeline(token: str, site_ids, dates, **kwargs) -> dict:
+    pipeline = Pipeline(token, **kwargs)
+    started = time.monotonic()
+    try:
+        stats = asyncio.run(pipeline.run(list(site_ids), list(dates)))
+    finally:
+        pipeline.close()
+        metrics.export_run("pipeline")
+    elapsed = time.monotonic() - started
+    print(f"Pipeline: {stats['fetched']} fetched, {stats['parsed']} parsed, {stats['written']} written,"
+          f" {stats['failed']} failed, {stats['bytes'] / 1024:.0f} KiB in {elapsed:.1f}s")
+    return stats
+
+
+def main():
+    import argparse
+    from bearer_token import get_bearer_token
+    from data_paths import load_keys
+    from weekly_showtime_scrape import next_or_current_friday
+
+    parser = argparse.ArgumentParser(description="Fetch, parse and write showtimes (and seat maps) as a staged pipeline")
+    parser.add_argument("--start", default=None, help="First date (YYYY-MM-DD). Defaults to next or current Friday")
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--seats", action="store_true", help="Also fetch seat availability for every show that has not started")
+    parser.add_argument("--rows", action="store_true", help="Also write parsed schedule rows as JSONL per site/date")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--rate", type=float, default=None)
+    parser.add_argument("--workers", type=int, default=PIPELINE_PARSE_WORKERS, help="Parser processes (default: CPU count)")
+    parser.add_argument("--queue-size", type=int, default=PIPELINE_QUEUE_SIZE)
+    args = parser.parse_args()
+
+    start = Date.fromisoformat(args.start) if args.start else next_or_current_friday(Date.today())
+    dates = [(start + timedelta(n)).isoformat() for n in range(args.days)]
+    site_ids = [e["key"] for e in load_keys() if e.get("key")]
+    run_pipeline(get_bearer_token(), site_ids, dates, concurrency=args.concurrency, rate=args.rate,
+                 parse_workers=args.workers, queue_size=args.queue_size, seats=args.seats, rows=args.rows)
+
+
+if __name__ == "__main__":
+    main()
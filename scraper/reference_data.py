@@ -0,0 +1,335 @@
+"""In-memory catalog of Finnkino reference data, indexed by id.
+
+One concurrent pass over plain HTTP fetches the films, genres, cinema
+features, Digital API sites, the cinema list and the OMNIA theater pages and
+merges them into sites, screens, films, genres and attributes. The catalog is
+refreshed when older than config.REFERENCE_TTL and snapshotted to
+data/reference_catalog.json, so a new process starts warm; the HTTP cache
+makes a refresh of unchanged endpoints cheap.
+
+Every saved showtimes payload also feeds its relatedData into the catalog
+(config.REFERENCE_ABSORB), so films, screens and attributes seen while
+scraping are known without a refresh. Parsers can resolve ids that a
+payload's relatedData does not carry:
+
+    catalog = get_catalog().ensure_fresh()
+    catalog.film("HO00001234")["title"]
+    catalog.name("screens", "100401")
+
+    python3 scraper/reference_data.py refresh
+    python3 scraper/reference_data.py show films HO00001234
+"""
+import argparse
+import atexit
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from config import (
+    FILMS_LIST, FILM_GENRES, CINEMA_FEATURE, THEATERS_LIST_DIGITAL_API, CINEMAS_LIST, THEATERS_LIST,
+    DIGITAL_API_HOST, REFERENCE_TTL, REFERENCE_ABSORB,
+)
+from artifact_writer import atomic_write, locked
+from data_paths import DATA_DIR
+import metrics
+
+
+CATALOG_FILE = DATA_DIR / "reference_catalog.json"
+KINDS = ("sites", "screens", "films", "genres", "attributes")
+
+# source name -> url
+SOURCES = {
+    "films": FILMS_LIST,
+    "genres": FILM_GENRES,
+    "features": CINEMA_FEATURE,
+    "sites": THEATERS_LIST_DIGITAL_API,
+    "cinemas": CINEMAS_LIST,
+    "theaters": THEATERS_LIST,
+}
+
+_ID_KEYS = ("id", "key", "nodeId", "code")
+
+# absorbed relatedData is written to the snapshot at most this often (and at exit)
+ABSORB_SAVE_INTERVAL = 60.0
+
+
+def _items(payload, *keys) -> list:
+    """The list of records in a payload: the payload itself, or its first list under `keys`."""
+    if isinstance(payload, list):
+        return payload
+    if isinstance(payload, dict):
+        for key in keys + ("items", "data", "results"):
+            value = payload.get(key)
+            if isinstance(value, list):
+                return value
+    return []
+
+
+def _id(item: dict, keys=_ID_KEYS):
+    for key in keys:
+        value = item.get(key)
+        if value is not None and not isinstance(value, (dict, list)):
+            return str(value)
+    return None
+
+
+def _text(value):
+    if isinstance(value, dict):
+        return value.get("text") or value.get("value") or value.get("name")
+    return value
+
+
+class Catalog:
+    def __init__(self):
+        self.tables: dict[str, dict[str, dict]] = {kind: {} for kind in KINDS}
+        self.loaded_at = 0.0
+        self.dirty = False
+        self.saved_at = 0.0
+        self._lock = threading.Lock()
+
+    # -- merging ----------------------------------------------------------
+    def _merge(self, kind: str, item_id, fields: dict):
+        if item_id is None:
+            return
+        table = self.tables[kind]
+        current = table.get(item_id)
+        if current is None:
+            table[item_id] = {"id": item_id, **fields}
+        else:
+            current.update({k: v for k, v in fields.items() if v is not None})
+
+    def _merge_site(self, site: dict):
+        site_id = _id(site)
+        self._merge("sites", site_id, {"name": _text(site.get("name")), **{k: v for k, v in site.items() if k not in ("id", "name", "screens")}})
+        for screen in _items(site.get("screens")):
+            self._merge("screens", _id(screen), {"siteId": site_id, "name": _text(screen.get("name"))})
+
+    def add_source(self, source: str, payload):
+        """Merge one fetched endpoint into the tables."""
+        if source == "films":
+            for film in _items(payload, "films"):
+                self._merge("films", _id(film), {
+                    "title": _text(film.get("title")),
+                    "runtimeInMinutes": film.get("runtimeInMinutes"),
+                    "genreIds": film.get("genreIds"),
+                    "censorRatingId": film.get("censorRatingId"),
+                })
+        elif source == "genres":
+            for genre in _items(payload, "genres", "filmGenres"):
+                self._merge("genres", _id(genre), {"name": _text(genre.get("name") or genre.get("value"))})
+        elif source == "features":
+            for feature in _items(payload, "features", "cinemaFeatures"):
+                self._merge("attributes", _id(feature), {"name": _text(feature.get("name") or feature.get("value"))})
+        elif source == "sites":
+            for site in _items(payload, "sites"):
+                self._merge_site(site)
+        elif source == "cinemas":
+            # cinemas.json format: {"key": site id, "value": name}
+            for cinema in _items(payload, "cinemas"):
+                self._merge("sites", _id(cinema, ("key", "id")), {"name": _text(cinema.get("value") or cinema.get("name"))})
+        elif source == "theaters":
+            # OMNIA theater pages carry the Vista site id plus address and location
+            for page in _items(payload, "pages", "pageList"):
+                props = page.get("properties") if isinstance(page.get("properties"), dict) else page
+                vista = props.get("vistaCinema")
+                site_id = _id(vista, ("id", "key", "value")) if isinstance(vista, dict) else (str(vista) if vista else None)
+                self._merge("sites", site_id, {
+                    "pageName": _text(props.get("name")),
+                    "url": props.get("url"),
+                    "address": ", ".join(str(props[k]) for k in ("addressLine1", "addressLine2", "postCode") if props.get(k)) or None,
+                    "latitude": props.get("latitude"),
+                    "longitude": props.get("longitude"),
+                })
+
+    def absorb_related(self, related: dict):
+        """Learn films, screens and attributes from a showtimes payload's relatedData."""
+        with self._lock:
+            for film in related.get("films", []):
+                self._merge("films", _id(film), {"title": _text(film.get("title")),
+                                                 "runtimeInMinutes": film.get("runtimeInMinutes"),
+                                                 "genreIds": film.get("genreIds")})
+            for screen in related.get("screens", []):
+                self._merge("screens", _id(screen), {"siteId": screen.get("siteId"), "name": _text(screen.get("name"))})
+            for attr in related.get("attributes", []):
+                self._merge("attributes", _id(attr), {"name": _text(attr.get("name"))})
+            for site in related.get("sites", []) if isinstance(related.get("sites"), list) else []:
+                self._merge_site(site)
+            self.dirty = True
+
+    # -- fetching ---------------------------------------------------------
+    @property
+    def stale(self) -> bool:
+        return time.time() - self.loaded_at >= REFERENCE_TTL
+
+    def refresh(self) -> dict:
+        """Fetch every source concurrently and merge the results; returns {source: status}."""
+        from http_client import get_client
+
+        client = get_client()
+
+        def fetch(item):
+            source, url = item
+            # Digital API endpoints need the bearer token, OMNIA ones do not
+            auth = url.startswith(DIGITAL_API_HOST)
+            try:
+                with metrics.span("fetch_reference", source=source):
+                    resp = client.get(url, headers={"Accept": "application/json"}, auth=auth, cache=True)
+                if resp.status_code == 403 and source == "cinemas":
+                    # the cinema list bot-blocks plain clients; retry with rotating User-Agents
+                    from get_cinema_list import fetch_cinema_list
+                    return source, fetch_cinema_list(save=False), 200
+                return source, (resp.json() if resp.status_code == 200 else None), resp.status_code
+            except Exception as e:
+                print(f"Reference data {source} failed: {e}")
+                return source, None, None
+
+        with ThreadPoolExecutor(max_workers=len(SOURCES)) as pool:
+            results = list(pool.map(fetch, SOURCES.items()))
+
+        status = {}
+        with self._lock:
+            for source, payload, code in results:
+                status[source] = code
+                if payload is not None:
+                    self.add_source(source, payload)
+            self.loaded_at = time.time()
+        return status
+
+    def ensure_fresh(self) -> "Catalog":
+        if self.stale:
+            status = self.refresh()
+            failed = [s for s, code in status.items() if code != 200]
+            if failed:
+                print(f"Reference data: could not refresh {', '.join(failed)}")
+            self.save()
+        return self
+
+    # -- persistence ------------------------------------------------------
+    def save(self, path=CATALOG_FILE):
+        """Write the snapshot, keeping records other processes saved that this one has not seen."""
+        with locked(path), self._lock:
+            try:
+                disk = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                disk = {}
+            for kind in KINDS:
+                table = disk.get(kind) or {}
+                for item_id, item in self.tables[kind].items():
+                    table[item_id] = {**table.get(item_id, {}), **{k: v for k, v in item.items() if v is not None}}
+                self.tables[kind] = table
+            self.loaded_at = max(self.loaded_at, disk.get("loaded_at", 0.0))
+            atomic_write(path, json.dumps({"loaded_at": self.loaded_at, **self.tables}, ensure_ascii=False))
+            self.dirty = False
+            self.saved_at = time.time()
+
+    def load(self, path=CATALOG_FILE) -> bool:
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False
+        self.loaded_at = data.get("loaded_at", 0.0)
+        for kind in KINDS:
+            self.tables[kind] = data.get(kind, {})
+        return True
+
+    # -- lookups ----------------------------------------------------------
+    def get(self, kind: str, item_id) -> dict | None:
+        return self.tables[kind].get(str(item_id)) if item_id is not None else None
+
+    def name(self, kind: str, item_id) -> str | None:
+        item = self.get(kind, item_id)
+        if item is None:
+            return None
+        return item.get("title") if kind == "films" else item.get("name")
+
+    def site(self, site_id):
+        return self.get("sites", site_id)
+
+    def screen(self, screen_id):
+        return self.get("screens", screen_id)
+
+    def film(self, film_id):
+        return self.get("films", film_id)
+
+    def genre(self, genre_id):
+        return self.get("genres", genre_id)
+
+    def attribute(self, attribute_id):
+        return self.get("attributes", attribute_id)
+
+    def counts(self) -> dict:
+        return {kind: len(table) for kind, table in self.tables.items()}
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> Catalog:
+    """Return the process-wide catalog, loaded from the last snapshot if there is one."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                catalog = Catalog()
+                catalog.load()
+                _catalog = catalog
+    return _catalog
+
+
+def _save_absorbed():
+    if _catalog is not None and _catalog.dirty:
+        _catalog.save()
+
+
+atexit.register(_save_absorbed)
+
+
+def absorb_payload(data):
+    """Ingest hook for the scrapers: learn a saved payload's relatedData if config.REFERENCE_ABSORB is on."""
+    if not REFERENCE_ABSORB or not isinstance(data, dict):
+        return
+    related = data.get("relatedData")
+    if not isinstance(related, dict):
+        return
+    try:
+        catalog = get_catalog()
+        catalog.absorb_related(related)
+        if time.time() - catalog.saved_at >= ABSORB_SAVE_INTERVAL:
+            catalog.save()
+    except Exception as e:
+        # the catalog must never cost us the scrape itself
+        print(f"Reference data error: {e}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch and query Finnkino reference data")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("refresh", help="Fetch all reference endpoints now")
+    p = sub.add_parser("show", help="Print one record, or counts without arguments")
+    p.add_argument("kind", nargs="?", choices=KINDS)
+    p.add_argument("id", nargs="?")
+    args = parser.parse_args(argv)
+
+    catalog = get_catalog()
+    if args.command == "refresh":
+        started = time.monotonic()
+        status = catalog.refresh()
+        catalog.save()
+        print(f"Refreshed in {time.monotonic() - started:.1f}s: {status}")
+        print(catalog.counts())
+        return
+
+    catalog.ensure_fresh()
+    if args.kind is None:
+        print(catalog.counts())
+    elif args.id is None:
+        for item_id, item in sorted(catalog.tables[args.kind].items()):
+            print(item_id, catalog.name(args.kind, item_id))
+    else:
+        print(json.dumps(catalog.get(args.kind, args.id), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
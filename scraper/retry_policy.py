@@ -0,0 +1,256 @@
+"""Retry, backoff and circuit breaking shared by every fetcher.
+
+- Transient failures (connection errors, timeouts, 429 and 5xx) are retried
+  with exponential backoff and full jitter, waiting at least as long as a
+  `Retry-After` header asks.
+- A 429 with `Retry-After` holds the whole endpoint, so concurrent requests
+  back off together instead of each running into the same limit.
+- Each endpoint (host plus path with ids and dates wildcarded) has a circuit
+  breaker that fails fast after repeated failures and lets a probe through
+  after a cooldown.
+- A global retry budget caps retries to a fraction of recent requests, so an
+  outage cannot multiply the load on the API.
+"""
+import random
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import metrics
+from config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_STATUSES,
+    RETRY_BUDGET_RATIO, RETRY_BUDGET_MIN_PER_SECOND,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS,
+)
+
+
+RETRIES = metrics.counter("finnkino_http_retries_total", "Retried requests per endpoint and reason")
+CIRCUIT_OPENS = metrics.counter("finnkino_circuit_open_total", "Times a circuit breaker opened")
+CIRCUIT_REJECTED = metrics.counter("finnkino_circuit_rejected_total", "Requests refused by an open circuit")
+BUDGET_EXHAUSTED = metrics.counter("finnkino_retry_budget_exhausted_total", "Retries refused by the retry budget")
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request to an endpoint whose breaker is open."""
+
+
+# ids and dates contain digits; API versions like "v1" are kept
+_ID_SEGMENT = re.compile(r"^(?!v\d+$).*\d")
+
+
+def endpoint_key(url: str) -> str:
+    """Group urls by endpoint: id and date path segments become '*'."""
+    parts = urlsplit(url)
+    path = "/".join("*" if _ID_SEGMENT.search(seg) else seg for seg in parts.path.split("/"))
+    return parts.netloc + path
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class CircuitBreaker:
+    """Closed -> open after `threshold` consecutive failures -> half-open after `reset` seconds."""
+
+    def __init__(self, threshold: int = CIRCUIT_FAILURE_THRESHOLD, reset: float = CIRCUIT_RESET_SECONDS,
+                 name: str = ""):
+        self.name = name
+        self.threshold = threshold
+        self.reset = reset
+        self.failures = 0
+        self.opened_at = None
+        self.hold_until = 0.0
+        self.last_throttled = 0.0
+        self._probing = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset:
+                return False
+            # one probe request decides whether the breaker closes again; a probe
+            # that never reported back (non-transient error) expires after `reset`
+            if self._probing is not None and now - self._probing < self.reset:
+                return False
+            self._probing = now
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            probing = self._probing is not None
+            if probing or self.failures >= self.threshold:
+                if self.opened_at is None or probing:
+                    print(f"Circuit opened after {self.failures} failures")
+                    CIRCUIT_OPENS.inc(endpoint=self.name)
+                self.opened_at = time.monotonic()
+            self._probing = None
+
+    def throttle(self, seconds: float):
+        """Hold every request to this endpoint for `seconds`."""
+        with self._lock:
+            now = time.monotonic()
+            self.hold_until = max(self.hold_until, now + seconds)
+            self.last_throttled = now
+
+    def hold_remaining(self) -> float:
+        return max(0.0, self.hold_until - time.monotonic())
+
+
+class RetryBudget:
+    """Every request deposits `ratio` retries; each retry withdraws one.
+
+    `min_per_second` keeps a trickle of retries available when traffic is low.
+    """
+
+    def __init__(self, ratio: float = RETRY_BUDGET_RATIO, min_per_second: float = RETRY_BUDGET_MIN_PER_SECOND,
+                 capacity: float = 100.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.balance = capacity
+        self.updated = time.monotonic()
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def _top_up(self, amount: float):
+        now = time.monotonic()
+        self.balance = min(self.capacity, self.balance + amount + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        with self._lock:
+            self._top_up(self.ratio)
+
+    def withdraw(self) -> bool:
+        with self._lock:
+            self._top_up(0.0)
+            if self.balance >= 1:
+                self.balance -= 1
+                return True
+            self.exhausted += 1
+            BUDGET_EXHAUSTED.inc()
+            return False
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int = RETRY_MAX_ATTEMPTS, base_delay: float = RETRY_BASE_DELAY,
+                 max_delay: float = RETRY_MAX_DELAY, statuses=RETRY_STATUSES, budget: RetryBudget | None = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.statuses = frozenset(statuses)
+        self.budget = budget or RetryBudget()
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, url: str) -> CircuitBreaker:
+        key = endpoint_key(url)
+        breaker = self._breakers.get(key)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(key, CircuitBreaker(name=key))
+        return breaker
+
+    def backoff(self, attempt: int, retry_after: float | None = None) -> float:
+        """Full-jitter exponential delay before retry number `attempt` (1-based)."""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+    def hold_remaining(self, url: str) -> float:
+        return self.breaker(url).hold_remaining()
+
+    def call(self, send, url: str, retry_on: tuple = ()):
+        """Call `send()` until it returns a non-retryable response or attempts run out.
+
+        The last response is returned even if its status is retryable; the last
+        exception is re-raised. Raises CircuitOpenError while the endpoint's
+        breaker is open.
+        """
+        breaker = self.breaker(url)
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            attempt += 1
+            hold = breaker.hold_remaining()
+            if hold:
+                time.sleep(hold)
+            if not breaker.allow():
+                CIRCUIT_REJECTED.inc(endpoint=breaker.name)
+                raise CircuitOpenError(f"circuit open for {endpoint_key(url)}")
+
+            retry_after = None
+            try:
+                resp = send()
+            except retry_on as e:
+                breaker.failure()
+                if attempt >= self.max_attempts or not self.budget.withdraw():
+                    raise
+                print(f"{type(e).__name__} for {url}; retry {attempt}/{self.max_attempts - 1}")
+                RETRIES.inc(endpoint=breaker.name, reason=type(e).__name__)
+            else:
+                status = resp.status_code
+                if status not in self.statuses:
+                    breaker.success()
+                    return resp
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                if status == 429:
+                    # throttling is not an outage: slow the endpoint down, do not open the breaker
+                    breaker.throttle(retry_after if retry_after is not None else self.backoff(attempt))
+                else:
+                    breaker.failure()
+                if attempt >= self.max_attempts or not self.budget.withdraw():
+                    return resp
+                print(f"HTTP {status} for {url}; retry {attempt}/{self.max_attempts - 1}")
+                RETRIES.inc(endpoint=breaker.name, reason=status)
+            time.sleep(self.backoff(attempt, retry_after))
+
+    def stats(self) -> dict:
+        return {
+            "open_circuits": sorted(k for k, b in self._breakers.items() if b.state != "closed"),
+            "retry_budget_exhausted": self.budget.exhausted,
+        }
+
+
+_policy = None
+_policy_lock = threading.Lock()
+
+
+def get_policy() -> RetryPolicy:
+    """Return the process-wide policy, so breakers and the budget are shared by all fetchers."""
+    global _policy
+    if _policy is None:
+        with _policy_lock:
+            if _policy is None:
+                _policy = RetryPolicy()
+    return _policy
@@ -1,69 +1,248 @@
 import json
 import argparse
+import csv
+import glob
 import sys
 from datetime import datetime
 from pathlib import Path
 
+from artifact_writer import artifact_stem, iter_artifacts, read_artifact
+from json_stream import loads, iter_documents
+
+
+ROW_FIELDS = ["site_id", "date", "show_id", "starts_at", "time", "film_id", "title", "duration", "screen", "attributes"]
+
 
 def load_json_input(path: str | None):
+    """Return the one payload in a file, or on stdin when `path` is None."""
     if path:
-        p = Path(path)
-        return json.loads(p.read_text(encoding="utf-8"))
-    data = sys.stdin.read()
-    return json.loads(data)
+        return loads(Path(path).read_bytes())
+    return loads(sys.stdin.buffer.read())
+
+
+def iter_json_input(path: str | None):
+    """Yield every payload of a file, or of stdin when `path` is None.
+
+    The input may carry one payload, JSON Lines or concatenated payloads; each
+    is parsed as it arrives (incrementally when ijson is installed).
+    """
+    if path:
+        with open(path, "rb") as f:
+            yield from iter_documents(f)
+        return
+    yield from iter_documents(sys.stdin.buffer)
+
+
+def parse_start_times(isos):
+    """Parse a batch of ISO timestamps. Each distinct string is parsed once;
+    a payload has far fewer distinct start times than shows."""
+    cache = {}
+    out = []
+    for s in isos:
+        dt = cache.get(s)
+        if dt is None and s is not None:
+            dt = cache[s] = datetime.fromisoformat(s)
+        out.append(dt)
+    return out
+
+
+def _text(obj, key):
+    value = obj.get(key) or {}
+    return value.get('text') if isinstance(value, dict) else value
+
+
+def iter_schedule_rows(data, site_id: str | None = None, date: str | None = None, catalog=None):
+    """Yield one row per show of a payload, ordered by start time.
+
+    Lookup tables for films, screens and attributes are built once per payload.
+    Ids missing from relatedData are resolved from `catalog` (a
+    reference_data.Catalog) when one is given.
+    """
+    related = data.get('relatedData') or {}
+    films = {f['id']: (_text(f, 'title') or "Unknown Title", f"{f.get('runtimeInMinutes')} min")
+             for f in related.get('films', [])}
+    screens = {s['id']: _text(s, 'name') for s in related.get('screens', [])}
+    attrs = {a['id']: _text(a, 'name') for a in related.get('attributes', [])}
+
+    shows = data.get('showtimes', [])
+    isos = [(show.get('schedule') or {}).get('startsAt') for show in shows]
+    starts = parse_start_times(isos)
+    unknown_film = ("Unknown Title", "None min")
+
+    order = sorted(range(len(shows)), key=lambda i: (starts[i] is None, starts[i] or datetime.min))
+    for i in order:
+        show = shows[i]
+        film_id = show.get('filmId')
+        title, duration = films.get(film_id, unknown_film)
+        screen = screens.get(show.get('screenId'))
+        names = [attrs.get(a) for a in show.get('attributeIds', [])]
+        if catalog is not None:
+            if film_id not in films and catalog.film(film_id):
+                film = catalog.film(film_id)
+                title, duration = film.get('title') or title, f"{film.get('runtimeInMinutes')} min"
+            if screen is None:
+                screen = catalog.name('screens', show.get('screenId'))
+            names = [n or catalog.name('attributes', a) for n, a in zip(names, show.get('attributeIds', []))]
+        yield {
+            "site_id": site_id or show.get('siteId'),
+            "date": date,
+            "show_id": show.get('id'),
+            "starts_at": starts[i],
+            # the local wall-clock time is already in the string: ...T12:00:00+02:00
+            "time": isos[i][11:16] if isos[i] else None,
+            "film_id": film_id,
+            "title": title,
+            "duration": duration,
+            "screen": screen,
+            "attributes": ", ".join(a for a in names if a),
+        }
+
 
 def parse_finnkino_schedule(data):
     """Parse the Finnkino showtime JSON data into a structured schedule."""
-    films_map = {f['id']: f for f in data['relatedData']['films']}
-    screens_map = {s['id']: s for s in data['relatedData']['screens']}
-    attrs_map = {a['id']: a for a in data['relatedData']['attributes']}
-
-    parsed_schedule = []
-
-    for show in data['showtimes']:
-        film_id = show['filmId']
-        screen_id = show['screenId']
-        start_time_iso = show['schedule']['startsAt'] # '2026-01-02T12:00:00+02:00'
-        
-        film_details = films_map.get(film_id, {})
-        screen_details = screens_map.get(screen_id, {})
-        
-        # Clean up time (2026-01-02T12:00:00+02:00 -> 12:00)
-        dt_object = datetime.fromisoformat(start_time_iso)
-        time_str = dt_object.strftime("%H:%M")
-        
-
-        attributes = [attrs_map.get(attr_id, {}).get('name', {}).get('text') 
-                      for attr_id in show.get('attributeIds', [])]
-        attributes = [a for a in attributes if a]
-
-        movie_entry = {
-            "time": time_str,
-            "title": film_details.get('title', {}).get('text', "Unknown Title"),
-            "duration": f"{film_details.get('runtimeInMinutes')} min",
-            "screen": screen_details.get('name', {}).get('text'),
-            "attributes": ", ".join(attributes)
+    return [
+        {
+            "time": row["time"],
+            "title": row["title"],
+            "duration": row["duration"],
+            "screen": row["screen"],
+            "attributes": row["attributes"],
         }
-        
-        parsed_schedule.append(movie_entry)
+        for row in iter_schedule_rows(data)
+    ]
+
+
+def _site_and_date(path: Path):
+    # showtimes_<site>_<date>.json, possibly compressed
+    stem = artifact_stem(path)
+    if stem.startswith("showtimes_"):
+        site_id, _, date = stem[len("showtimes_"):].partition("_")
+        return site_id or None, date or None
+    return None, None
+
+
+def expand_inputs(patterns):
+    """Resolve files, directories (searched for showtimes_*.json) and glob patterns."""
+    seen = set()
+    for pattern in patterns:
+        p = Path(pattern)
+        if p.is_dir():
+            matches = iter_artifacts(p, "showtimes_*.json")
+        else:
+            matches = sorted(Path(m) for m in glob.glob(pattern, recursive=True)) or [p]
+        for m in matches:
+            if m not in seen:
+                seen.add(m)
+                yield m
+
+
+def iter_payloads(patterns):
+    """Yield (site_id, date, payload) for every input file."""
+    for path in expand_inputs(patterns):
+        site_id, date = _site_and_date(path)
+        yield site_id, date, loads(read_artifact(path))
+
+
+def parse_schedules(payloads, sort: bool = True, catalog=None):
+    """Parse many (site_id, date, payload) tuples.
+
+    With sort=True, all rows are ordered by actual start timestamp across
+    sites and days; otherwise rows stream lazily payload by payload.
+    """
+    rows = (row for site_id, date, data in payloads for row in iter_schedule_rows(data, site_id, date, catalog))
+    if not sort:
+        return rows
+    return iter(sorted(rows, key=lambda r: (r["starts_at"] is None, r["starts_at"] or datetime.min, r["site_id"] or "")))
+
+
+def iter_batches(rows, size: int = 10000):
+    """Group rows into lists of at most `size` for batch writers."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _serializable(row):
+    out = dict(row)
+    if out["starts_at"] is not None:
+        out["starts_at"] = out["starts_at"].isoformat()
+    return out
+
+
+def write_rows(rows, fmt: str, out):
+    if fmt == "table":
+        out.write(f"{'TIME':<8} | {'SCREEN':<8} | {'TITLE'}\n")
+        out.write("-" * 50 + "\n")
+        for movie in rows:
+            out.write(f"{movie['time']:<8} | {movie['screen']:<8} | {movie['title']}\n")
+    elif fmt == "csv":
+        writer = csv.DictWriter(out, fieldnames=ROW_FIELDS)
+        writer.writeheader()
+        for batch in iter_batches(rows):
+            writer.writerows(_serializable(r) for r in batch)
+    elif fmt == "jsonl":
+        for batch in iter_batches(rows):
+            out.write("".join(json.dumps(_serializable(r), ensure_ascii=False) + "\n" for r in batch))
+    else:
+        raise ValueError(f"Unsupported format {fmt}")
+
+
+def write_parquet(rows, path: str):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise SystemExit("Parquet output needs pyarrow: python3 -m pip install pyarrow")
+    writer = None
+    try:
+        for batch in iter_batches(rows):
+            table = pa.Table.from_pylist(batch)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression="zstd")
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
 
-    parsed_schedule.sort(key=lambda x: x['time'])
 
-    return parsed_schedule
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse Finnkino schedule JSON from files or stdin")
+    parser.add_argument("--input", "-i", action="append", default=[],
+                        help="Showtimes JSON file, directory or glob (repeatable). If omitted, reads one or more payloads from stdin.")
+    parser.add_argument("--format", "-f", choices=["table", "csv", "jsonl", "parquet"], default="table")
+    parser.add_argument("--output", "-o", default=None, help="Output file (required for parquet). Defaults to stdout.")
+    parser.add_argument("--no-sort", action="store_true", help="Stream rows per input instead of sorting by start time")
+    parser.add_argument("--catalog", action="store_true",
+                        help="Resolve ids missing from relatedData from the reference data catalog")
+    args = parser.parse_args(argv)
 
-def main():
-    parser = argparse.ArgumentParser(description="Parse Finnkino schedule JSON from file or stdin")
-    parser.add_argument("--input", "-i", help="Path to showtimes JSON file (optional). If omitted, reads stdin.")
-    args = parser.parse_args()
+    if args.input:
+        payloads = iter_payloads(args.input)
+    else:
+        payloads = ((None, None, data) for data in iter_json_input(None))
+    catalog = None
+    if args.catalog:
+        from reference_data import get_catalog
+        catalog = get_catalog().ensure_fresh()
+    rows = parse_schedules(payloads, sort=not args.no_sort, catalog=catalog)
 
-    json_data = load_json_input(args.input)
-    schedule = parse_finnkino_schedule(json_data)
+    if args.format == "parquet":
+        if not args.output:
+            raise SystemExit("--output is required for parquet")
+        write_parquet(rows, args.output)
+        return
 
-    print(f"{'TIME':<8} | {'SCREEN':<8} | {'TITLE'}")
-    print("-" * 50)
-    for movie in schedule:
-        print(f"{movie['time']:<8} | {movie['screen']:<8} | {movie['title']}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as f:
+            write_rows(rows, args.format, f)
+    else:
+        write_rows(rows, args.format, sys.stdout)
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,81 @@
+"""Manifest of showtime fetches used by incremental scrapes.
+
+Records a content hash and fetch time per (site, date) so a run can skip
+dates that are still fresh under config.FRESHNESS_POLICY and leave files
+alone when the payload did not change.
+"""
+import datetime
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from config import FRESHNESS_POLICY
+from artifact_writer import atomic_write
+from data_paths import DATA_DIR, parse_date
+
+
+MANIFEST_FILE = DATA_DIR / "manifest.json"
+
+
+def content_hash(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+
+def payload_hash(data) -> str:
+    """Hash of a parsed payload, independent of key order and whitespace.
+
+    Single-site and multi-site fetches both record this, so switching
+    between them does not count as a change.
+    """
+    return content_hash(json.dumps(data, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+
+def max_age_for(days_ahead: int, policy=FRESHNESS_POLICY) -> int:
+    for bound, max_age in policy:
+        if bound is None or days_ahead <= bound:
+            return max_age
+    return policy[-1][1]
+
+
+class ScrapeManifest:
+    def __init__(self, path: Path = MANIFEST_FILE, policy=FRESHNESS_POLICY):
+        self.path = Path(path)
+        self.policy = policy
+        self.entries = {}
+        self.changed = 0
+        self.unchanged = 0
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @staticmethod
+    def _key(site_id: str, date: str) -> str:
+        return f"{site_id}|{date}"
+
+    def is_due(self, site_id: str, date: str, today: datetime.date | None = None, now: float | None = None) -> bool:
+        """False for past dates and for dates fetched recently enough for their distance."""
+        today = today or datetime.date.today()
+        days_ahead = (parse_date(date) - today).days
+        if days_ahead < 0:
+            return False
+        entry = self.entries.get(self._key(site_id, date))
+        if not entry:
+            return True
+        now = time.time() if now is None else now
+        return now - entry["fetched_at"] >= max_age_for(days_ahead, self.policy)
+
+    def record(self, site_id: str, date: str, digest: str) -> bool:
+        """Store a fetch result; return True when the content hash changed."""
+        key = self._key(site_id, date)
+        previous = self.entries.get(key, {}).get("hash")
+        self.entries[key] = {"hash": digest, "fetched_at": time.time()}
+        if previous == digest:
+            self.unchanged += 1
+            return False
+        self.changed += 1
+        return True
+
+    def save(self):
+        atomic_write(self.path, json.dumps(self.entries, indent=1, sort_keys=True))
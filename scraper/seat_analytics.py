@@ -0,0 +1,350 @@
+"""Fill-rate analytics over stored seat-availability snapshots (needs numpy).
+
+Every show's polls are loaded into a seat x snapshot status matrix (uint8
+codes, see AVAILABLE/SOLD/RESERVED/OTHER). The per-snapshot counts of all
+shows of a week are concatenated into one SnapshotTable, and every
+aggregate (final fill rate, occupancy curves, sell-through velocity, grouped
+by film, site, start hour or date) is a handful of numpy reductions over it.
+Snapshot files are parsed in a process pool, one task per show.
+
+Both storage layouts are read: per-poll files in
+data/<year>/week_NN/seat_availability/ and base + delta series in
+data/<year>/week_NN/seat_series/. Show metadata comes from the week's
+showtimes files, with films and screens their relatedData lacks resolved
+from the reference data catalog.
+
+    python3 scraper/seat_analytics.py fill 2026-W01 --by film
+    python3 scraper/seat_analytics.py velocity 2026-01-02 --by site
+    python3 scraper/seat_analytics.py curve 2026-W01 --by hour
+    python3 scraper/seat_analytics.py curve 2026-W01 --show 1004-20260102-001
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date as Date
+from pathlib import Path
+
+from artifact_writer import artifact_name, read_artifact
+from data_paths import week_dir, seat_availability_dir
+from seat_snapshots import extract_seats, SeatSeries
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+MISSING, AVAILABLE, SOLD, RESERVED, OTHER = 0, 1, 2, 3, 4
+
+_SOLD_WORDS = ("sold", "occupied", "taken", "booked", "purchased")
+_RESERVED_WORDS = ("reserved", "held", "locked", "selected")
+_AVAILABLE_WORDS = ("available", "free", "empty", "open")
+_codes: dict = {}
+
+GROUP_KEYS = ("film", "site", "hour", "date", "show")
+# minutes before start at which occupancy curves are reported
+CURVE_POINTS = (7 * 1440, 3 * 1440, 1440, 720, 360, 120, 60, 30, 0)
+
+
+def _require_numpy():
+    if np is None:
+        raise SystemExit("Seat analytics needs numpy: python3 -m pip install numpy")
+
+
+def status_code(status) -> int:
+    """Map a provider status string to AVAILABLE, SOLD, RESERVED or OTHER."""
+    code = _codes.get(status)
+    if code is None:
+        s = str(status).lower()
+        if any(w in s for w in _SOLD_WORDS):
+            code = SOLD
+        elif any(w in s for w in _RESERVED_WORDS):
+            code = RESERVED
+        elif any(w in s for w in _AVAILABLE_WORDS) and "unavailable" not in s and "not" not in s:
+            code = AVAILABLE
+        else:
+            code = OTHER
+        _codes[status] = code
+    return code
+
+
+def status_matrix(states: list[dict]):
+    """Return (seat ids, uint8 matrix of seats x snapshots) for a list of {seat: status}."""
+    _require_numpy()
+    seat_ids = sorted(set().union(*states)) if states else []
+    index = {s: i for i, s in enumerate(seat_ids)}
+    matrix = np.zeros((len(seat_ids), len(states)), dtype=np.uint8)
+    for j, state in enumerate(states):
+        rows = np.fromiter((index[k] for k in state), dtype=np.intp, count=len(state))
+        matrix[rows, j] = np.fromiter((status_code(v) for v in state.values()), dtype=np.uint8, count=len(state))
+    return seat_ids, matrix
+
+
+def _file_states(files) -> tuple[list, list]:
+    times, states = [], []
+    for path, mtime in sorted(files, key=lambda f: f[1]):
+        try:
+            states.append(extract_seats(json.loads(read_artifact(path))))
+        except (OSError, ValueError):
+            continue
+        times.append(mtime)
+    return times, states
+
+
+def _series_states(base_path) -> tuple[list, list]:
+    series = SeatSeries.load(Path(base_path))
+    return list(series.times), [series.state_at(t) for t in series.times]
+
+
+def load_show(files=(), series_base=None):
+    """(times, seat ids, status matrix) for one show from per-poll files and/or a series."""
+    times, states = _file_states(files)
+    if series_base is not None:
+        t2, s2 = _series_states(series_base)
+        merged = sorted(zip(times + t2, range(len(times) + len(t2)), states + s2))
+        times, states = [m[0] for m in merged], [m[2] for m in merged]
+    seat_ids, matrix = status_matrix(states)
+    return np.asarray(times, dtype=np.float64), seat_ids, matrix
+
+
+def _show_counts(task):
+    """Worker: per-snapshot counts for one show."""
+    show_id, files, series_base = task
+    times, _, matrix = load_show(files, series_base)
+    sold = (matrix == SOLD).sum(axis=0, dtype=np.int32)
+    reserved = (matrix == RESERVED).sum(axis=0, dtype=np.int32)
+    capacity = sold + reserved + (matrix == AVAILABLE).sum(axis=0, dtype=np.int32)
+    return show_id, times, sold, reserved, capacity
+
+
+def parse_week(week: str) -> str:
+    """Accept YYYY-Www or any date in the week; return a date string inside it."""
+    if "-W" in week:
+        year, _, num = week.partition("-W")
+        return Date.fromisocalendar(int(year), int(num), 1).isoformat()
+    return week
+
+
+def find_snapshots(date: str) -> dict:
+    """{show id: (per-poll files with mtimes, series base path or None)} for the week of `date`."""
+    shows = {}
+    poll_dir = seat_availability_dir(date)
+    if poll_dir.is_dir():
+        with os.scandir(poll_dir) as entries:
+            for entry in entries:
+                # seat_availability_<show id>_<HHMMSS>[-<microseconds>].json, possibly compressed
+                name = artifact_name(entry.name)
+                if not (name.startswith("seat_availability_") and name.endswith(".json")):
+                    continue
+                show_id = name[len("seat_availability_"):-len(".json")].rpartition("_")[0]
+                shows.setdefault(show_id, [[], None])[0].append((entry.path, entry.stat().st_mtime))
+    series_dir = week_dir(date) / "seat_series"
+    if series_dir.is_dir():
+        for base in series_dir.glob("*.base.json"):
+            shows.setdefault(base.name[:-len(".base.json")], [[], None])[1] = str(base)
+    return {k: (v[0], v[1]) for k, v in shows.items()}
+
+
+def load_show_meta(date: str) -> dict:
+    """{show id: {site, film, title, starts_at, hour, date}} from the week's showtimes files."""
+    from reference_data import get_catalog
+    from schedule_parse import iter_payloads, iter_schedule_rows
+
+    meta = {}
+    wdir = week_dir(date)
+    if not wdir.is_dir():
+        return meta
+    # the stored snapshot only: analytics never waits on a refresh
+    catalog = get_catalog()
+    for site_id, d, data in iter_payloads([str(wdir)]):
+        for row in iter_schedule_rows(data, site_id, d, catalog):
+            starts = row["starts_at"]
+            meta[row["show_id"]] = {
+                "site": row["site_id"], "film": row["film_id"], "title": row["title"], "date": row["date"],
+                "starts_at": starts.timestamp() if starts else None, "hour": starts.hour if starts else None,
+            }
+    return meta
+
+
+class SnapshotTable:
+    """Per-snapshot counts of many shows as flat arrays, sorted by (show, time)."""
+
+    def __init__(self, results, meta: dict):
+        _require_numpy()
+        results = [r for r in results if len(r[1])]
+        self.shows = [r[0] for r in results]
+        lengths = np.array([len(r[1]) for r in results], dtype=np.intp)
+        self.show_idx = np.repeat(np.arange(len(results), dtype=np.int32), lengths)
+        cat = (lambda i, dtype: np.concatenate([r[i] for r in results]).astype(dtype)) if results else \
+            (lambda i, dtype: np.zeros(0, dtype=dtype))
+        self.t = cat(1, np.float64)
+        self.sold = cat(2, np.int32)
+        self.reserved = cat(3, np.int32)
+        self.capacity = cat(4, np.int32)
+        self.meta = [meta.get(s, {}) for s in self.shows]
+        self.starts_at = np.array([m.get("starts_at") or np.nan for m in self.meta], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.t)
+
+    def group_codes(self, key: str):
+        """(per-show group code array, group labels) for key in GROUP_KEYS."""
+        if key == "show":
+            return np.arange(len(self.shows)), list(self.shows)
+        values = [m.get(key) if key != "film" else (m.get("title") or m.get("film")) for m in self.meta]
+        labels = sorted({str(v) for v in values}, key=lambda s: (0, int(s), "") if s.isdigit() else (1, 0, s))
+        index = {label: i for i, label in enumerate(labels)}
+        return np.array([index[str(v)] for v in values], dtype=np.intp), labels
+
+    def _last_before_start(self):
+        """Index of each show's last snapshot taken before it started (or its last snapshot)."""
+        start = self.starts_at[self.show_idx]
+        ok = np.isnan(start) | (self.t <= start)
+        idx = np.flatnonzero(ok)
+        if not len(idx):
+            return idx
+        s = self.show_idx[idx]
+        return idx[np.r_[s[1:] != s[:-1], True]]
+
+    def final(self):
+        """(show indices, sold, capacity) at each show's last snapshot before start."""
+        last = self._last_before_start()
+        return self.show_idx[last], self.sold[last], self.capacity[last]
+
+    def fill_by(self, key: str):
+        """[(label, shows, sold, capacity, fill rate)] from each show's final snapshot."""
+        shows, sold, capacity = self.final()
+        codes, labels = self.group_codes(key)
+        g = codes[shows]
+        n = np.bincount(g, minlength=len(labels))
+        s = np.bincount(g, weights=sold, minlength=len(labels))
+        c = np.bincount(g, weights=capacity, minlength=len(labels))
+        fill = np.divide(s, c, out=np.zeros(len(labels)), where=c > 0)
+        return [(labels[i], int(n[i]), int(s[i]), int(c[i]), float(fill[i])) for i in np.flatnonzero(n)]
+
+    def velocity_by(self, key: str, hours: float | None = None):
+        """[(label, seats sold, hours observed, seats/hour)] between consecutive polls before start.
+
+        With `hours`, only polls within that many hours before the start count.
+        """
+        same = self.show_idx[1:] == self.show_idx[:-1]
+        start = self.starts_at[self.show_idx[1:]]
+        mask = same & (np.isnan(start) | (self.t[1:] <= start))
+        if hours is not None:
+            mask &= ~np.isnan(start) & (start - self.t[:-1] <= hours * 3600)
+        dsold = (self.sold[1:] - self.sold[:-1])[mask]
+        dt = (self.t[1:] - self.t[:-1])[mask]
+        codes, labels = self.group_codes(key)
+        g = codes[self.show_idx[1:][mask]]
+        s = np.bincount(g, weights=dsold, minlength=len(labels))
+        h = np.bincount(g, weights=dt, minlength=len(labels)) / 3600
+        v = np.divide(s, h, out=np.zeros(len(labels)), where=h > 0)
+        return [(labels[i], int(s[i]), float(h[i]), float(v[i])) for i in np.flatnonzero(h)]
+
+    def curve(self, show_id: str):
+        """[(t, minutes before start, sold, capacity, fill)] for one show."""
+        i = self.shows.index(show_id)
+        rows = np.flatnonzero(self.show_idx == i)
+        start = self.starts_at[i]
+        out = []
+        for r in rows:
+            cap = self.capacity[r]
+            before = (start - self.t[r]) / 60 if not np.isnan(start) else None
+            out.append((float(self.t[r]), before, int(self.sold[r]), int(cap), self.sold[r] / cap if cap else 0.0))
+        return out
+
+    def curve_by(self, key: str, points=CURVE_POINTS):
+        """{label: [mean fill at each of `points` minutes before start]} over shows with a known start.
+
+        Each show contributes its latest snapshot taken at or before each point.
+        """
+        codes, labels = self.group_codes(key)
+        start = self.starts_at[self.show_idx]
+        before = (start - self.t) / 60
+        fill = np.divide(self.sold, self.capacity, out=np.zeros(len(self.t)), where=self.capacity > 0)
+        out = {label: [] for label in labels}
+        n_groups = len(labels)
+        for p in points:
+            ok = ~np.isnan(before) & (before >= p)
+            idx = np.flatnonzero(ok)
+            s = self.show_idx[idx]
+            last = idx[np.r_[s[1:] != s[:-1], True]] if len(idx) else idx
+            g = codes[self.show_idx[last]]
+            total = np.bincount(g, weights=fill[last], minlength=n_groups)
+            n = np.bincount(g, minlength=n_groups)
+            mean = np.divide(total, n, out=np.full(n_groups, np.nan), where=n > 0)
+            for i, label in enumerate(labels):
+                out[label].append(float(mean[i]))
+        return out
+
+
+def load_week(date: str, workers: int | None = None) -> SnapshotTable:
+    """Load every seat snapshot of the week containing `date` into a SnapshotTable."""
+    _require_numpy()
+    date = parse_week(date)
+    snapshots = find_snapshots(date)
+    meta = load_show_meta(date)
+    tasks = [(show_id, files, series) for show_id, (files, series) in sorted(snapshots.items())]
+    if workers == 1 or len(tasks) < 8:
+        results = [_show_counts(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_show_counts, tasks, chunksize=max(1, len(tasks) // (4 * (workers or os.cpu_count() or 1)))))
+    return SnapshotTable(results, meta)
+
+
+def _before_label(minutes: int) -> str:
+    if minutes >= 1440 and minutes % 1440 == 0:
+        return f"T-{minutes // 1440}d"
+    if minutes >= 60:
+        return f"T-{minutes // 60}h"
+    return f"T-{minutes}m" if minutes else "start"
+
+
+def _print_rows(header, rows, fmt):
+    print(header)
+    for row in rows:
+        print(fmt.format(*row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Seat fill-rate analytics over stored seat snapshots")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (("fill", "Fill rate at each show's last poll before start"),
+                            ("velocity", "Seats sold per hour between polls"),
+                            ("curve", "Occupancy curve of one show, or mean curves per group")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("week", help="YYYY-Www or any date in the week")
+        p.add_argument("--by", choices=GROUP_KEYS, default="film")
+        p.add_argument("--workers", type=int, default=None, help="Processes for loading snapshots")
+        p.add_argument("--top", type=int, default=None, help="Only print the first N groups")
+        if name == "velocity":
+            p.add_argument("--hours", type=float, default=None, help="Only polls within this many hours before start")
+        if name == "curve":
+            p.add_argument("--show", default=None, help="Print the full curve of one show")
+    args = parser.parse_args()
+
+    table = load_week(args.week, workers=args.workers)
+    print(f"{len(table.shows)} shows, {len(table)} snapshots")
+
+    if args.command == "fill":
+        rows = sorted(table.fill_by(args.by), key=lambda r: -r[4])[:args.top]
+        _print_rows(f"{args.by:<40} {'shows':>6} {'sold':>7} {'seats':>7}  fill",
+                    rows, "{:<40.40} {:>6} {:>7} {:>7}  {:5.1%}")
+    elif args.command == "velocity":
+        rows = sorted(table.velocity_by(args.by, args.hours), key=lambda r: -r[3])[:args.top]
+        _print_rows(f"{args.by:<40} {'sold':>7} {'hours':>8}  seats/h", rows, "{:<40.40} {:>7} {:>8.1f}  {:7.2f}")
+    elif args.show:
+        _print_rows(f"{'minutes before':>14} {'sold':>6} {'seats':>6}  fill",
+                    [(m if m is not None else float("nan"), s, c, f) for _, m, s, c, f in table.curve(args.show)],
+                    "{:>14.0f} {:>6} {:>6}  {:5.1%}")
+    else:
+        curves = table.curve_by(args.by)
+        print(f"{args.by:<32}" + "".join(f"{_before_label(p):>8}" for p in CURVE_POINTS))
+        for label, values in list(curves.items())[:args.top]:
+            print(f"{label:<32.32}" + "".join(f"{v:>8.1%}" if v == v else f"{'-':>8}" for v in values))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,93 +1,311 @@
 from pathlib import Path
+import asyncio
+import itertools
 import json
 import datetime
+import math
+import time
 from typing import List, Optional, Dict
-from config import SEAT_AVAILABILITY
+from config import SEAT_AVAILABILITY, SEAT_STORE, SEAT_SWEEP_WINDOW_HOURS
 from bearer_token import get_bearer_token
-from playwright.sync_api import sync_playwright
+from http_client import get_client
+from data_paths import showtimes_path, seat_availability_dir
+from artifact_writer import find_artifact, unique_path, write_artifact
+from artifact_index import get_index, SHOWTIMES, SEAT_SERIES as SEAT_SERIES_KIND, SEAT_AVAILABILITY as SEAT_AVAILABILITY_KIND
+from json_stream import encode_payload, iter_items, loads
+import metrics
+from showtime_scraper import BYTES_WRITTEN
+
+
+# statuses that mean the plain HTTP client is being bot-blocked
+SWEEP_BLOCKED_STATUSES = (403,)
 
 
 def _find_showtimes_file(site_id: str, date: str) -> Optional[Path]:
-    data_root = Path(__file__).parent / "data"
-    pattern = f"showtimes_{site_id}_{date}.json"
-    for p in data_root.rglob(pattern):
+    # the path follows from the date; the index covers files written under another layout
+    p = find_artifact(showtimes_path(site_id, date))
+    if p is not None:
+        return p
+    p = get_index().latest(SHOWTIMES, site_id=site_id, date=date)
+    if p is not None and p.exists():
         return p
     return None
 
 
+def _show_entry(s: Dict) -> Optional[Dict]:
+    sid = s.get("id") or s.get("showId") or s.get("show_id")
+    if not sid:
+        return None
+    sched = s.get("schedule")
+    return {"id": sid, "startsAt": sched.get("startsAt") if sched else None, "filmId": s.get("filmId")}
+
+
+def shows_from_payload(data) -> List[Dict]:
+    """Return the shows of an already parsed showtimes payload, like get_show_ids_from_existing."""
+    entries = (_show_entry(s) for s in (data or {}).get("showtimes") or [])
+    return [e for e in entries if e]
+
+
 def get_show_ids_from_existing(site_id: str, date: str) -> List[Dict]:
     """Return list of shows found in existing showtimes JSON for site and date.
-    Each item: {'id': show_id, 'startsAt': startsAt}
+    Each item: {'id': show_id, 'startsAt': startsAt, 'filmId': filmId}
     """
     p = _find_showtimes_file(site_id, date)
     if not p:
         return []
     try:
-        data = json.loads(p.read_text(encoding="utf-8"))
-        out = []
-        for s in data.get("showtimes", []):
-            sid = s.get("id") or s.get("showId") or s.get("show_id")
-            starts = None
-            sched = s.get("schedule")
-            if sched:
-                starts = sched.get("startsAt")
-            if sid:
-                out.append({"id": sid, "startsAt": starts})
-        return out
+        # only the showtimes array is parsed, item by item; relatedData is skipped
+        entries = (_show_entry(s) for s in iter_items(p, "showtimes.item"))
+        return [e for e in entries if e]
     except Exception:
         return []
 
 
+def show_start(show: Dict) -> Optional[float]:
+    """Epoch seconds of a show's startsAt (local time if it has no offset), or None."""
+    try:
+        return datetime.datetime.fromisoformat(show["startsAt"]).timestamp()
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def select_shows(shows: List[Dict], now: Optional[float] = None, window_hours: Optional[float] = None,
+                 include_started: bool = False) -> List[Dict]:
+    """Order shows by start time, earliest first, dropping ones not worth a seat map.
+
+    Started shows are dropped unless `include_started`; with `window_hours`,
+    so are shows starting later than that. Shows without a start time go last
+    and are only kept when there is no window.
+    """
+    now = time.time() if now is None else now
+    keyed = []
+    for show in shows:
+        start = show_start(show)
+        if start is None:
+            if window_hours:
+                continue
+        elif (start <= now and not include_started) or (window_hours and start > now + window_hours * 3600):
+            continue
+        keyed.append((math.inf if start is None else start, show))
+    keyed.sort(key=lambda item: item[0])
+    return [show for _, show in keyed]
+
+
 def _make_output_path_for_show(show_id: str, date: str) -> Path:
-    # determine year/week from date
+    # time of scraping (HHMMSS-microseconds) in the name; repeated polls never collide
+    return unique_path(seat_availability_dir(date), f"seat_availability_{show_id}_")
+
+
+def _save_seat_availability(body: bytes, show_id: str, date: str, site_id: Optional[str] = None) -> Path:
+    """Store one poll in the backends selected by config.SEAT_STORE; returns the written path.
+
+    Per-poll files get the response body as received; it is only parsed for
+    the series store.
+    """
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    data = None
+    if SEAT_STORE in ("series", "both"):
+        try:
+            data = loads(body)
+        except ValueError:
+            pass
+
+    out_path = None
+    if data is not None:
+        from seat_snapshots import get_store
+        with metrics.span("append_seat_series"):
+            out_path = get_store().append(show_id, date, data)
+            get_index().record(SEAT_SERIES_KIND, get_store().base_path(show_id, date), site_id=site_id, date=date, show_id=show_id)
+    if SEAT_STORE in ("files", "both") or out_path is None:
+        with metrics.span("write_seat_availability"):
+            out_path = _make_output_path_for_show(show_id, date)
+            raw = encode_payload(data, body)
+            out_path = write_artifact(out_path, raw)
+            get_index().record(SEAT_AVAILABILITY_KIND, out_path, site_id=site_id, date=date, show_id=show_id)
+        BYTES_WRITTEN.inc(len(raw), kind=SEAT_AVAILABILITY_KIND)
+    print(f"Saved seat availability to {out_path}")
+    return out_path
+
+
+def fetch_seat_availability(token: str, show_id: str, date: str) -> Optional[Path]:
+    """Fetch seat availability over the shared HTTP client."""
+    url = SEAT_AVAILABILITY.format(show_id=show_id)
+    client = get_client()
+    client.set_token(token)
     try:
-        dt = datetime.date.fromisoformat(date)
-    except Exception:
-        # try D.M.YYYY
-        parts = date.split('.')
-        if len(parts) == 3:
-            d, m, y = int(parts[0]), int(parts[1]), int(parts[2])
-            dt = datetime.date(y, m, d)
-        else:
-            dt = datetime.date.today()
-    year, week, _ = dt.isocalendar()
-    data_dir = Path(__file__).parent / "data" / str(year) / f"week_{week:02d}" / "seat_availability"
-    data_dir.mkdir(parents=True, exist_ok=True)
-    # include time of scraping in filename (HHMMSS)
-    ts = datetime.datetime.now().strftime("%H%M%S")
-    return data_dir / f"seat_availability_{show_id}_{ts}.json"
+        with metrics.span("fetch_seat_availability", show_id=show_id):
+            resp = client.get(url, headers={"Accept": "application/json"}, auth=True)
+    except Exception as e:
+        print(f"Request error for seat availability {show_id}: {e}")
+        return None
+    if resp.status_code != 200:
+        print(f"Seat availability {show_id} returned HTTP {resp.status_code}")
+        return None
+    return _save_seat_availability(resp.content, show_id, date)
 
 
-def fetch_seat_availability_playwright(token: str, show_id: str, date: str) -> Optional[Path]:
+def _fetch_with_request_context(req_ctx, show_id: str, date: str) -> Optional[Path]:
     url = SEAT_AVAILABILITY.format(show_id=show_id)
-    out_path = _make_output_path_for_show(show_id, date)
+    try:
+        resp = req_ctx.get(url, timeout=30000)
+    except Exception as e:
+        print(f"Playwright request error for seat availability {show_id}: {e}")
+        return None
+    return _save_seat_availability(resp.body(), show_id, date)
 
+
+def _new_request_context(p, token: str):
     headers = {"Authorization": f"{token}", "Accept": "application/json"}
+    return p.request.new_context(extra_http_headers={"User-Agent": "Mozilla/5.0", **headers})
+
+
+def fetch_seat_availability_playwright(token: str, show_id: str, date: str) -> Optional[Path]:
+    from playwright.sync_api import sync_playwright
 
     with sync_playwright() as p:
-        req_ctx = p.request.new_context(extra_http_headers={"User-Agent": "Mozilla/5.0", **headers})
+        req_ctx = _new_request_context(p, token)
         try:
-            resp = req_ctx.get(url, timeout=30000)
-        except Exception as e:
+            return _fetch_with_request_context(req_ctx, show_id, date)
+        finally:
             req_ctx.dispose()
-            print(f"Playwright request error for seat availability {show_id}: {e}")
-            return None
 
+
+def fetch_seat_availability_playwright_many(token: str, show_ids: List[str], date: str) -> List[Path]:
+    """Fetch several shows over one shared Playwright request context."""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        req_ctx = _new_request_context(p, token)
         try:
-            text = resp.text()
-            try:
-                data = json.loads(text)
-                out_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-            except Exception:
-                out_path.write_text(text, encoding="utf-8")
-            print(f"Saved seat availability to {out_path}")
-            return out_path
+            paths = [_fetch_with_request_context(req_ctx, sid, date) for sid in show_ids]
         finally:
             req_ctx.dispose()
+    return [p for p in paths if p]
+
+
+async def _sweep(engine, site_ids: List[str], date: str, stream, window_hours: Optional[float] = None,
+                 include_started: bool = False) -> Dict:
+    """Fetch seat maps for the shows of `site_ids`, earliest start first.
+
+    Sites without stored showtimes are fetched in the same run, and their
+    shows go from the response straight to the seat fetchers, which start as
+    soon as the first site's shows are known.
+    """
+    result = {"saved": [], "blocked": [], "failed": [], "planned": 0, "skipped": 0}
+    pending = asyncio.PriorityQueue()
+    order = itertools.count()
+    now = time.time()
+    if stream is not None:
+        from reference_data import get_catalog
+        catalog = get_catalog()
+
+    async def plan(site_id):
+        shows = await engine.in_executor(get_show_ids_from_existing, site_id, date)
+        if not shows:
+            _, body = await engine.fetch_showtimes_payload(site_id, date)
+            try:
+                shows = shows_from_payload(loads(body)) if body else []
+            except ValueError:
+                shows = []
+        selected = select_shows(shows, now, window_hours, include_started)
+        result["planned"] += len(selected)
+        result["skipped"] += len(shows) - len(selected)
+        for show in selected:
+            pending.put_nowait((show_start(show) or math.inf, next(order), site_id, show))
+
+    async def one(site_id, show):
+        show_id = show["id"]
+        # once the plain client is blocked, leave the rest for the Playwright fallback
+        if result["blocked"]:
+            result["blocked"].append(show_id)
+            return
+        url = SEAT_AVAILABILITY.format(show_id=show_id)
+        try:
+            resp = await engine.fetch(url, headers={"Accept": "application/json"})
+        except Exception as e:
+            print(f"Request error for seat availability {show_id}: {e}")
+            result["failed"].append(show_id)
+            return
+        if resp.status_code in SWEEP_BLOCKED_STATUSES:
+            print(f"Seat availability {show_id} blocked with HTTP {resp.status_code}")
+            result["blocked"].append(show_id)
+            return
+        if resp.status_code != 200:
+            print(f"Seat availability {show_id} returned HTTP {resp.status_code}")
+            result["failed"].append(show_id)
+            return
+        out_path = await engine.in_executor(_save_seat_availability, resp.content, show_id, date, site_id)
+        result["saved"].append(out_path)
+        if stream is not None:
+            # the film title comes from the reference data catalog, not a re-read of relatedData
+            film_id = show.get("filmId")
+            stream.write(json.dumps({"siteId": site_id, "showId": show_id, "date": date, "filmId": film_id,
+                                     "title": catalog.name("films", film_id), "path": str(out_path)},
+                                    ensure_ascii=False) + "\n")
+            stream.flush()
+
+    async def fetcher():
+        while True:
+            _, _, site_id, show = await pending.get()
+            if site_id is None:
+                return
+            await one(site_id, show)
+
+    fetchers = [asyncio.create_task(fetcher()) for _ in range(engine.concurrency)]
+    await asyncio.gather(*(plan(sid) for sid in site_ids))
+    print(f"Sweeping seat availability for {result['planned']} shows at {len(site_ids)} sites on {date}"
+          f" ({result['skipped']} started or outside the window)")
+    for _ in fetchers:
+        # sorts after every show, so fetchers drain the queue before stopping
+        pending.put_nowait((math.inf, next(order), None, None))
+    await asyncio.gather(*fetchers)
+    return result
+
+
+def sweep_seat_availability(site_ids: List[str], date: str, token: Optional[str] = None, concurrency: Optional[int] = None,
+                            rate: Optional[float] = None, stream_path: Optional[str] = None,
+                            window_hours: Optional[float] = SEAT_SWEEP_WINDOW_HOURS or None,
+                            include_started: bool = False) -> List[Path]:
+    """Fetch seat availability for every show of `site_ids` on `date` concurrently.
+
+    Shows are fetched earliest start first; started shows and, with
+    `window_hours`, shows further ahead are skipped (see select_shows).
+    Seat maps are written as each response arrives; `stream_path` additionally
+    gets one JSON line per saved map. Shows the plain client could not fetch
+    because of a bot block are retried over one shared Playwright context.
+    """
+    from async_scrape import ScrapeEngine
 
+    if token is None:
+        token = get_bearer_token()
+    engine = ScrapeEngine(token, concurrency=concurrency, rate=rate)
+    started = time.monotonic()
+    stream = open(stream_path, "a", encoding="utf-8") if stream_path else None
+    try:
+        try:
+            result = asyncio.run(_sweep(engine, list(site_ids), date, stream, window_hours, include_started))
+        finally:
+            engine.close()
+
+        saved = result["saved"]
+        if result["blocked"]:
+            print(f"{len(result['blocked'])} shows blocked, falling back to a shared Playwright context")
+            for path in fetch_seat_availability_playwright_many(engine.client.token(), result["blocked"], date):
+                saved.append(path)
+                if stream is not None:
+                    stream.write(json.dumps({"date": date, "path": str(path)}) + "\n")
+    finally:
+        if stream is not None:
+            stream.close()
+        metrics.export_run("seat_sweep")
+
+    print(f"Saved {len(saved)} seat maps in {time.monotonic() - started:.1f}s ({len(result['failed'])} failed)")
+    return saved
 
-def ensure_showtimes_and_get_show_ids(site_id: str, date: str) -> List[Dict]:
-    """Ensure showtimes JSON exists for site/date. If missing and `entry` provided, try to fetch it using showtime scraper.
+
+def ensure_showtimes_and_get_show_ids(site_id: str, date: str, token: Optional[str] = None) -> List[Dict]:
+    """Return the shows for site/date, fetching (and saving) the showtimes if none are stored yet.
     Returns list of show dicts.
     """
     shows = get_show_ids_from_existing(site_id, date)
@@ -95,30 +313,55 @@ def ensure_showtimes_and_get_show_ids(site_id: str, date: str) -> List[Dict]:
         return shows
 
     # import here to avoid circular imports
-    from showtime_scraper import get_theater_showtimes_by_date
-
-    token = get_bearer_token()
+    from showtime_scraper import fetch_showtimes_payload
 
-    get_theater_showtimes_by_date(token, date=date)
-    # after fetching, try again
-    return get_show_ids_from_existing(site_id, date)
+    body = fetch_showtimes_payload(token or get_bearer_token(), site_id, date)
+    try:
+        return shows_from_payload(loads(body)) if body else []
+    except ValueError:
+        return []
 
 
-if __name__ == "__main__":
+def main(argv=None):
     import argparse
-    from showtime_scraper import get_theater_showtimes_by_date
 
     parser = argparse.ArgumentParser(description="Fetch seat availability for shows on a given site and date")
-    parser.add_argument("site_id")
+    parser.add_argument("site_id", help="Cinema site id, or 'all' to sweep every cinema in cinemas.json")
     parser.add_argument("date")
-    args = parser.parse_args()
+    parser.add_argument("--sweep", action="store_true", help="Fetch all shows concurrently (implied by 'all')")
+    parser.add_argument("--concurrency", type=int, default=None, help="Max in-flight requests when sweeping")
+    parser.add_argument("--rate", type=float, default=None, help="Max requests per second when sweeping")
+    parser.add_argument("--stream", default=None, help="Append one JSON line per saved seat map to this file")
+    parser.add_argument("--window", type=float, default=SEAT_SWEEP_WINDOW_HOURS or None,
+                        help="Only shows starting within this many hours")
+    parser.add_argument("--include-started", action="store_true", help="Also fetch shows that have already started")
+    args = parser.parse_args(argv)
 
     token = get_bearer_token()
 
-    shows = ensure_showtimes_and_get_show_ids(args.site_id, args.date)
+    if args.sweep or args.site_id == "all":
+        if args.site_id == "all":
+            from data_paths import load_keys
+            site_ids = [e["key"] for e in load_keys() if e.get("key")]
+        else:
+            site_ids = [args.site_id]
+        saved = sweep_seat_availability(site_ids, args.date, token=token, concurrency=args.concurrency,
+                                        rate=args.rate, stream_path=args.stream, window_hours=args.window,
+                                        include_started=args.include_started)
+        raise SystemExit(0 if saved else 1)
+
+    shows = ensure_showtimes_and_get_show_ids(args.site_id, args.date, token)
     if not shows:
         print("No shows found for site/date")
         raise SystemExit(1)
+    shows = select_shows(shows, window_hours=args.window, include_started=args.include_started)
+    if not shows:
+        print("All shows have started or are outside the window")
+        raise SystemExit(0)
 
     for s in shows:
-        fetch_seat_availability_playwright(token, s["id"], args.date)
+        fetch_seat_availability(token, s["id"], args.date)
+
+
+if __name__ == "__main__":
+    main()
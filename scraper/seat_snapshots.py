@@ -0,0 +1,272 @@
+"""Seat-availability time series stored as one base map plus deltas.
+
+For each show, the first seat map polled is kept in full
+(`<show>.base.json`). Every later poll appends one line to
+`<show>.deltas.jsonl` holding only the seats whose status changed:
+
+    {"t": 1767355200.0, "c": {"A-1": "Sold", "A-2": "Sold"}}
+
+A poll with no changes still appends `{"t": ...}` so poll times are kept.
+The state at any time is the base with the deltas up to then applied.
+
+Appends hold one file lock per seat_series directory (`seat_series.lock`
+next to it), so processes polling the same show (shard workers, the daemon
+next to a sweep) each diff against the state the other one last wrote.
+"""
+import bisect
+import json
+import threading
+import time
+from pathlib import Path
+
+from artifact_writer import artifact_stem, atomic_write, iter_artifacts, locked, read_artifact
+from data_paths import week_dir
+
+
+_ID_KEYS = ("id", "seatId")
+_STATUS_KEYS = ("status", "availability", "seatStatus")
+
+
+def _seat_key(node: dict):
+    seat_id = next((node[k] for k in _ID_KEYS if k in node), None)
+    status_key = next((k for k in _STATUS_KEYS if k in node), None)
+    if seat_id is None or status_key is None or isinstance(node[status_key], (dict, list)):
+        return None, None
+    return str(seat_id), status_key
+
+
+def _walk(node):
+    if isinstance(node, dict):
+        seat_id, status_key = _seat_key(node)
+        if seat_id is not None:
+            yield seat_id, node, status_key
+            return
+        for v in node.values():
+            yield from _walk(v)
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk(v)
+
+
+def _walk_seats(data):
+    """Yield (seat key, node, status key) for every seat-like dict in the payload.
+
+    A seat is any object with an id and a scalar status. If an id repeats
+    (ids only unique per area), later ones get a "#n" suffix in document
+    order, which is stable for a given seat layout.
+    """
+    seen = {}
+    for seat_id, node, status_key in _walk(data):
+        n = seen.get(seat_id, 0)
+        seen[seat_id] = n + 1
+        yield (seat_id if n == 0 else f"{seat_id}#{n}"), node, status_key
+
+
+def extract_seats(data) -> dict:
+    """Return {seat id: status} for a seat-availability payload."""
+    seats = {}
+    for key, node, status_key in _walk_seats(data):
+        seats[key] = node[status_key]
+    return seats
+
+
+def apply_statuses(data, statuses: dict):
+    """Write `statuses` back into a copy of the payload `data`."""
+    data = json.loads(json.dumps(data))
+    for key, node, status_key in _walk_seats(data):
+        if key in statuses:
+            node[status_key] = statuses[key]
+    return data
+
+
+def diff_seats(old: dict, new: dict) -> dict:
+    changes = {k: v for k, v in new.items() if old.get(k) != v}
+    for k in old.keys() - new.keys():
+        changes[k] = None
+    return changes
+
+
+class SeatSeries:
+    """Loaded base + deltas for one show."""
+
+    def __init__(self, base: dict, deltas: list):
+        self.base = base
+        self.base_time = base["t"]
+        self.base_seats = extract_seats(base["data"])
+        self.deltas = deltas
+        self.times = [self.base_time] + [d["t"] for d in deltas]
+
+    @classmethod
+    def load(cls, base_path: Path):
+        base = json.loads(base_path.read_text(encoding="utf-8"))
+        deltas_path = base_path.with_name(base_path.name.replace(".base.json", ".deltas.jsonl"))
+        deltas = []
+        if deltas_path.exists():
+            with deltas_path.open(encoding="utf-8") as f:
+                deltas = [json.loads(line) for line in f if line.strip()]
+        return cls(base, deltas)
+
+    def state_at(self, t: float | None = None) -> dict:
+        """{seat: status} as of time `t` (latest poll when None)."""
+        n = len(self.deltas) if t is None else bisect.bisect_right(self.times, t) - 1
+        if n < 0:
+            return {}
+        seats = dict(self.base_seats)
+        for d in self.deltas[:n]:
+            for k, v in d.get("c", {}).items():
+                if v is None:
+                    seats.pop(k, None)
+                else:
+                    seats[k] = v
+        return seats
+
+    def snapshot_at(self, t: float | None = None):
+        """The full seat-availability payload as it looked at time `t`."""
+        return apply_statuses(self.base["data"], self.state_at(t))
+
+    def occupancy(self):
+        """[(t, {status: count})] for every poll, computed in one pass over the deltas."""
+        seats = dict(self.base_seats)
+        counts = {}
+        for status in seats.values():
+            counts[status] = counts.get(status, 0) + 1
+        out = [(self.base_time, dict(counts))]
+        for d in self.deltas:
+            for k, v in d.get("c", {}).items():
+                old = seats.get(k)
+                if old is not None:
+                    counts[old] -= 1
+                    if not counts[old]:
+                        del counts[old]
+                if v is None:
+                    seats.pop(k, None)
+                else:
+                    seats[k] = v
+                    counts[v] = counts.get(v, 0) + 1
+            out.append((d["t"], dict(counts)))
+        return out
+
+
+class SeatSnapshotStore:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # per show: (deltas file size, seat states, last poll time) as of this
+        # process's last append; reused while no other process has appended since
+        self._latest = {}
+
+    @staticmethod
+    def base_path(show_id: str, date: str, create: bool = False) -> Path:
+        series_dir = week_dir(date) / "seat_series"
+        if create:
+            series_dir.mkdir(parents=True, exist_ok=True)
+        return series_dir / f"{show_id}.base.json"
+
+    @staticmethod
+    def deltas_path(show_id: str, date: str) -> Path:
+        return week_dir(date) / "seat_series" / f"{show_id}.deltas.jsonl"
+
+    def append(self, show_id: str, date: str, data, t: float | None = None) -> Path:
+        """Record one poll; returns the file that was written."""
+        t = round(time.time() if t is None else t, 3)
+        seats = extract_seats(data)
+        base_path = self.base_path(show_id, date, create=True)
+        deltas_path = self.deltas_path(show_id, date)
+        with self._lock, locked(base_path.parent):
+            if not base_path.exists():
+                atomic_write(base_path, json.dumps({"showId": show_id, "t": t, "data": data}, ensure_ascii=False))
+                self._latest[base_path] = (0, seats, t)
+                return base_path
+
+            try:
+                size = deltas_path.stat().st_size
+            except FileNotFoundError:
+                size = 0
+            cached = self._latest.get(base_path)
+            if cached is not None and cached[0] == size:
+                _, latest, last_t = cached
+            else:
+                series = SeatSeries.load(base_path)
+                latest, last_t = series.state_at(), series.times[-1]
+
+            # the series is in append order; keep its times sorted for state_at
+            delta = {"t": max(t, last_t)}
+            changes = diff_seats(latest, seats)
+            if changes:
+                delta["c"] = changes
+            with deltas_path.open("ab") as f:
+                f.write((json.dumps(delta, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8"))
+                size = f.tell()
+            self._latest[base_path] = (size, seats, delta["t"])
+            return deltas_path
+
+    def load(self, show_id: str, date: str) -> SeatSeries | None:
+        base_path = self.base_path(show_id, date)
+        return SeatSeries.load(base_path) if base_path.exists() else None
+
+
+_store = None
+
+
+def get_store() -> SeatSnapshotStore:
+    global _store
+    if _store is None:
+        _store = SeatSnapshotStore()
+    return _store
+
+
+def import_files(paths, date: str) -> int:
+    """Convert per-poll seat_availability_<show>_<HHMMSS>[-<microseconds>].json files into series."""
+    store = get_store()
+    count = 0
+    for p in sorted(paths, key=lambda p: p.stat().st_mtime):
+        show_id = artifact_stem(p)[len("seat_availability_"):].rsplit("_", 1)[0]
+        try:
+            data = json.loads(read_artifact(p))
+        except (OSError, ValueError):
+            continue
+        store.append(show_id, date, data, t=p.stat().st_mtime)
+        count += 1
+    return count
+
+
+def _parse_time(value: str) -> float:
+    from datetime import datetime
+    return datetime.fromisoformat(value).timestamp()
+
+
+def main():
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Query or build seat-availability time series")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_occ = sub.add_parser("occupancy", help="Seat counts per status for every poll of a show")
+    p_occ.add_argument("show_id")
+    p_occ.add_argument("date")
+    p_state = sub.add_parser("state", help="Print the full seat map of a show at a point in time")
+    p_state.add_argument("show_id")
+    p_state.add_argument("date")
+    p_state.add_argument("--at", default=None, help="ISO timestamp (default: latest poll)")
+    p_import = sub.add_parser("import", help="Convert per-poll seat_availability files of a date into series")
+    p_import.add_argument("date")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        seat_dir = week_dir(args.date) / "seat_availability"
+        print(f"Imported {import_files(iter_artifacts(seat_dir, 'seat_availability_*.json', recursive=False), args.date)} snapshots")
+        return
+
+    series = get_store().load(args.show_id, args.date)
+    if series is None:
+        raise SystemExit("No series stored for show/date")
+    if args.command == "occupancy":
+        for t, counts in series.occupancy():
+            stamp = datetime.fromtimestamp(t).strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{stamp}  " + "  ".join(f"{k}={v}" for k, v in sorted(counts.items(), key=lambda kv: str(kv[0]))))
+    else:
+        t = _parse_time(args.at) if args.at else None
+        print(json.dumps(series.snapshot_at(t), ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
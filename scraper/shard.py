@@ -0,0 +1,333 @@
+"""Spread scrape work over several worker processes or hosts.
+
+One coordinator plans units of work into a shared queue (work_queue.py);
+any number of workers lease them, fetch, and write the usual
+data/<year>/week_NN/ files:
+
+- showtimes:<site>:<date>:<slot>  one site and date, once per freshness
+  slot (config.FRESHNESS_POLICY), so re-planning never duplicates work;
+- seats:<show>:<slot>             one seat map, once per poll slot
+  (config.SEAT_POLL_POLICY), for shows that have not started.
+
+Seat units come from the coordinator's showtime index and from the workers
+themselves, which queue the shows of every showtimes payload they fetch.
+Units are partitioned by site; a worker serves every partition unless given
+--partition. A worker that dies simply lets its leases expire and the units
+are delivered to another one.
+
+Only the coordinator captures bearer tokens. It publishes the token in the
+queue and renews it when a worker reports a 401, so workers never start a
+browser.
+
+    python3 scraper/shard.py --queue redis://queue-host:6379/0 coordinate --loop
+    python3 scraper/shard.py --queue redis://queue-host:6379/0 work --partition 0
+    python3 scraper/shard.py status
+
+Without --queue (or FINNKINO_QUEUE_URL) the queue is data/work_queue.sqlite,
+which suits several workers on one host.
+"""
+import asyncio
+import os
+import signal
+import socket
+import time
+import zlib
+from datetime import date as Date, datetime, timedelta
+
+from config import (SEAT_AVAILABILITY, DAEMON_DAYS_AHEAD, QUEUE_LEASE_SECONDS, SHARD_PARTITIONS,
+                    SHARD_TOKEN_WAIT)
+from daemon import seat_poll_interval
+from scrape_manifest import max_age_for
+from work_queue import open_queue
+import metrics
+
+
+SHOWTIMES, SEATS = "showtimes", "seats"
+
+# done and failed units are forgotten after this long
+KEEP_FINISHED = 86400
+# how often a looping coordinator re-plans
+PLAN_INTERVAL = 300
+# how long an idle worker waits before asking the queue again
+IDLE_SLEEP = 5
+
+UNITS_DONE = metrics.counter("finnkino_shard_units_total", "Work units processed by shard workers per kind and result")
+
+
+def partition_for(site_id: str, partitions: int = SHARD_PARTITIONS) -> int:
+    return zlib.crc32(str(site_id).encode("utf-8")) % max(partitions, 1)
+
+
+def showtimes_unit(site_id: str, date: str, days_ahead: int, now: float, partitions: int) -> dict:
+    slot = int(now // max_age_for(days_ahead))
+    return {"key": f"{SHOWTIMES}:{site_id}:{date}:{slot}", "kind": SHOWTIMES,
+            "partition": partition_for(site_id, partitions), "site_id": site_id, "date": date}
+
+
+def seat_unit(show_id: str, site_id: str, date: str, starts_at: float, now: float, partitions: int) -> dict:
+    slot = int(now // seat_poll_interval(starts_at - now))
+    return {"key": f"{SEATS}:{show_id}:{slot}", "kind": SEATS, "partition": partition_for(site_id, partitions),
+            "show_id": show_id, "site_id": site_id, "date": date, "starts_at": starts_at}
+
+
+class Coordinator:
+    def __init__(self, queue, partitions: int = SHARD_PARTITIONS, days_ahead: int = DAEMON_DAYS_AHEAD,
+                 seats: bool = True):
+        from data_paths import load_keys
+
+        self.queue = queue
+        self.partitions = partitions
+        self.days_ahead = days_ahead
+        self.seats = seats
+        self.site_ids = [e["key"] for e in load_keys() if e.get("key")]
+        self._published = None
+        self._published_at = 0.0
+
+    def plan(self, now: float | None = None) -> int:
+        now = time.time() if now is None else now
+        today = Date.today()
+        units = []
+        for n in range(self.days_ahead):
+            d = (today + timedelta(n)).isoformat()
+            units.extend(showtimes_unit(site_id, d, n, now, self.partitions) for site_id in self.site_ids)
+        if self.seats:
+            from showtime_index import get_showtime_index
+
+            last = (today + timedelta(self.days_ahead - 1)).isoformat()
+            for show in get_showtime_index().shows(date_from=today.isoformat(), date_to=last, limit=None):
+                if show["starts_at"] and show["starts_at"] > now:
+                    units.append(seat_unit(show["show_id"], show["site_id"], show["date"], show["starts_at"], now,
+                                           self.partitions))
+        added = self.queue.put(units)
+        self.queue.purge(now - KEEP_FINISHED)
+        print(f"Planned {len(units)} units ({added} new); queue: {self.queue.stats()}")
+        return added
+
+    def publish_token(self):
+        """Publish a valid token, capturing a new one if a worker asked for it."""
+        from bearer_token import get_provider
+
+        provider = get_provider()
+        requested = float(self.queue.get_value("token_request") or 0)
+        if requested > self._published_at and self._published is not None:
+            print("Worker requested a new token")
+            token = provider.refresh(stale=self._published)
+        else:
+            token = provider.get()
+        if token != self._published or requested > self._published_at:
+            self.queue.set_value("token", token)
+            self._published = token
+            self._published_at = time.time()
+
+    def run(self, loop: bool = False, interval: float = PLAN_INTERVAL):
+        stop = []
+        if loop:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(sig, lambda *_: stop.append(sig))
+        self.publish_token()
+        self.plan()
+        planned_at = time.time()
+        while loop and not stop:
+            time.sleep(1)
+            try:
+                self.publish_token()
+            except Exception as e:
+                print(f"Token refresh failed: {e}")
+            if time.time() - planned_at >= interval:
+                self.plan()
+                planned_at = time.time()
+
+
+class SharedToken:
+    """TokenProvider source that waits for the coordinator's token instead of capturing one."""
+
+    def __init__(self, queue, wait: float = SHARD_TOKEN_WAIT):
+        self.queue = queue
+        self.wait = wait
+        self.last = None
+
+    def __call__(self) -> str | None:
+        from bearer_token import _token_valid
+
+        deadline = time.time() + self.wait
+        requested = False
+        while True:
+            token = self.queue.get_value("token")
+            if token and token != self.last and _token_valid(token):
+                self.last = token
+                return token
+            if not requested:
+                self.queue.set_value("token_request", str(time.time()))
+                requested = True
+            if time.time() >= deadline:
+                print("No new token from the coordinator")
+                return None
+            time.sleep(1)
+
+
+class Worker:
+    def __init__(self, queue, worker_id: str | None = None, partitions=None, batch: int = 20,
+                 lease: float = QUEUE_LEASE_SECONDS, concurrency: int | None = None, rate: float | None = None,
+                 shard_count: int = SHARD_PARTITIONS):
+        from async_scrape import ScrapeEngine
+        from bearer_token import get_provider
+        from scrape_manifest import ScrapeManifest
+
+        self.queue = queue
+        self.id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self.partitions = partitions
+        self.batch = batch
+        self.lease = lease
+        self.shard_count = shard_count
+        self.manifest = ScrapeManifest()
+        provider = get_provider()
+        provider.source = SharedToken(queue)
+        self.engine = ScrapeEngine(provider.get(), concurrency=concurrency, rate=rate)
+        self._held = set()
+        self._stop = asyncio.Event()
+
+    async def run_showtimes(self, unit) -> bool:
+        from seat_availability_scraper import get_show_ids_from_existing
+
+        site_id, date = unit["site_id"], unit["date"]
+        if await self.engine.fetch_showtimes({"key": site_id}, date, self.manifest) is None:
+            return False
+        now = time.time()
+        follow = []
+        for show in await self.engine.in_executor(get_show_ids_from_existing, site_id, date):
+            try:
+                starts_at = datetime.fromisoformat(show["startsAt"]).timestamp()
+            except (TypeError, ValueError):
+                continue
+            if starts_at > now:
+                follow.append(seat_unit(show["id"], site_id, date, starts_at, now, self.shard_count))
+        if follow:
+            await self.engine.in_executor(self.queue.put, follow)
+        return True
+
+    async def run_seats(self, unit) -> bool:
+        from seat_availability_scraper import _save_seat_availability
+
+        if unit.get("starts_at") and unit["starts_at"] <= time.time():
+            return True
+        show_id = unit["show_id"]
+        try:
+            resp = await self.engine.fetch(SEAT_AVAILABILITY.format(show_id=show_id), headers={"Accept": "application/json"})
+        except Exception as e:
+            print(f"Request error for seat availability {show_id}: {e}")
+            return False
+        if resp.status_code == 404:
+            # the show is gone; polling it again will not help
+            return True
+        if resp.status_code != 200:
+            print(f"Seat availability {show_id} returned HTTP {resp.status_code}")
+            return False
+        await self.engine.in_executor(_save_seat_availability, resp.content, show_id, unit["date"], unit["site_id"])
+        return True
+
+    async def process(self, unit):
+        run = self.run_showtimes if unit.get("kind") == SHOWTIMES else self.run_seats
+        try:
+            ok = await run(unit)
+        except Exception as e:
+            print(f"Unit {unit['key']} failed: {e}")
+            ok = False
+        self._held.discard(unit["key"])
+        if ok:
+            await self.engine.in_executor(self.queue.ack, self.id, unit["key"])
+        else:
+            await self.engine.in_executor(self.queue.nack, self.id, unit["key"], 60)
+        UNITS_DONE.inc(kind=unit.get("kind"), result="ok" if ok else "retry")
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            if self._held:
+                await self.engine.in_executor(self.queue.extend, self.id, list(self._held), self.lease)
+
+    async def run(self, drain: bool = False):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        heartbeat = asyncio.create_task(self._heartbeat())
+        done = 0
+        print(f"Shard worker {self.id} started")
+        try:
+            while not self._stop.is_set():
+                units = await self.engine.in_executor(self.queue.lease, self.id, self.batch, self.lease, self.partitions)
+                if not units:
+                    if drain:
+                        break
+                    try:
+                        await asyncio.wait_for(self._stop.wait(), timeout=IDLE_SLEEP)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                self._held.update(u["key"] for u in units)
+                await asyncio.gather(*(self.process(u) for u in units))
+                done += len(units)
+                self.manifest.save()
+                metrics.export_run("shard_worker", summary=False)
+        finally:
+            heartbeat.cancel()
+        print(f"Shard worker {self.id} stopped after {done} units")
+        return done
+
+    def close(self):
+        self.engine.close()
+        metrics.export_run("shard_worker")
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Sharded scraping: coordinator, workers and queue status")
+    parser.add_argument("--queue", default=None, help="Queue URL (sqlite:///path or redis://host:port/db)")
+    parser.add_argument("--partitions", type=int, default=SHARD_PARTITIONS, help="Number of partitions to plan")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("coordinate", help="Plan work units and publish the bearer token")
+    p.add_argument("--days", type=int, default=DAEMON_DAYS_AHEAD, help="Days ahead to plan showtimes for")
+    p.add_argument("--no-seats", action="store_true", help="Do not plan seat availability units")
+    p.add_argument("--loop", action="store_true", help="Keep re-planning and serving token requests")
+    p.add_argument("--interval", type=float, default=PLAN_INTERVAL, help="Seconds between plans with --loop")
+
+    p = sub.add_parser("work", help="Lease and process work units")
+    p.add_argument("--id", default=None, help="Worker id (default host:pid)")
+    p.add_argument("--partition", type=int, action="append", default=None,
+                   help="Only serve this partition (repeatable). Default: all")
+    p.add_argument("--batch", type=int, default=20, help="Units leased at a time")
+    p.add_argument("--lease", type=float, default=QUEUE_LEASE_SECONDS, help="Lease length in seconds")
+    p.add_argument("--concurrency", type=int, default=None)
+    p.add_argument("--rate", type=float, default=None)
+    p.add_argument("--drain", action="store_true", help="Exit once the queue has nothing ready")
+
+    sub.add_parser("status", help="Show unit counts per state")
+    args = parser.parse_args(argv)
+
+    queue = open_queue(args.queue)
+    try:
+        if args.command == "coordinate":
+            coordinator = Coordinator(queue, partitions=args.partitions, days_ahead=args.days, seats=not args.no_seats)
+            coordinator.run(loop=args.loop, interval=args.interval)
+        elif args.command == "work":
+            worker = Worker(queue, worker_id=args.id, partitions=args.partition, batch=args.batch, lease=args.lease,
+                            concurrency=args.concurrency, rate=args.rate, shard_count=args.partitions)
+            try:
+                asyncio.run(worker.run(drain=args.drain))
+            finally:
+                worker.close()
+        else:
+            for state, count in sorted(queue.stats().items()):
+                print(f"{state:<8} {count}")
+            token = queue.get_value("token")
+            print(f"token    {'published' if token else 'none'}")
+    finally:
+        queue.close()
+
+
+if __name__ == "__main__":
+    main()
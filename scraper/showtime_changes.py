@@ -0,0 +1,337 @@
+"""Feed of showtime changes between scrapes.
+
+Whenever a showtimes payload is saved, its shows are compared by id with the
+previous payload for the same site and date, and one event per difference
+is appended to data/changes/<YYYY-MM-DD>.jsonl (one file per day of
+scraping):
+
+    {"seq": 1812, "t": 1767355200.1, "type": "changed", "siteId": "1004",
+     "date": "2026-01-02", "showId": "1004-20260102-000", "show": {...},
+     "changes": {"startsAt": ["2026-01-02T18:00:00+02:00", "2026-01-02T18:30:00+02:00"]}}
+
+Event types are "added", "cancelled" (gone from the listing before it
+started) and "changed". A changed event has the old and new value of each
+field that changed. The fields are filmId, screenId, startsAt, endsAt,
+attributeIds and isSoldOut. `show` is the show's current fields (its last
+known ones for a cancellation). `seq` increases with every event, possibly
+with gaps.
+
+Consumers keep a cursor and only read what was appended since:
+
+    events, cursor = read_changes(cursor)
+
+    python3 scraper/showtime_changes.py read --cursor-file consumer.cursor
+    python3 scraper/showtime_changes.py read --follow --type cancelled
+    python3 scraper/showtime_changes.py baseline
+
+The previous state per site and date lives in data/changes/state.sqlite.
+Events are appended before that state is updated, so after a crash an event
+may be delivered twice (same site, date, show and change, new seq) but never
+lost. The first payloads a new feed records are taken as its baseline without
+events; dates that open later still emit "added" for each show. `baseline`
+records the state of the showtimes already on disk without emitting events,
+so turning the feed on for an existing tree starts quietly.
+"""
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from artifact_writer import atomic_write, ensure_dir, locked
+from config import CHANGE_FEED
+from data_paths import DATA_DIR
+
+
+CHANGES_DIR = DATA_DIR / "changes"
+
+FIELDS = ("filmId", "screenId", "startsAt", "endsAt", "attributeIds", "isSoldOut")
+
+ADDED, CANCELLED, CHANGED = "added", "cancelled", "changed"
+
+
+def show_states(data) -> dict:
+    """{show id: tracked fields} for a showtimes payload; small enough to ship between processes."""
+    states = {}
+    for show in (data or {}).get("showtimes") or []:
+        show_id = show.get("id")
+        if not show_id:
+            continue
+        schedule = show.get("schedule") or {}
+        attrs = show.get("attributeIds")
+        states[show_id] = {
+            "filmId": show.get("filmId"),
+            "screenId": show.get("screenId"),
+            "startsAt": schedule.get("startsAt"),
+            "endsAt": schedule.get("endsAt"),
+            "attributeIds": sorted(attrs) if attrs is not None else None,
+            "isSoldOut": show.get("isSoldOut"),
+        }
+    return states
+
+
+def _started(state: dict, now: float) -> bool:
+    try:
+        return datetime.datetime.fromisoformat(state["startsAt"]).timestamp() <= now
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def diff_states(old: dict, new: dict, now: float | None = None) -> list[dict]:
+    """Events turning `old` into `new` ({show id: fields}), ordered by start time."""
+    now = time.time() if now is None else now
+    events = []
+    for show_id, state in new.items():
+        prev = old.get(show_id)
+        if prev is None:
+            events.append({"type": ADDED, "showId": show_id, "show": state})
+            continue
+        changes = {f: [prev.get(f), state.get(f)] for f in FIELDS if prev.get(f) != state.get(f)}
+        if changes:
+            events.append({"type": CHANGED, "showId": show_id, "show": state, "changes": changes})
+    for show_id, state in old.items():
+        # shows drop out of the listing once they have started; that is not a cancellation
+        if show_id not in new and not _started(state, now):
+            events.append({"type": CANCELLED, "showId": show_id, "show": state})
+    events.sort(key=lambda e: (e["show"].get("startsAt") or "", e["showId"]))
+    return events
+
+
+class ChangeFeed:
+    def __init__(self, root: Path = CHANGES_DIR):
+        self.root = Path(root)
+        ensure_dir(self.root)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.root / "state.sqlite"), timeout=30, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS shows (
+                site_id TEXT NOT NULL,
+                date TEXT NOT NULL,
+                show_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                PRIMARY KEY (site_id, date, show_id)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER);
+        """)
+
+    def _previous(self, site_id: str, date: str) -> dict:
+        rows = self.db.execute("SELECT show_id, state FROM shows WHERE site_id = ? AND date = ?", (site_id, date))
+        return {show_id: json.loads(state) for show_id, state in rows}
+
+    def _append(self, events: list[dict]):
+        if not events:
+            return
+        path = self.root / f"{datetime.date.today().isoformat()}.jsonl"
+        data = "".join(json.dumps(e, ensure_ascii=False, separators=(",", ":")) + "\n" for e in events).encode("utf-8")
+        # one O_APPEND write per batch, so readers never see events of a batch interleaved
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def record_many(self, payloads, emit: bool = True) -> list[dict]:
+        """Diff [(site_id, date, show states)] against the stored state, append the events and store the new state."""
+        payloads = [(s, d, states) for s, d, states in payloads if s and d and states is not None]
+        if not payloads:
+            return []
+        now = time.time()
+        with self._lock, locked(self.root / "feed"):
+            events = []
+            if not self.db.execute("SELECT 1 FROM meta WHERE name = 'started'").fetchone():
+                emit = False  # a new feed takes its first payloads as the baseline
+            if emit:
+                for site_id, date, states in payloads:
+                    for e in diff_states(self._previous(site_id, date), states, now):
+                        events.append({"t": round(now, 3), "siteId": site_id, "date": date, **e})
+                row = self.db.execute("SELECT value FROM meta WHERE name = 'seq'").fetchone()
+                seq = row[0] if row else 0
+                for e in events:
+                    seq += 1
+                    e["seq"] = seq
+                if events:
+                    # reserve the numbers first: a crash before the state commit re-emits with new ones
+                    with self.db:
+                        self.db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('seq', ?)", (seq,))
+                self._append(events)
+            with self.db:
+                self.db.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('started', ?)", (int(now),))
+                for site_id, date, states in payloads:
+                    self.db.execute("DELETE FROM shows WHERE site_id = ? AND date = ?", (site_id, date))
+                    self.db.executemany("INSERT INTO shows (site_id, date, show_id, state) VALUES (?, ?, ?, ?)",
+                                        [(site_id, date, k, json.dumps(v, separators=(",", ":"))) for k, v in states.items()])
+        return events
+
+    def record(self, site_id: str, date: str, data) -> list[dict]:
+        return self.record_many([(site_id, date, show_states(data))])
+
+    def prune_state(self, before: str) -> int:
+        """Forget the state of dates before `before` (YYYY-MM-DD); they will not change again."""
+        with self._lock, self.db:
+            return self.db.execute("DELETE FROM shows WHERE date < ?", (before,)).rowcount
+
+    def close(self):
+        self.db.close()
+
+
+_feed = None
+_feed_lock = threading.Lock()
+
+
+def get_feed() -> ChangeFeed:
+    global _feed
+    if _feed is None:
+        with _feed_lock:
+            if _feed is None:
+                _feed = ChangeFeed()
+    return _feed
+
+
+def record_payload(site_id: str, date: str, data):
+    """Ingest hook for the scrapers: record a saved payload if config.CHANGE_FEED is on."""
+    if not CHANGE_FEED:
+        return
+    try:
+        get_feed().record(site_id, date, data)
+    except Exception as e:
+        # the feed must never cost us the scrape itself
+        print(f"Change feed error for {site_id} {date}: {e}")
+
+
+def _segments(root: Path) -> list[str]:
+    return sorted(p.stem for p in root.glob("*.jsonl"))
+
+
+def read_changes(cursor: str | None = None, limit: int | None = None, root: Path = CHANGES_DIR):
+    """Return (events appended after `cursor`, cursor to resume from).
+
+    A cursor is "<segment>:<byte offset>"; None starts at the oldest event
+    still kept. A line still being written is left for the next read.
+    """
+    root = Path(root)
+    segment, _, offset = (cursor or "").partition(":")
+    offset = int(offset or 0)
+    events = []
+    for name in _segments(root):
+        if name < segment:
+            continue
+        if name != segment:
+            segment, offset = name, 0
+        with open(root / f"{name}.jsonl", "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                offset += len(line)
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    continue
+                if limit and len(events) >= limit:
+                    return events, f"{segment}:{offset}"
+    return events, (f"{segment}:{offset}" if segment else cursor)
+
+
+def follow(cursor: str | None = None, poll: float = 1.0, root: Path = CHANGES_DIR):
+    """Yield (event, cursor) as events are appended, forever."""
+    while True:
+        events, next_cursor = read_changes(cursor, root=root)
+        for i, e in enumerate(events):
+            # the cursor only moves past an event once it has been handed out
+            yield e, (next_cursor if i == len(events) - 1 else None)
+        cursor = next_cursor
+        if not events:
+            time.sleep(poll)
+
+
+def prune(keep_days: int, root: Path = CHANGES_DIR) -> int:
+    """Delete event files older than `keep_days` days and the state of past dates."""
+    cutoff = (datetime.date.today() - datetime.timedelta(days=keep_days)).isoformat()
+    removed = 0
+    for name in _segments(root):
+        if name < cutoff:
+            (Path(root) / f"{name}.jsonl").unlink()
+            removed += 1
+    get_feed().prune_state(datetime.date.today().isoformat())
+    return removed
+
+
+def baseline(root: Path = DATA_DIR) -> int:
+    """Record the showtimes already on disk as the previous state, without emitting events."""
+    from schedule_parse import iter_payloads
+
+    count = 0
+    batch = []
+    for site_id, date, data in iter_payloads([str(root)]):
+        batch.append((site_id, date, show_states(data)))
+        count += 1
+        if len(batch) >= 200:
+            get_feed().record_many(batch, emit=False)
+            batch = []
+    get_feed().record_many(batch, emit=False)
+    return count
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Read the feed of showtime changes between scrapes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("read", help="Print events after a cursor as JSON Lines")
+    p.add_argument("--cursor", default=None, help="Resume after this cursor (default: oldest event)")
+    p.add_argument("--cursor-file", default=None, help="Read the cursor from, and save the new one to, this file")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--type", action="append", choices=(ADDED, CANCELLED, CHANGED), help="Only these event types")
+    p.add_argument("--site", action="append", help="Only these site ids")
+    p.add_argument("--follow", action="store_true", help="Keep printing events as they are appended")
+
+    p = sub.add_parser("prune", help="Delete old event files")
+    p.add_argument("--keep-days", type=int, default=30)
+
+    sub.add_parser("baseline", help="Record stored showtimes as the previous state without emitting events")
+    args = parser.parse_args(argv)
+
+    if args.command == "baseline":
+        print(f"Recorded the state of {baseline()} showtimes files")
+        return
+    if args.command == "prune":
+        print(f"Removed {prune(args.keep_days)} event files")
+        return
+
+    cursor = args.cursor
+    cursor_path = Path(args.cursor_file) if args.cursor_file else None
+    if cursor is None and cursor_path is not None and cursor_path.exists():
+        cursor = cursor_path.read_text(encoding="utf-8").strip() or None
+
+    def wanted(e):
+        return (not args.type or e.get("type") in args.type) and (not args.site or e.get("siteId") in args.site)
+
+    def save(c):
+        if cursor_path is not None and c:
+            atomic_write(cursor_path, c + "\n")
+
+    if args.follow:
+        try:
+            for e, c in follow(cursor):
+                if wanted(e):
+                    print(json.dumps(e, ensure_ascii=False), flush=True)
+                if c:
+                    save(c)
+        except KeyboardInterrupt:
+            pass
+        return
+    events, cursor = read_changes(cursor, args.limit)
+    for e in events:
+        if wanted(e):
+            print(json.dumps(e, ensure_ascii=False))
+    save(cursor)
+    print(f"cursor {cursor or '-'} ({len(events)} events)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
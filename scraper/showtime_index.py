@@ -0,0 +1,361 @@
+"""Film-centric query index over stored showtimes.
+
+Every showtimes_<site>_<date>.json is flattened with
+schedule_parse.iter_schedule_rows into one row per show, and SQLite indexes
+by film, site, screen, start hour and business date, plus an inverted
+attribute -> show table, answer cross-site questions without opening any
+payload:
+
+    index = get_showtime_index()
+    index.shows(film="Dune", attributes=["IMAX"], date_from="2026-01-02", date_to="2026-01-08")
+    index.film_summary("HO00001234")   # where, when and in which formats
+
+The index is maintained incrementally: update() picks up the showtimes files
+the artifact index recorded since the last update (or re-scans data/ with
+full=True) and replaces the rows of each (site, date) it re-reads. Queries
+call it first, so they always see files that have landed since.
+
+    python3 scraper/showtime_index.py update --full
+    python3 scraper/showtime_index.py film Dune --from 2026-01-02 --to 2026-01-08
+    python3 scraper/showtime_index.py shows --attribute IMAX --site 1004 --hours 18-21
+"""
+import argparse
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from artifact_index import get_index, SHOWTIMES
+from artifact_writer import read_artifact
+from data_paths import DATA_DIR
+from json_stream import loads
+from schedule_parse import iter_schedule_rows, expand_inputs, _site_and_date, _text
+
+
+INDEX_FILE = DATA_DIR / "showtime_index.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    site_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    path TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (site_id, date)
+);
+CREATE TABLE IF NOT EXISTS films (
+    film_id TEXT PRIMARY KEY,
+    title TEXT,
+    duration TEXT
+);
+CREATE TABLE IF NOT EXISTS shows (
+    ref INTEGER PRIMARY KEY,
+    show_id TEXT,
+    site_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    film_id TEXT,
+    screen TEXT,
+    starts_at INTEGER,
+    time TEXT,
+    hour INTEGER,
+    attributes TEXT
+);
+CREATE INDEX IF NOT EXISTS shows_site_date ON shows (site_id, date);
+CREATE INDEX IF NOT EXISTS shows_film ON shows (film_id, date, site_id);
+CREATE INDEX IF NOT EXISTS shows_screen ON shows (screen, date);
+CREATE INDEX IF NOT EXISTS shows_hour ON shows (hour, date);
+CREATE INDEX IF NOT EXISTS shows_date ON shows (date, starts_at);
+CREATE TABLE IF NOT EXISTS show_attributes (
+    attribute TEXT NOT NULL,
+    show_ref INTEGER NOT NULL,
+    PRIMARY KEY (attribute, show_ref)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS show_attributes_show ON show_attributes (show_ref);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+SHOW_FIELDS = ("show_id", "site_id", "date", "film_id", "title", "duration", "screen", "starts_at", "time", "attributes")
+
+
+def _attribute_keys(show: dict, names: dict) -> set:
+    """Lower-cased ids and names of a show's attributes, for the inverted index."""
+    keys = set()
+    for a in show.get("attributeIds", []):
+        keys.add(str(a).lower())
+        if names.get(a):
+            keys.add(names[a].lower())
+    return keys
+
+
+class ShowtimeIndex:
+    def __init__(self, path: Path = INDEX_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(_SCHEMA)
+
+    # -- maintenance ------------------------------------------------------
+    def _get_meta(self, key: str, default=None):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _replace(self, site_id: str, date: str, data: dict):
+        """Swap the rows of one (site, date) for the shows in `data`. Caller holds the transaction."""
+        self.db.execute("DELETE FROM show_attributes WHERE show_ref IN (SELECT ref FROM shows WHERE site_id = ? AND date = ?)",
+                        (site_id, date))
+        self.db.execute("DELETE FROM shows WHERE site_id = ? AND date = ?", (site_id, date))
+        related = data.get("relatedData") or {}
+        names = {a.get("id"): _text(a, "name") for a in related.get("attributes", [])}
+        by_id = {s.get("id"): s for s in data.get("showtimes", [])}
+        films = {}
+        for row in iter_schedule_rows(data, site_id, date):
+            starts = row["starts_at"]
+            cur = self.db.execute(
+                "INSERT INTO shows (show_id, site_id, date, film_id, screen, starts_at, time, hour, attributes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (row["show_id"], row["site_id"] or site_id, date, row["film_id"], row["screen"],
+                 int(starts.timestamp()) if starts else None, row["time"],
+                 int(row["time"][:2]) if row["time"] else None, row["attributes"]),
+            )
+            keys = _attribute_keys(by_id.get(row["show_id"]) or {}, names)
+            self.db.executemany("INSERT OR IGNORE INTO show_attributes (attribute, show_ref) VALUES (?, ?)",
+                                [(k, cur.lastrowid) for k in keys])
+            if row["film_id"] and row["title"] != "Unknown Title":
+                films[row["film_id"]] = (row["title"], row["duration"])
+        self.db.executemany(
+            "INSERT INTO films (film_id, title, duration) VALUES (?, ?, ?)"
+            " ON CONFLICT(film_id) DO UPDATE SET title = excluded.title, duration = excluded.duration",
+            [(film_id, title, duration) for film_id, (title, duration) in films.items()],
+        )
+
+    def add_payload(self, site_id: str, date: str, data: dict, path: str = "", mtime: float = 0.0):
+        """Index one payload, replacing what was indexed for its site and date."""
+        with self._lock, self.db:
+            self._replace(site_id, date, data)
+            self.db.execute("INSERT OR REPLACE INTO sources (site_id, date, path, mtime) VALUES (?, ?, ?, ?)",
+                            (site_id, date, path, mtime))
+
+    def _add_files(self, candidates) -> int:
+        """Index the (path, site_id, date) files that changed since they were last indexed."""
+        with self._lock:
+            known = {(s, d): (p, m) for s, d, p, m in self.db.execute("SELECT site_id, date, path, mtime FROM sources")}
+        count = 0
+        for path, site_id, date in candidates:
+            if not site_id or not date:
+                continue
+            try:
+                mtime = path.stat().st_mtime
+                prev = known.get((site_id, date))
+                # an older file for the same site/date (another layout) never replaces a newer one
+                if prev and prev[1] >= mtime:
+                    continue
+                data = loads(read_artifact(path))
+            except (OSError, ValueError) as e:
+                print(f"Skipping {path}: {e}")
+                continue
+            self.add_payload(site_id, date, data, str(path), mtime)
+            known[(site_id, date)] = (str(path), mtime)
+            count += 1
+        return count
+
+    def update(self, full: bool = False, root: Path = DATA_DIR) -> int:
+        """Index showtimes files recorded since the last update; returns how many were (re)indexed.
+
+        With full=True every showtimes file under `root` is checked instead,
+        which also picks up history written before the artifact index existed.
+        """
+        if full:
+            candidates = ((p, *_site_and_date(p)) for p in expand_inputs([str(root)]))
+            count = self._add_files(candidates)
+            with self._lock, self.db:
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)", (str(time.time()),))
+            return count
+        with self._lock:
+            cursor = float(self._get_meta("cursor", 0))
+        artifacts = get_index()
+        with artifacts._lock:
+            rows = artifacts.db.execute(
+                "SELECT path, site_id, date, fetched_at FROM artifacts"
+                " WHERE kind = ? AND show_id IS NULL AND fetched_at > ? ORDER BY fetched_at",
+                (SHOWTIMES, cursor),
+            ).fetchall()
+        if not rows:
+            return 0
+        count = self._add_files((Path(p), s, d) for p, s, d, _ in rows)
+        with self._lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('cursor', ?)", (str(rows[-1][3]),))
+        return count
+
+    # -- queries ----------------------------------------------------------
+    def query(self, sql: str, params=()):
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def film_ids(self, film: str) -> list[str]:
+        """Film ids matching an id or a case-insensitive title substring."""
+        rows = self.query("SELECT film_id FROM films WHERE film_id = ? OR title LIKE ? ORDER BY title",
+                          (film, f"%{film}%"))
+        return [r[0] for r in rows] or [film]
+
+    def _where(self, film=None, site=None, screen=None, attributes=(), date_from=None, date_to=None, hours=None):
+        clauses, params = [], []
+        if film:
+            ids = self.film_ids(film)
+            clauses.append(f"s.film_id IN ({', '.join('?' for _ in ids)})")
+            params += ids
+        if site:
+            clauses.append("s.site_id = ?")
+            params.append(site)
+        if screen:
+            clauses.append("s.screen = ?")
+            params.append(screen)
+        for a in attributes or ():
+            clauses.append("s.ref IN (SELECT show_ref FROM show_attributes WHERE attribute = ?)")
+            params.append(a.lower())
+        if date_from:
+            clauses.append("s.date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("s.date <= ?")
+            params.append(date_to)
+        if hours:
+            clauses.append("s.hour BETWEEN ? AND ?")
+            params += list(hours)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def shows(self, film=None, site=None, screen=None, attributes=(), date_from=None, date_to=None, hours=None,
+              limit: int | None = None, refresh: bool = True) -> list[dict]:
+        """Shows matching every given filter, ordered by start time.
+
+        `film` is a film id or title substring, `attributes` names or ids that
+        must all be present, `hours` an inclusive (first, last) start hour range.
+        """
+        if refresh:
+            self.update()
+        where, params = self._where(film, site, screen, attributes, date_from, date_to, hours)
+        sql = ("SELECT s.show_id, s.site_id, s.date, s.film_id, f.title, f.duration, s.screen, s.starts_at, s.time,"
+               " s.attributes FROM shows s LEFT JOIN films f ON f.film_id = s.film_id" + where +
+               " ORDER BY s.starts_at, s.site_id")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(SHOW_FIELDS, row)) for row in self.query(sql, params)]
+
+    def films(self, site=None, date_from=None, date_to=None, refresh: bool = True):
+        """(film id, title, shows, sites, first date, last date), most shows first."""
+        if refresh:
+            self.update()
+        where, params = self._where(site=site, date_from=date_from, date_to=date_to)
+        return self.query(
+            "SELECT s.film_id, f.title, COUNT(*), COUNT(DISTINCT s.site_id), MIN(s.date), MAX(s.date)"
+            " FROM shows s LEFT JOIN films f ON f.film_id = s.film_id" + where +
+            " GROUP BY s.film_id ORDER BY COUNT(*) DESC", params)
+
+    def film_summary(self, film: str, date_from=None, date_to=None, refresh: bool = True) -> dict:
+        """Where, when and in which formats a film is showing: per site and per attribute counts."""
+        if refresh:
+            self.update()
+        where, params = self._where(film=film, date_from=date_from, date_to=date_to)
+        sites = self.query(
+            "SELECT s.site_id, COUNT(*), MIN(s.starts_at), MAX(s.starts_at), COUNT(DISTINCT s.date) FROM shows s"
+            + where + " GROUP BY s.site_id ORDER BY COUNT(*) DESC", params)
+        formats = self.query(
+            "SELECT s.attributes, COUNT(*) FROM shows s" + where + " GROUP BY s.attributes ORDER BY COUNT(*) DESC", params)
+        ids = self.film_ids(film)
+        titles = self.query(f"SELECT film_id, title FROM films WHERE film_id IN ({', '.join('?' for _ in ids)})", ids)
+        return {"films": titles, "sites": sites, "formats": formats}
+
+    def counts(self) -> dict:
+        return {table: self.query(f"SELECT COUNT(*) FROM {table}")[0][0] for table in ("sources", "films", "shows")}
+
+    def close(self):
+        self.db.close()
+
+
+_showtime_index = None
+_showtime_index_lock = threading.Lock()
+
+
+def get_showtime_index() -> ShowtimeIndex:
+    global _showtime_index
+    if _showtime_index is None:
+        with _showtime_index_lock:
+            if _showtime_index is None:
+                _showtime_index = ShowtimeIndex()
+    return _showtime_index
+
+
+def _hours(value: str):
+    first, _, last = value.partition("-")
+    return int(first), int(last or first)
+
+
+def _stamp(epoch):
+    return time.strftime("%a %Y-%m-%d %H:%M", time.localtime(epoch)) if epoch is not None else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query stored showtimes by film, site, screen, attribute and time")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_update = sub.add_parser("update", help="Index showtimes files that landed since the last update")
+    p_update.add_argument("--full", action="store_true", help="Check every showtimes file under data/")
+
+    def add_range(p):
+        p.add_argument("--from", dest="date_from", default=None, help="First business date (YYYY-MM-DD)")
+        p.add_argument("--to", dest="date_to", default=None, help="Last business date (YYYY-MM-DD)")
+        p.add_argument("--site", default=None)
+
+    p_shows = sub.add_parser("shows", help="List matching shows in start order")
+    p_shows.add_argument("--film", default=None, help="Film id or title substring")
+    p_shows.add_argument("--attribute", action="append", default=[], help="Attribute name or id (repeatable, all must match)")
+    p_shows.add_argument("--screen", default=None)
+    p_shows.add_argument("--hours", type=_hours, default=None, help="Start hour or range, e.g. 18-21")
+    p_shows.add_argument("--limit", type=int, default=None)
+    add_range(p_shows)
+    p_films = sub.add_parser("films", help="Films by number of shows")
+    add_range(p_films)
+    p_film = sub.add_parser("film", help="Where, when and in which formats a film is showing")
+    p_film.add_argument("film", help="Film id or title substring")
+    p_film.add_argument("--from", dest="date_from", default=None)
+    p_film.add_argument("--to", dest="date_to", default=None)
+    args = parser.parse_args()
+
+    index = get_showtime_index()
+    started = time.perf_counter()
+    if args.command == "update":
+        n = index.update(full=args.full)
+        print(f"Indexed {n} files in {time.perf_counter() - started:.2f}s: {index.counts()}")
+        return
+
+    index.update()
+    started = time.perf_counter()
+    if args.command == "shows":
+        rows = index.shows(args.film, args.site, args.screen, args.attribute, args.date_from, args.date_to, args.hours,
+                           args.limit, refresh=False)
+        for r in rows:
+            print(f"{_stamp(r['starts_at'])}  {r['site_id']:<6} {r['screen'] or '-':<10} {r['title'] or r['film_id']}"
+                  + (f"  [{r['attributes']}]" if r["attributes"] else ""))
+        print(f"{len(rows)} shows")
+    elif args.command == "films":
+        print(f"{'SHOWS':>6} | {'SITES':>5} | {'FIRST':<10} | {'LAST':<10} | TITLE")
+        for film_id, title, shows, sites, first, last in index.films(args.site, args.date_from, args.date_to, refresh=False):
+            print(f"{shows:>6} | {sites:>5} | {first:<10} | {last:<10} | {title or film_id}")
+    else:
+        summary = index.film_summary(args.film, args.date_from, args.date_to, refresh=False)
+        for film_id, title in summary["films"]:
+            print(f"{title} ({film_id})")
+        print(f"\n{'SITE':<6} | {'SHOWS':>5} | {'DAYS':>4} | {'FIRST':<20} | LAST")
+        for site_id, shows, first, last, days in summary["sites"]:
+            print(f"{site_id:<6} | {shows:>5} | {days:>4} | {_stamp(first):<20} | {_stamp(last)}")
+        print(f"\n{'SHOWS':>6} | FORMAT")
+        for attributes, shows in summary["formats"]:
+            print(f"{shows:>6} | {attributes or '-'}")
+    print(f"({(time.perf_counter() - started) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,74 +1,151 @@
-from bearer_token import get_bearer_token
-import requests
-import json
 import time
 from pathlib import Path
-from config import THEATER_SHOWTIMES
+from urllib.parse import urlencode
+from config import THEATER_SHOWTIMES, THEATER_SHOWTIMES_BY_DATE, SHOWTIME_STORE, CHANGE_FEED, REFERENCE_ABSORB
+from data_paths import showtimes_path
+from artifact_index import get_index, SHOWTIMES
+from artifact_writer import find_artifact, write_artifact
+from http_client import get_client
+from json_stream import encode_payload, loads, looks_like_object
+import metrics
 import datetime
 
 
-def get_theater_showtimes_by_date(token, entry, date: str | None = None, delay=0.5):
-    """Fetch and save showtimes for a single cinema entry and date.
-    """
-    if date is None:
-        date = datetime.date.today().isoformat()
+BYTES_WRITTEN = metrics.counter("finnkino_bytes_written_total", "Bytes written to data files per artifact kind")
 
-    # parse date string to determine year and ISO week
-    try:
-        dt = datetime.date.fromisoformat(date)
-    except Exception:
-        try:
-            parts = date.split('.')
-            if len(parts) == 3:
-                d = int(parts[0])
-                m = int(parts[1])
-                y = int(parts[2])
-                dt = datetime.date(y, m, d)
-            else:
-                dt = datetime.date.today()
-        except Exception:
-            dt = datetime.date.today()
 
-    iso_year, iso_week, _ = dt.isocalendar()
-    data_dir = Path(__file__).parent / "data" / str(iso_year) / f"week_{iso_week:02d}"
-    data_dir.mkdir(parents=True, exist_ok=True)
+def showtimes_output_path(site_id: str, date: str) -> Path:
+    """Return data/<year>/week_NN/showtimes_<site>_<date>.json, creating the week dir."""
+    return showtimes_path(site_id, date, create=True)
 
-    headers = {
-        "Authorization": f"{token}",
-        "Content-Type": "application/json",
-    }
 
-    site_id = entry.get("key")
-    if not site_id:
+def save_showtimes(data, out_path: Path, site_id: str | None = None, date: str | None = None,
+                   raw: bytes | None = None):
+    """Write a payload to the backends selected by config.SHOWTIME_STORE.
+
+    Pass the response body as `raw` (and data=None) to store it as received;
+    it is then only parsed when the SQLite store, the change feed or the
+    reference data catalog needs it.
+    """
+    if SHOWTIME_STORE in ("json", "both"):
+        with metrics.span("write_showtimes"):
+            raw = encode_payload(data, raw)
+            out_path = write_artifact(out_path, raw)
+            get_index().record(SHOWTIMES, out_path, site_id=site_id, date=date)
+        BYTES_WRITTEN.inc(len(raw), kind=SHOWTIMES)
+        print(f"Saved showtimes to {out_path}")
+    if SHOWTIME_STORE in ("sqlite", "both") and site_id and date:
+        from showtime_store import get_store
+        if data is None:
+            data = loads(raw)
+        with metrics.span("store_showtimes"):
+            get_store().ingest(site_id, date, data)
+        print(f"Stored showtimes for {site_id} {date}")
+    if CHANGE_FEED and site_id and date:
+        from showtime_changes import record_payload
+        if data is None:
+            data = loads(raw)
+        with metrics.span("record_changes"):
+            record_payload(site_id, date, data)
+    if REFERENCE_ABSORB:
+        from reference_data import absorb_payload
+        with metrics.span("absorb_reference"):
+            absorb_payload(data if data is not None else loads(raw))
+
+
+def save_showtimes_response(resp, out_path: Path, site_id: str | None = None, date: str | None = None):
+    """Save a showtimes response. Cache hits for files already on disk skip parsing and writing."""
+    if getattr(resp, "from_cache", False) and (SHOWTIME_STORE == "sqlite" or find_artifact(out_path)):
+        print(f"Unchanged showtimes {out_path}")
         return
+    if not looks_like_object(resp.content):
+        raise ValueError(f"Showtimes response for {site_id} {date} is not a JSON object")
+    save_showtimes(None, out_path, site_id, date, raw=resp.content)
+
+
+def multi_site_showtimes_url(date: str, site_ids) -> str:
+    return THEATER_SHOWTIMES_BY_DATE.format(date=date) + "?" + urlencode([("siteIds", s) for s in site_ids])
+
+
+def split_showtimes_by_site(data, site_ids) -> dict:
+    """Split a multi-site showtimes payload into the per-site payloads a
+    single-site request would have returned.
+
+    relatedData films, screens and attributes are narrowed to the ones each
+    site's shows reference.
+    """
+    related = data.get("relatedData") or {}
+    screen_sites = {s.get("id"): s.get("siteId") for s in related.get("screens", [])}
+    by_site = {sid: [] for sid in site_ids}
+    for show in data.get("showtimes", []):
+        sid = show.get("siteId") or screen_sites.get(show.get("screenId"))
+        if sid in by_site:
+            by_site[sid].append(show)
+
+    extra = {k: v for k, v in data.items() if k not in ("showtimes", "relatedData")}
+    out = {}
+    for sid, shows in by_site.items():
+        film_ids = {s.get("filmId") for s in shows}
+        screen_ids = {s.get("screenId") for s in shows}
+        attr_ids = {a for s in shows for a in s.get("attributeIds", [])}
+        site_related = {}
+        for key, items in related.items():
+            if key == "films":
+                site_related[key] = [f for f in items if f.get("id") in film_ids]
+            elif key == "screens":
+                site_related[key] = [x for x in items if x.get("id") in screen_ids or x.get("siteId") == sid]
+            elif key == "attributes":
+                site_related[key] = [a for a in items if a.get("id") in attr_ids]
+            elif key == "sites" and isinstance(items, list):
+                site_related[key] = [x for x in items if x.get("id") == sid]
+            else:
+                site_related[key] = items
+        out[sid] = {**extra, "showtimes": shows, "relatedData": site_related}
+    return out
+
+
+def fetch_showtimes_payload(token, site_id: str, date: str) -> bytes | None:
+    """Fetch and save showtimes for one site and date; returns the response body, or None on failure."""
+    client = get_client()
+    client.set_token(token)
 
     url = THEATER_SHOWTIMES.format(date=date, site_id=site_id)
     try:
-        resp = requests.get(url, headers=headers, timeout=30)
+        # the client refreshes the token once on 401 and retries transient errors with backoff
+        with metrics.span("fetch_showtimes", site_id=site_id, date=date):
+            resp = client.get(url, headers={"Content-Type": "application/json"}, auth=True, cache=True)
     except Exception as e:
         print(f"Request error for {site_id}: {e}")
-        return
+        return None
+    if resp.status_code != 200:
+        print(f"Showtimes {site_id} {date} returned HTTP {resp.status_code}")
+        return None
 
-    # If unauthorized, refresh token once and retry
-    if resp.status_code == 401:
-        print(f"401 Unauthorized for {site_id}, refreshing token and retrying")
-        token = get_bearer_token(force_refresh=True)
-        headers["Authorization"] = f"{token}"
-        try:
-            resp = requests.get(url, headers=headers, timeout=30)
-        except Exception as e:
-            print(f"Retry request error for {site_id}: {e}")
-            return
-
-    fname = f"showtimes_{site_id}_{date}.json"
-    out_path = data_dir / fname
+    out_path = showtimes_output_path(site_id, date)
 
     try:
-        data = resp.json()
-        out_path.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
-        print(f"Saved showtimes to {out_path}")
+        save_showtimes_response(resp, out_path, site_id, date)
     except Exception:
         print(f"Failed to parse JSON for {site_id}")
+        return None
+    return resp.content
+
+
+def get_theater_showtimes_by_date(token, entry, date: str | None = None, delay: float = 0.0):
+    """Fetch and save showtimes for a single cinema entry and date.
+
+    Returns right away by default; sequential loops without the async
+    engine's rate limiter pass `delay` to pace themselves.
+    """
+    if date is None:
+        date = datetime.date.today().isoformat()
+
+    site_id = entry.get("key")
+    if not site_id:
+        return
+
+    fetch_showtimes_payload(token, site_id, date)
 
-    time.sleep(delay)
+    if delay:
+        time.sleep(delay)
     return
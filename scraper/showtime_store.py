@@ -0,0 +1,390 @@
+"""Normalized SQLite store for showtime payloads.
+
+Each ingested payload becomes one `scrapes` row plus one `showtimes` row per
+show. Films, screens, attributes and attribute combinations are dictionary
+encoded into their own tables and referenced by integer ids; whatever is not
+normalized is kept zlib-compressed per scrape so `export` can rebuild the
+original JSON. Rows are only ever appended, so history is queryable.
+"""
+import datetime
+import json
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+from artifact_writer import artifact_stem, iter_artifacts, read_artifact
+
+
+STORE_FILE = Path(__file__).parent / "data" / "showtimes.sqlite"
+
+_SHOW_COLUMNS = ("id", "filmId", "screenId", "attributeIds")
+# kept in a scrape's extra blob so export restores the payload's own ordering
+_KEY_ORDER = "__keyOrder__"
+_RELATED_ORDER = "__relatedOrder__"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS films (
+    ref INTEGER PRIMARY KEY,
+    film_id TEXT NOT NULL UNIQUE,
+    title TEXT,
+    runtime INTEGER,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS screens (
+    ref INTEGER PRIMARY KEY,
+    screen_id TEXT NOT NULL UNIQUE,
+    site_id TEXT,
+    name TEXT,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS attributes (
+    ref INTEGER PRIMARY KEY,
+    attribute_id TEXT NOT NULL UNIQUE,
+    name TEXT,
+    data BLOB
+);
+CREATE TABLE IF NOT EXISTS attribute_sets (
+    ref INTEGER PRIMARY KEY,
+    attribute_ids TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS scrapes (
+    ref INTEGER PRIMARY KEY,
+    site_id TEXT NOT NULL,
+    business_date TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    extra BLOB
+);
+CREATE INDEX IF NOT EXISTS scrapes_site_date ON scrapes (site_id, business_date, fetched_at);
+CREATE TABLE IF NOT EXISTS showtimes (
+    scrape_ref INTEGER NOT NULL,
+    show_id TEXT NOT NULL,
+    film_ref INTEGER,
+    screen_ref INTEGER,
+    attribute_set_ref INTEGER,
+    starts_at INTEGER
+);
+CREATE INDEX IF NOT EXISTS showtimes_scrape ON showtimes (scrape_ref);
+CREATE INDEX IF NOT EXISTS showtimes_film ON showtimes (film_ref);
+CREATE VIEW IF NOT EXISTS latest_scrapes AS
+    SELECT s.* FROM scrapes s
+    WHERE s.fetched_at = (SELECT MAX(fetched_at) FROM scrapes
+                          WHERE site_id = s.site_id AND business_date = s.business_date);
+"""
+
+
+def _pack(obj) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), 6)
+
+
+def _unpack(blob):
+    return json.loads(zlib.decompress(blob)) if blob is not None else None
+
+
+def _text(obj, key):
+    value = obj.get(key)
+    if isinstance(value, dict):
+        return value.get("text")
+    return value
+
+
+def _epoch(iso: str | None) -> int | None:
+    try:
+        return int(datetime.datetime.fromisoformat(iso).timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+class ShowtimeStore:
+    def __init__(self, path: Path = STORE_FILE):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(_SCHEMA)
+        self._refs = {"films": {}, "screens": {}, "attributes": {}, "attribute_sets": {}}
+
+    def _ref(self, table: str, key_column: str, key: str, **columns) -> int:
+        """Return the dictionary id for `key`, inserting or updating its row."""
+        cache = self._refs[table]
+        ref = cache.get(key)
+        if ref is not None and not columns:
+            return ref
+        names = [key_column, *columns]
+        placeholders = ", ".join("?" for _ in names)
+        updates = ", ".join(f"{c} = excluded.{c}" for c in columns) or f"{key_column} = excluded.{key_column}"
+        self.db.execute(
+            f"INSERT INTO {table} ({', '.join(names)}) VALUES ({placeholders})"
+            f" ON CONFLICT({key_column}) DO UPDATE SET {updates}",
+            (key, *columns.values()),
+        )
+        ref = self.db.execute(f"SELECT ref FROM {table} WHERE {key_column} = ?", (key,)).fetchone()[0]
+        cache[key] = ref
+        return ref
+
+    def ingest(self, site_id: str, date: str, data: dict, fetched_at: float | None = None) -> int:
+        """Append one showtimes payload; returns the scrape id."""
+        fetched_at = fetched_at if fetched_at is not None else datetime.datetime.now().timestamp()
+        related = dict(data.get("relatedData") or {})
+        films = related.pop("films", []) or []
+        screens = related.pop("screens", []) or []
+        attributes = related.pop("attributes", []) or []
+        extra = {k: v for k, v in data.items() if k not in ("showtimes", "relatedData")}
+        extra["relatedData"] = related
+        extra[_KEY_ORDER] = list(data)
+        extra[_RELATED_ORDER] = {"keys": list(data.get("relatedData") or {}), "films": [f["id"] for f in films],
+                                 "screens": [s["id"] for s in screens], "attributes": [a["id"] for a in attributes]}
+
+        with self._lock, self.db:
+            for f in films:
+                self._ref("films", "film_id", f["id"], title=_text(f, "title"),
+                          runtime=f.get("runtimeInMinutes"), data=_pack(f))
+            for s in screens:
+                self._ref("screens", "screen_id", s["id"], site_id=s.get("siteId"),
+                          name=_text(s, "name"), data=_pack(s))
+            for a in attributes:
+                self._ref("attributes", "attribute_id", a["id"], name=_text(a, "name"), data=_pack(a))
+
+            residuals = []
+            rows = []
+            for show in data.get("showtimes", []):
+                # NULL means the show had no attributeIds key, "" an empty list
+                attr_ids = show.get("attributeIds")
+                attr_set = self._ref("attribute_sets", "attribute_ids", ",".join(attr_ids)) if attr_ids is not None else None
+                film = show.get("filmId")
+                screen = show.get("screenId")
+                rows.append((
+                    show.get("id"),
+                    self._ref("films", "film_id", film) if film else None,
+                    self._ref("screens", "screen_id", screen) if screen else None,
+                    attr_set,
+                    _epoch((show.get("schedule") or {}).get("startsAt")),
+                ))
+                residual = {k: v for k, v in show.items() if k not in _SHOW_COLUMNS}
+                if list(show) != [k for k in _SHOW_COLUMNS if k in show] + list(residual):
+                    residual[_KEY_ORDER] = list(show)
+                residuals.append(residual)
+            extra["showtimes"] = residuals
+
+            scrape = self.db.execute(
+                "INSERT INTO scrapes (site_id, business_date, fetched_at, extra) VALUES (?, ?, ?, ?)",
+                (site_id, date, fetched_at, _pack(extra)),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO showtimes (scrape_ref, show_id, film_ref, screen_ref, attribute_set_ref, starts_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(scrape, *row) for row in rows],
+            )
+        return scrape
+
+    def export(self, site_id: str, date: str) -> dict | None:
+        """Rebuild the raw showtimes JSON of the latest scrape for site/date.
+
+        Keys, shows and relatedData lists come back in the order they were
+        ingested in. Film, screen and attribute objects come back in their
+        most recently ingested version. Scrapes stored before the order was
+        kept get only the objects a show references, in show order.
+        """
+        with self._lock:
+            row = self.db.execute(
+                "SELECT ref, extra FROM scrapes WHERE site_id = ? AND business_date = ?"
+                " ORDER BY fetched_at DESC LIMIT 1", (site_id, date)
+            ).fetchone()
+            if row is None:
+                return None
+            scrape, extra = row
+            shows = self.db.execute(
+                "SELECT st.show_id, f.film_id, sc.screen_id, a.attribute_ids, f.data, sc.data"
+                " FROM showtimes st"
+                " LEFT JOIN films f ON f.ref = st.film_ref"
+                " LEFT JOIN screens sc ON sc.ref = st.screen_ref"
+                " LEFT JOIN attribute_sets a ON a.ref = st.attribute_set_ref"
+                " WHERE st.scrape_ref = ? ORDER BY st.rowid", (scrape,)
+            ).fetchall()
+            attribute_rows = dict(self.db.execute("SELECT attribute_id, data FROM attributes").fetchall())
+            extra = _unpack(extra)
+            order = extra.pop(_RELATED_ORDER, None)
+            if order is not None:
+                film_rows = self._rows("films", "film_id", order["films"])
+                screen_rows = self._rows("screens", "screen_id", order["screens"])
+
+        key_order = extra.pop(_KEY_ORDER, None)
+        residuals = extra.pop("showtimes")
+        related = extra.pop("relatedData")
+        films, screens, attribute_ids = {}, {}, {}
+        showtimes = []
+        for (show_id, film_id, screen_id, attr_ids, film_data, screen_data), residual in zip(shows, residuals):
+            show = {"id": show_id}
+            if film_id:
+                show["filmId"] = film_id
+                if film_data is not None:
+                    films.setdefault(film_id, film_data)
+            if screen_id:
+                show["screenId"] = screen_id
+                if screen_data is not None:
+                    screens.setdefault(screen_id, screen_data)
+            if attr_ids is not None:
+                ids = attr_ids.split(",") if attr_ids else []
+                show["attributeIds"] = ids
+                for a in ids:
+                    attribute_ids.setdefault(a, None)
+            show_order = residual.pop(_KEY_ORDER, None)
+            show.update(residual)
+            if show_order is not None:
+                show = {k: show[k] for k in show_order if k in show}
+            showtimes.append(show)
+
+        if order is not None:
+            films = {f: film_rows[f] for f in order["films"] if film_rows.get(f) is not None}
+            screens = {s: screen_rows[s] for s in order["screens"] if screen_rows.get(s) is not None}
+            attribute_ids = dict.fromkeys(order["attributes"])
+        out = {"showtimes": showtimes}
+        out.update(extra)
+        out["relatedData"] = {
+            "films": [_unpack(b) for b in films.values()],
+            "screens": [_unpack(b) for b in screens.values()],
+            "attributes": [_unpack(attribute_rows[a]) for a in attribute_ids if attribute_rows.get(a) is not None],
+            **related,
+        }
+        if order is not None:
+            out["relatedData"] = {k: out["relatedData"][k] for k in order["keys"] if k in out["relatedData"]}
+        if key_order is not None:
+            out = {k: out[k] for k in key_order if k in out}
+        return out
+
+    def _rows(self, table: str, key_column: str, keys) -> dict:
+        """{key: data} for `keys` of a dictionary table; call with the lock held."""
+        rows = {}
+        keys = list(keys)
+        # stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            rows.update(self.db.execute(
+                f"SELECT {key_column}, data FROM {table} WHERE {key_column} IN ({', '.join('?' * len(chunk))})", chunk))
+        return rows
+
+    def query(self, sql: str, params=()):
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def shows_per_film(self, date_from: str, date_to: str, site_id: str | None = None):
+        """(film title, show count, site count) over the latest scrape of each site/date."""
+        sql = (
+            "SELECT f.title, COUNT(*), COUNT(DISTINCT s.site_id) FROM latest_scrapes s"
+            " JOIN showtimes st ON st.scrape_ref = s.ref"
+            " JOIN films f ON f.ref = st.film_ref"
+            " WHERE s.business_date BETWEEN ? AND ?"
+        )
+        params = [date_from, date_to]
+        if site_id:
+            sql += " AND s.site_id = ?"
+            params.append(site_id)
+        sql += " GROUP BY f.ref ORDER BY COUNT(*) DESC"
+        return self.query(sql, params)
+
+    def shows_per_attribute(self, date_from: str, date_to: str):
+        """(attribute name, show count) over the latest scrapes, e.g. formats and languages."""
+        counts = {}
+        rows = self.query(
+            "SELECT a.attribute_ids, COUNT(*) FROM latest_scrapes s"
+            " JOIN showtimes st ON st.scrape_ref = s.ref"
+            " JOIN attribute_sets a ON a.ref = st.attribute_set_ref"
+            " WHERE s.business_date BETWEEN ? AND ? AND a.attribute_ids != '' GROUP BY a.ref", (date_from, date_to)
+        )
+        names = dict(self.query("SELECT attribute_id, name FROM attributes"))
+        for ids, n in rows:
+            for a in ids.split(","):
+                name = names.get(a) or a
+                counts[name] = counts.get(name, 0) + n
+        return sorted(counts.items(), key=lambda kv: -kv[1])
+
+    def close(self):
+        self.db.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> ShowtimeStore:
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ShowtimeStore()
+    return _store
+
+
+def _parse_showtimes_filename(path: Path):
+    # showtimes_<site>_<date>.json, possibly compressed
+    stem = artifact_stem(path)
+    if not stem.startswith("showtimes_"):
+        return None
+    site_id, _, date = stem[len("showtimes_"):].partition("_")
+    return (site_id, date) if site_id and date else None
+
+
+def ingest_files(store: ShowtimeStore, paths) -> int:
+    count = 0
+    for p in paths:
+        parsed = _parse_showtimes_filename(p)
+        if not parsed:
+            continue
+        try:
+            data = json.loads(read_artifact(p))
+        except (OSError, ValueError) as e:
+            print(f"Skipping {p}: {e}")
+            continue
+        store.ingest(parsed[0], parsed[1], data, fetched_at=p.stat().st_mtime)
+        count += 1
+    return count
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Ingest, export and query the SQLite showtime store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_ingest = sub.add_parser("ingest", help="Import showtimes_*.json files")
+    p_ingest.add_argument("paths", nargs="*", help="Files or directories (default: the whole data dir)")
+    p_export = sub.add_parser("export", help="Print the raw JSON for a site and date")
+    p_export.add_argument("site_id")
+    p_export.add_argument("date")
+    p_export.add_argument("--output", "-o", default=None)
+    p_films = sub.add_parser("films", help="Show counts per film over a date range")
+    p_films.add_argument("date_from")
+    p_films.add_argument("date_to")
+    p_films.add_argument("--site", default=None)
+    p_attrs = sub.add_parser("attributes", help="Show counts per attribute over a date range")
+    p_attrs.add_argument("date_from")
+    p_attrs.add_argument("date_to")
+    args = parser.parse_args()
+
+    store = get_store()
+    if args.command == "ingest":
+        roots = [Path(p) for p in args.paths] or [STORE_FILE.parent]
+        files = []
+        for root in roots:
+            files.extend(iter_artifacts(root, "showtimes_*.json") if root.is_dir() else [root])
+        print(f"Ingested {ingest_files(store, files)} files into {store.path}")
+    elif args.command == "export":
+        data = store.export(args.site_id, args.date)
+        if data is None:
+            raise SystemExit("No scrape stored for site/date")
+        text = json.dumps(data, ensure_ascii=False, indent=2)
+        if args.output:
+            Path(args.output).write_text(text, encoding="utf-8")
+        else:
+            print(text)
+    elif args.command == "films":
+        print(f"{'SHOWS':>6} | {'SITES':>5} | TITLE")
+        for title, shows, sites in store.shows_per_film(args.date_from, args.date_to, args.site):
+            print(f"{shows:>6} | {sites:>5} | {title}")
+    elif args.command == "attributes":
+        for name, shows in store.shows_per_attribute(args.date_from, args.date_to):
+            print(f"{shows:>6} | {name}")
+
+
+if __name__ == "__main__":
+    main()
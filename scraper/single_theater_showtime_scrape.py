@@ -1,7 +1,6 @@
 from bearer_token import get_bearer_token
 from showtime_scraper import get_theater_showtimes_by_date
-import json
-from pathlib import Path
+from data_paths import load_keys
 from typing import Optional
 
 
@@ -10,8 +9,7 @@ def fetch_showtimes_for_key(site_key: str, date: Optional[str] = None, token: Op
 
     If `token` is not provided, a bearer token will be obtained.
     """
-    p = Path(keys_path) if keys_path else Path(__file__).parent / "data" / "cinemas.json"
-    keys = json.loads(p.read_text(encoding="utf-8"))
+    keys = load_keys(keys_path)
     entry = next((e for e in keys if e.get("key") == site_key), None)
     if not entry:
         raise ValueError(f"No entry with key {site_key}")
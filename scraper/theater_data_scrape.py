@@ -1,13 +1,23 @@
 
 import os
-import json
-from playwright.sync_api import sync_playwright
 from config import THEATERS_LIST, DEFAULT_USER_AGENT
+from http_client import get_client
+from json_stream import encode_payload
+from artifact_writer import atomic_write
 
-def theater_data_scrape():
-    data_dir = os.path.join(os.path.dirname(__file__), "data")
-    os.makedirs(data_dir, exist_ok=True)
-    out_path = os.path.join(data_dir, "theaters.json")
+
+def _save_theaters(body, out_path):
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    atomic_write(out_path, encode_payload(raw=body))
+    if body.lstrip()[:1] in (b"{", b"["):
+        print(f"Saved theaters JSON to {out_path}")
+    else:
+        print(f"Saved raw response to {out_path}")
+
+
+def _fetch_theaters_playwright():
+    from playwright.sync_api import sync_playwright
 
     with sync_playwright() as p:
         browser = p.chromium.launch(
@@ -23,24 +33,36 @@ def theater_data_scrape():
             response = page.goto(THEATERS_LIST, timeout=60000)
             if response is None:
                 raise RuntimeError(f"No response received from {THEATERS_LIST}")
-            text = response.text()
-            try:
-                data = json.loads(text)
-                with open(out_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=2)
-                print(f"Saved theaters JSON to {out_path}")
-            except Exception:
-                with open(out_path, "w", encoding="utf-8") as f:
-                    f.write(text)
-                print(f"Saved raw response to {out_path}")
+            return response.body()
+        finally:
+            browser.close()
+
 
+def theater_data_scrape():
+    data_dir = os.path.join(os.path.dirname(__file__), "data")
+    os.makedirs(data_dir, exist_ok=True)
+    out_path = os.path.join(data_dir, "theaters.json")
+
+    body = None
+    try:
+        resp = get_client().get(THEATERS_LIST, headers={"Accept": "application/json"}, cache=True)
+        if resp.status_code == 200:
+            body = resp.content
+        else:
+            print(f"HTTP {resp.status_code} from {THEATERS_LIST}, falling back to Playwright")
+    except Exception as e:
+        print(f"Request error: {e}, falling back to Playwright")
+
+    if body is None:
+        try:
+            body = _fetch_theaters_playwright()
         except Exception as e:
             print(f"Playwright error: {e}")
+            return
 
-        finally:
-            browser.close()
+    _save_theaters(body, out_path)
 
 
 if __name__ == "__main__":
     theater_data_scrape()
-    
\ No newline at end of file
+    
@@ -1,16 +1,11 @@
 from bearer_token import get_bearer_token
-from showtime_scraper import get_theater_showtimes_by_date
-import json
-from pathlib import Path
+from async_scrape import scrape_showtimes
+from scrape_manifest import ScrapeManifest
+from data_paths import load_keys
 from datetime import date, timedelta, datetime
 import argparse
 
 
-def load_keys(path: str | None = None):
-    p = Path(path) if path else Path(__file__).parent / "data" / "cinemas.json"
-    return json.loads(p.read_text(encoding="utf-8"))
-
-
 def next_or_current_friday(from_date: date) -> date:
     # weekday: Monday=0 .. Sunday=6; Friday = 4
     days_ahead = (4 - from_date.weekday()) % 7
@@ -22,24 +17,30 @@ def daterange(start: date, days: int = 7):
         yield start + timedelta(n)
 
 
-def run_week(start_friday: date | None = None):
+def run_week(start_friday: date | None = None, concurrency: int | None = None, rate: float | None = None,
+             incremental: bool = False, batch: bool = False):
     if start_friday is None:
         start_friday = next_or_current_friday(date.today())
 
     keys = load_keys()
     token = get_bearer_token()
 
-    for d in daterange(start_friday, 7):
-        date_str = d.isoformat()
-        print(f"Fetching showtimes for date {date_str}")
-        for entry in keys:
-            get_theater_showtimes_by_date(token, entry, date=date_str)
+    dates = [d.isoformat() for d in daterange(start_friday, 7)]
+    print(f"Fetching showtimes for {dates[0]} .. {dates[-1]} ({len(keys)} cinemas)")
+    manifest = ScrapeManifest() if incremental else None
+    return scrape_showtimes(token, keys, dates, concurrency=concurrency, rate=rate, manifest=manifest, batch=batch)
 
 
-def main():
+def main(argv=None):
     parser = argparse.ArgumentParser(description="Fetch showtimes for a Friday->Thursday week for all cinemas")
     parser.add_argument("--start", help="Start Friday date (YYYY-MM-DD). Defaults to next or current Friday")
-    args = parser.parse_args()
+    parser.add_argument("--concurrency", type=int, default=None, help="Max in-flight requests (default FINNKINO_MAX_CONCURRENCY)")
+    parser.add_argument("--rate", type=float, default=None, help="Max requests per second per host (default FINNKINO_REQUESTS_PER_SECOND)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Skip past and recently fetched dates; only write files whose content changed")
+    parser.add_argument("--batch", action="store_true",
+                        help="Request many cinemas per call (siteIds list) and split the responses per cinema")
+    args = parser.parse_args(argv)
 
     start = None
     if args.start:
@@ -48,7 +49,8 @@ def main():
         except Exception:
             raise SystemExit("Invalid --start date format. Use YYYY-MM-DD")
 
-    run_week(start_friday=start)
+    run_week(start_friday=start, concurrency=args.concurrency, rate=args.rate, incremental=args.incremental,
+             batch=args.batch)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,342 @@
+"""Leased work queue shared by the shard coordinator and its workers.
+
+A unit of work is a JSON dict with a stable "key" and a "partition". Both
+backends give the same guarantees:
+
+- put() is idempotent: a key that is already queued, leased or done is left
+  alone, so the coordinator can re-plan as often as it likes;
+- lease() hands a worker up to n ready units for a limited time; units whose
+  lease ran out (the worker died or hung) are delivered again;
+- ack() and nack() only count for the worker currently holding the lease,
+  so a late ack after a re-delivery is ignored. Units overwrite the same
+  artifacts, so processing one twice is harmless;
+- nack() retries a unit later, and it is marked failed after
+  config.QUEUE_MAX_ATTEMPTS deliveries.
+
+get_value()/set_value() hold small shared state such as the bearer token.
+
+Backends, chosen by URL (config.QUEUE_URL):
+
+    sqlite:///path/queue.sqlite   one SQLite file; workers on one host or on a
+                                  shared filesystem with working file locks
+    redis://host:6379/0           any Redis-compatible server (Redis, Valkey,
+                                  or fakeredis' TCP server as a local stand-in)
+"""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import QUEUE_URL, QUEUE_MAX_ATTEMPTS
+from data_paths import DATA_DIR
+
+
+QUEUE_FILE = DATA_DIR / "work_queue.sqlite"
+
+READY, LEASED, DONE, FAILED = "ready", "leased", "done", "failed"
+
+
+class SqliteQueue:
+    def __init__(self, path: Path = QUEUE_FILE, max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        # autocommit; lease() takes the write lock explicitly with BEGIN IMMEDIATE
+        self.db = sqlite3.connect(str(self.path), timeout=30, isolation_level=None, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS units (
+                key TEXT PRIMARY KEY,
+                partition INTEGER NOT NULL DEFAULT 0,
+                payload TEXT NOT NULL,
+                state TEXT NOT NULL,
+                available_at REAL NOT NULL,
+                owner TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS units_ready ON units (state, partition, available_at);
+            CREATE INDEX IF NOT EXISTS units_lease ON units (state, lease_until);
+            CREATE TABLE IF NOT EXISTS queue_values (name TEXT PRIMARY KEY, value TEXT, updated_at REAL);
+        """)
+
+    def put(self, units, available_at: float | None = None) -> int:
+        """Queue units whose key is not known yet; returns how many were added."""
+        now = time.time()
+        rows = [(u["key"], u.get("partition", 0), json.dumps(u), READY, available_at or now, now) for u in units]
+        with self._lock:
+            before = self.db.total_changes
+            self.db.execute("BEGIN")
+            self.db.executemany(
+                "INSERT OR IGNORE INTO units (key, partition, payload, state, available_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.execute("COMMIT")
+            return self.db.total_changes - before
+
+    def lease(self, worker: str, n: int, seconds: float, partitions=None) -> list[dict]:
+        now = time.time()
+        where = "(state = 'ready' AND available_at <= ?) OR (state = 'leased' AND lease_until < ?)"
+        params = [now, now]
+        if partitions is not None:
+            where = f"({where}) AND partition IN ({', '.join('?' for _ in partitions)})"
+            params += list(partitions)
+        with self._lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                # expired leases that used up their attempts are not handed out again
+                self.db.execute("UPDATE units SET state = 'failed', owner = NULL, updated_at = ?"
+                                " WHERE state = 'leased' AND lease_until < ? AND attempts >= ?",
+                                (now, now, self.max_attempts))
+                rows = self.db.execute(
+                    "UPDATE units SET state = 'leased', owner = ?, lease_until = ?, attempts = attempts + 1, updated_at = ?"
+                    f" WHERE key IN (SELECT key FROM units WHERE {where} ORDER BY available_at LIMIT ?)"
+                    " RETURNING payload",
+                    (worker, now + seconds, now, *params, n),
+                ).fetchall()
+                self.db.execute("COMMIT")
+            except BaseException:
+                self.db.execute("ROLLBACK")
+                raise
+        return [json.loads(p) for (p,) in rows]
+
+    def extend(self, worker: str, keys, seconds: float) -> int:
+        """Push back the lease of units still held by `worker`."""
+        keys = list(keys)
+        if not keys:
+            return 0
+        with self._lock:
+            cur = self.db.execute(
+                f"UPDATE units SET lease_until = ? WHERE state = 'leased' AND owner = ? AND key IN ({', '.join('?' for _ in keys)})",
+                (time.time() + seconds, worker, *keys))
+            return cur.rowcount
+
+    def ack(self, worker: str, key: str) -> bool:
+        with self._lock:
+            cur = self.db.execute("UPDATE units SET state = 'done', owner = NULL, updated_at = ?"
+                                  " WHERE key = ? AND state = 'leased' AND owner = ?", (time.time(), key, worker))
+            return cur.rowcount == 1
+
+    def nack(self, worker: str, key: str, retry_in: float = 0.0) -> bool:
+        now = time.time()
+        with self._lock:
+            cur = self.db.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'ready' END,"
+                " owner = NULL, available_at = ?, updated_at = ? WHERE key = ? AND state = 'leased' AND owner = ?",
+                (self.max_attempts, now + retry_in, now, key, worker))
+            return cur.rowcount == 1
+
+    def purge(self, before: float) -> int:
+        """Forget done and failed units last touched before `before`."""
+        with self._lock:
+            return self.db.execute("DELETE FROM units WHERE state IN ('done', 'failed') AND updated_at < ?",
+                                   (before,)).rowcount
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._lock:
+            counts = dict(self.db.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall())
+            counts["expired"] = self.db.execute("SELECT COUNT(*) FROM units WHERE state = 'leased' AND lease_until < ?",
+                                                (now,)).fetchone()[0]
+        return counts
+
+    def get_value(self, name: str) -> str | None:
+        with self._lock:
+            row = self.db.execute("SELECT value FROM queue_values WHERE name = ?", (name,)).fetchone()
+        return row[0] if row else None
+
+    def set_value(self, name: str, value: str | None):
+        with self._lock:
+            self.db.execute("INSERT OR REPLACE INTO queue_values (name, value, updated_at) VALUES (?, ?, ?)",
+                            (name, value, time.time()))
+
+    def close(self):
+        self.db.close()
+
+
+class RedisQueue:
+    """The same queue on a Redis-compatible server.
+
+    Each unit is a hash (payload, state, owner, lease_until, attempts); sorted
+    sets per partition (ready, by available time) and one for leases (by
+    expiry) index them. Every state change WATCHes the unit's hash and applies
+    the hash and index updates in one MULTI, so no Lua scripting is needed.
+    """
+
+    def __init__(self, url: str, prefix: str = "finnkino:queue:", max_attempts: int = QUEUE_MAX_ATTEMPTS):
+        try:
+            import redis
+        except ImportError:
+            raise SystemExit("A redis:// queue needs the redis package: python3 -m pip install redis")
+        self._redis = redis
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.max_attempts = max_attempts
+
+    def _unit(self, key: str) -> str:
+        return f"{self.prefix}unit:{key}"
+
+    def _ready(self, partition) -> str:
+        return f"{self.prefix}ready:{partition}"
+
+    @property
+    def _leased(self) -> str:
+        return f"{self.prefix}leased"
+
+    def _finished(self, state: str) -> str:
+        return f"{self.prefix}{state}"
+
+    def put(self, units, available_at: float | None = None) -> int:
+        units = list(units)
+        available_at = available_at or time.time()
+        pipe = self.r.pipeline(transaction=False)
+        for u in units:
+            pipe.exists(self._unit(u["key"]))
+        new = [u for u, exists in zip(units, pipe.execute()) if not exists]
+        if not new:
+            return 0
+        pipe = self.r.pipeline(transaction=True)
+        for u in new:
+            partition = u.get("partition", 0)
+            pipe.hset(self._unit(u["key"]), mapping={"payload": json.dumps(u), "state": READY, "partition": partition,
+                                                     "attempts": 0})
+            pipe.zadd(self._ready(partition), {u["key"]: available_at})
+            pipe.sadd(f"{self.prefix}partitions", partition)
+        pipe.execute()
+        return len(new)
+
+    def _transition(self, key: str, check, apply) -> dict | None:
+        """Apply `apply(pipe, unit)` in one MULTI if `check(unit)` holds, retrying on concurrent changes."""
+        ukey = self._unit(key)
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch(ukey)
+                    unit = pipe.hgetall(ukey)
+                    if not unit or not check(unit):
+                        pipe.unwatch()
+                        return None
+                    pipe.multi()
+                    apply(pipe, unit)
+                    pipe.execute()
+                    return unit
+                except self._redis.WatchError:
+                    continue
+
+    def _reap(self, now: float):
+        """Return expired leases to their ready set, or fail them after max attempts."""
+        for key in self.r.zrangebyscore(self._leased, "-inf", now):
+            def apply(pipe, unit, key=key):
+                failed = int(unit.get("attempts", 0)) >= self.max_attempts
+                pipe.hset(self._unit(key), mapping={"state": FAILED if failed else READY, "owner": ""})
+                pipe.zrem(self._leased, key)
+                if failed:
+                    pipe.zadd(self._finished(FAILED), {key: now})
+                else:
+                    pipe.zadd(self._ready(unit.get("partition", 0)), {key: now})
+            self._transition(key, lambda u: u.get("state") == LEASED and float(u.get("lease_until") or 0) < now, apply)
+
+    def lease(self, worker: str, n: int, seconds: float, partitions=None) -> list[dict]:
+        now = time.time()
+        self._reap(now)
+        if partitions is None:
+            partitions = sorted(self.r.smembers(f"{self.prefix}partitions"), key=int)
+        out = []
+        for partition in partitions:
+            if len(out) >= n:
+                break
+            for key in self.r.zrangebyscore(self._ready(partition), "-inf", now, start=0, num=n - len(out)):
+                def apply(pipe, unit, key=key, partition=partition):
+                    pipe.hset(self._unit(key), mapping={"state": LEASED, "owner": worker, "lease_until": now + seconds})
+                    pipe.hincrby(self._unit(key), "attempts", 1)
+                    pipe.zrem(self._ready(partition), key)
+                    pipe.zadd(self._leased, {key: now + seconds})
+                unit = self._transition(key, lambda u: u.get("state") == READY, apply)
+                if unit is not None:
+                    out.append(json.loads(unit["payload"]))
+        return out
+
+    def extend(self, worker: str, keys, seconds: float) -> int:
+        until = time.time() + seconds
+        count = 0
+        for key in keys:
+            def apply(pipe, unit, key=key):
+                pipe.hset(self._unit(key), "lease_until", until)
+                pipe.zadd(self._leased, {key: until})
+            if self._transition(key, lambda u: u.get("state") == LEASED and u.get("owner") == worker, apply) is not None:
+                count += 1
+        return count
+
+    def _finish(self, worker: str, key: str, state: str) -> bool:
+        now = time.time()
+
+        def apply(pipe, unit):
+            pipe.hset(self._unit(key), mapping={"state": state, "owner": ""})
+            pipe.zrem(self._leased, key)
+            pipe.zadd(self._finished(state), {key: now})
+        return self._transition(key, lambda u: u.get("state") == LEASED and u.get("owner") == worker, apply) is not None
+
+    def ack(self, worker: str, key: str) -> bool:
+        return self._finish(worker, key, DONE)
+
+    def nack(self, worker: str, key: str, retry_in: float = 0.0) -> bool:
+        at = time.time() + retry_in
+        held = lambda u: u.get("state") == LEASED and u.get("owner") == worker
+        unit = self.r.hgetall(self._unit(key))
+        if unit and held(unit) and int(unit.get("attempts", 0)) >= self.max_attempts:
+            return self._finish(worker, key, FAILED)
+
+        def apply(pipe, unit):
+            pipe.hset(self._unit(key), mapping={"state": READY, "owner": ""})
+            pipe.zrem(self._leased, key)
+            pipe.zadd(self._ready(unit.get("partition", 0)), {key: at})
+        return self._transition(key, held, apply) is not None
+
+    def purge(self, before: float) -> int:
+        count = 0
+        for state in (DONE, FAILED):
+            keys = self.r.zrangebyscore(self._finished(state), "-inf", before)
+            if keys:
+                pipe = self.r.pipeline(transaction=True)
+                pipe.delete(*[self._unit(k) for k in keys])
+                pipe.zrem(self._finished(state), *keys)
+                pipe.execute()
+                count += len(keys)
+        return count
+
+    def stats(self) -> dict:
+        partitions = self.r.smembers(f"{self.prefix}partitions")
+        counts = {
+            READY: sum(self.r.zcard(self._ready(p)) for p in partitions),
+            LEASED: self.r.zcard(self._leased),
+            DONE: self.r.zcard(self._finished(DONE)),
+            FAILED: self.r.zcard(self._finished(FAILED)),
+            "expired": self.r.zcount(self._leased, "-inf", time.time()),
+        }
+        return {k: v for k, v in counts.items() if v or k in (READY, LEASED)}
+
+    def get_value(self, name: str) -> str | None:
+        return self.r.hget(f"{self.prefix}values", name)
+
+    def set_value(self, name: str, value: str | None):
+        if value is None:
+            self.r.hdel(f"{self.prefix}values", name)
+        else:
+            self.r.hset(f"{self.prefix}values", name, value)
+
+    def close(self):
+        self.r.close()
+
+
+def open_queue(url: str | None = None):
+    """Open the queue at `url` (default config.QUEUE_URL, else data/work_queue.sqlite)."""
+    url = url or QUEUE_URL
+    if not url:
+        return SqliteQueue()
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisQueue(url)
+    if url.startswith("sqlite://"):
+        return SqliteQueue(Path(url[len("sqlite://"):]))
+    return SqliteQueue(Path(url))
@@ -0,0 +1,56 @@
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# the scraper modules import each other as top-level modules, as when run as scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scraper"))
+
+
+class Served:
+    """A local HTTP server answering with `respond(request) -> (status, headers, body)`."""
+
+    def __init__(self, respond):
+        served = self
+        self.requests = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                served.requests.append({"path": self.path, "headers": dict(self.headers),
+                                        "client": self.client_address})
+                status, headers, body = respond(self)
+                self.send_response(status)
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def http_server():
+    started = []
+
+    def start(respond):
+        served = Served(respond)
+        started.append(served)
+        return served
+
+    yield start
+    for served in started:
+        served.close()
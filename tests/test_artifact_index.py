@@ -0,0 +1,33 @@
+import pytest
+
+from artifact_index import SEAT_AVAILABILITY, SHOWTIMES, ArtifactIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ArtifactIndex(tmp_path / "artifacts.sqlite")
+
+
+def test_find_filters_and_returns_newest_first(index, tmp_path):
+    index.record(SHOWTIMES, tmp_path / "a.json", site_id="1", date="2026-05-01", fetched_at=1.0)
+    index.record(SHOWTIMES, tmp_path / "b.json", site_id="1", date="2026-05-01", fetched_at=2.0)
+    index.record(SHOWTIMES, tmp_path / "c.json", site_id="2", date="2026-05-01", fetched_at=3.0)
+
+    assert [row[0].name for row in index.find(SHOWTIMES, site_id="1")] == ["b.json", "a.json"]
+    assert index.latest(SHOWTIMES, date="2026-05-01").name == "c.json"
+    assert index.latest(SEAT_AVAILABILITY) is None
+
+
+def test_rebuild_indexes_existing_files_and_forget_missing_drops_deleted(index, tmp_path):
+    data = tmp_path / "data" / "2026" / "week_18"
+    (data / "seat_availability").mkdir(parents=True)
+    (data / "showtimes_1004_2026-05-01.json").write_text("{}")
+    (data / "seat_availability" / "seat_availability_S1_120000.json").write_text("{}")
+
+    assert index.rebuild(tmp_path / "data") == 2
+    assert index.find(SHOWTIMES)[0][1:3] == ("1004", "2026-05-01")
+    assert index.find(SEAT_AVAILABILITY, show_id="S1")
+
+    (data / "showtimes_1004_2026-05-01.json").unlink()
+    assert index.forget_missing() == 1
+    assert index.find(SHOWTIMES) == []
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+
+import pytest
+
+import artifact_writer
+from artifact_writer import (BatchWriter, artifact_stem, atomic_write, find_artifact, iter_artifacts, locked,
+                             read_artifact, unique_path, write_artifact)
+
+
+def leftovers(directory):
+    return [p.name for p in directory.rglob(".*.tmp")]
+
+
+def test_atomic_write_replaces_the_file_and_leaves_no_temporaries(tmp_path):
+    path = tmp_path / "new" / "dir" / "a.json"
+    assert atomic_write(path, "ä") == path
+    atomic_write(path, b"second", fsync=True)
+    assert path.read_bytes() == b"second"
+    assert leftovers(tmp_path) == []
+
+
+def test_failed_rename_keeps_the_old_file(tmp_path, monkeypatch):
+    path = tmp_path / "a.json"
+    atomic_write(path, b"old")
+
+    def fail(src, dst):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(artifact_writer.os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write(path, b"new")
+    assert path.read_bytes() == b"old"
+    assert leftovers(tmp_path) == []
+
+
+def test_compressed_artifacts_are_found_and_read_transparently(tmp_path):
+    path = tmp_path / "showtimes_1004_2026-05-01.json"
+    written = write_artifact(path, b'{"a": 1}', codec="gzip")
+    assert written.name == "showtimes_1004_2026-05-01.json.gz"
+    assert find_artifact(path) == written
+    assert read_artifact(written) == b'{"a": 1}'
+    assert artifact_stem(written) == "showtimes_1004_2026-05-01"
+    (tmp_path / "other.txt").write_text("x")
+    assert iter_artifacts(tmp_path, "showtimes_*.json") == [written]
+    assert find_artifact(tmp_path / "missing.json") is None
+
+
+def test_unique_paths_never_repeat():
+    names = {unique_path(artifact_writer.Path("d"), "seat_availability_S1_") for _ in range(1000)}
+    assert len(names) == 1000
+
+
+def test_batch_writer_makes_files_visible_only_on_flush(tmp_path):
+    with BatchWriter(codec="", max_files=3) as writer:
+        paths = [writer.write(tmp_path / "w" / f"{i}.json", f"{i}") for i in range(4)]
+        # the first three were flushed together when the batch filled up
+        assert [p.exists() for p in paths] == [True, True, True, False]
+    assert [p.read_text() for p in paths] == ["0", "1", "2", "3"]
+    assert leftovers(tmp_path) == []
+
+
+def test_batch_writer_compresses_unless_told_not_to(tmp_path):
+    with BatchWriter(codec="gzip") as writer:
+        packed = writer.write(tmp_path / "a.json", b"{}")
+        plain = writer.write(tmp_path / "b.jsonl", b"{}\n", compressed=False)
+    assert (packed.name, plain.name) == ("a.json.gz", "b.jsonl")
+    assert read_artifact(packed) == b"{}"
+
+
+def test_batch_writer_cleans_up_when_a_write_fails(tmp_path, monkeypatch):
+    writer = BatchWriter(codec="")
+    writer.write(tmp_path / "a.json", b"a")
+    writer.write(tmp_path / "b.json", b"b")
+    real = artifact_writer._write_tmp
+    calls = []
+
+    def flaky(path, data, fsync):
+        calls.append(path)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        return real(path, data, fsync)
+
+    monkeypatch.setattr(artifact_writer, "_write_tmp", flaky)
+    with pytest.raises(OSError):
+        writer.flush()
+    assert not (tmp_path / "a.json").exists()
+    assert leftovers(tmp_path) == []
+
+
+@pytest.mark.skipif(artifact_writer.fcntl is None, reason="needs fcntl")
+def test_locked_excludes_other_holders(tmp_path):
+    path = tmp_path / "series"
+    events = []
+
+    def hold(name):
+        with locked(path):
+            events.append(f"{name} in")
+            time.sleep(0.05)
+            events.append(f"{name} out")
+
+    threads = [threading.Thread(target=hold, args=(n,)) for n in "ab"]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert events[0][0] == events[1][0] and events[2][0] == events[3][0]
+    assert os.path.exists(str(path) + ".lock")
@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from async_scrape import AdaptiveBatcher, HostRateLimiter, TokenBucket
+
+
+def batcher(size=8):
+    return AdaptiveBatcher(size=size, max_size=32, target_seconds=2.0, target_bytes=1000)
+
+
+def test_batcher_halves_on_slow_or_large_responses():
+    b = batcher()
+    b.observe(8, 3.0, 100)
+    assert b.size == 4
+    b.observe(4, 0.5, 5000)
+    assert b.size == 2
+
+
+def test_batcher_doubles_when_well_under_target_up_to_max():
+    b = batcher()
+    b.observe(8, 0.5, 100)
+    assert b.size == 16
+    b.observe(16, 0.5, 100)
+    b.observe(32, 0.5, 100)
+    assert b.size == 32
+
+
+def test_batcher_holds_between_half_and_full_target():
+    b = batcher()
+    b.observe(8, 1.5, 100)
+    assert b.size == 8
+
+
+def test_batcher_does_not_grow_on_small_batches_and_halves_on_failure():
+    b = batcher()
+    b.observe(3, 0.1, 10)
+    assert b.size == 8
+    b.failed(3)
+    assert b.size == 1
+    b.failed(1)
+    assert b.size == 1
+
+
+def test_batcher_clamps_initial_size():
+    assert AdaptiveBatcher(size=100, max_size=10).size == 10
+    assert AdaptiveBatcher(size=0, max_size=10).size == 1
+
+
+def test_token_bucket_throttles_once_per_event_down_to_a_floor():
+    bucket = TokenBucket(rate=16.0, burst=4)
+    bucket.throttle(at=1.0)
+    assert bucket.rate == 8.0
+    bucket.throttle(at=1.0)  # the same 429 reported by another request
+    assert bucket.rate == 8.0
+    for n in range(2, 10):
+        bucket.throttle(at=float(n))
+    assert bucket.rate == 1.0
+
+
+def test_token_bucket_recovers_gradually_up_to_max():
+    bucket = TokenBucket(rate=20.0)
+    bucket.throttle(at=1.0)
+    bucket.recover()
+    assert bucket.rate == pytest.approx(11.0)
+    for _ in range(20):
+        bucket.recover()
+    assert bucket.rate == 20.0
+
+
+def test_token_bucket_allows_burst_then_paces():
+    async def run():
+        bucket = TokenBucket(rate=100.0, burst=3)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(3):
+            await bucket.acquire()
+        burst = loop.time() - started
+        for _ in range(5):
+            await bucket.acquire()
+        return burst, loop.time() - started
+
+    burst, total = asyncio.run(run())
+    assert burst < 0.02
+    assert total >= 0.04
+
+
+def test_host_rate_limiter_keeps_one_bucket_per_host():
+    limiter = HostRateLimiter(rate=5.0, burst=2)
+    a = limiter.bucket("https://a.example/x/1")
+    assert limiter.bucket("https://a.example/y") is a
+    assert limiter.bucket("https://b.example/x/1") is not a
@@ -0,0 +1,112 @@
+import base64
+import json
+import threading
+import time
+
+import pytest
+
+import bearer_token
+from bearer_token import TokenProvider, _WarmBrowser, _token_exp, _token_valid
+
+
+def jwt(exp):
+    def b64(obj):
+        return base64.urlsafe_b64encode(json.dumps(obj).encode()).rstrip(b"=").decode()
+    return f"{b64({'alg': 'none'})}.{b64({'exp': exp})}.sig"
+
+
+@pytest.fixture(autouse=True)
+def token_file(tmp_path, monkeypatch):
+    path = tmp_path / "bearer_token.json"
+    monkeypatch.setattr(bearer_token, "TOKEN_FILE", path)
+    return path
+
+
+class Source:
+    """A token source that is slow enough for callers to pile up on one capture."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        return jwt(time.time() + 3600 + self.calls)
+
+
+@pytest.fixture
+def provider():
+    p = TokenProvider()
+    p.source = Source()
+    yield p
+    p.close()
+
+
+def test_token_expiry_from_jwt():
+    assert _token_exp(jwt(1234)) == 1234.0
+    assert _token_exp("not-a-jwt") is None
+    assert _token_valid(jwt(time.time() + 60))
+    assert not _token_valid(jwt(time.time() - 60))
+    assert not _token_valid("not-a-jwt")
+
+
+def test_get_reuses_a_valid_saved_token(provider, token_file):
+    saved = jwt(time.time() + 3600)
+    token_file.write_text(json.dumps({"token": saved}), encoding="utf-8")
+    assert provider.get() == saved
+    assert provider.source.calls == 0
+
+
+def test_get_refreshes_an_expired_token_and_saves_it(provider, token_file):
+    token_file.write_text(json.dumps({"token": jwt(time.time() - 10)}), encoding="utf-8")
+    token = provider.get()
+    assert provider.source.calls == 1
+    assert json.loads(token_file.read_text(encoding="utf-8"))["token"] == token
+
+
+def test_concurrent_refreshes_share_one_capture(provider):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(provider.refresh())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert provider.source.calls == 1
+    assert len(set(results)) == 1
+
+
+def test_refresh_of_an_already_replaced_token_returns_the_replacement(provider):
+    first = provider.refresh()
+    second = provider.refresh(stale=first)
+    assert second != first
+    assert provider.refresh(stale=first) == second
+    assert provider.source.calls == 2
+
+
+def test_failed_capture_raises_and_frees_the_slot(provider):
+    provider.source = lambda: None
+    with pytest.raises(RuntimeError):
+        provider.refresh()
+    provider.source = Source(delay=0)
+    assert provider.refresh()
+
+
+def test_warm_browser_capture_times_out_when_nobody_answers(monkeypatch):
+    # a browser thread that exits without taking the job off the queue
+    monkeypatch.setattr(_WarmBrowser, "_run", lambda self: None)
+    browser = _WarmBrowser(timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        browser.capture()
+    assert time.monotonic() - started < 2
+
+
+def test_provider_falls_back_to_a_cold_browser_when_the_warm_one_hangs(monkeypatch):
+    monkeypatch.setattr(bearer_token, "TOKEN_URL", "")
+    monkeypatch.setattr(_WarmBrowser, "_run", lambda self: None)
+    cold = jwt(time.time() + 3600)
+    monkeypatch.setattr(bearer_token, "_fetch_token_via_playwright", lambda: cold)
+    p = TokenProvider()
+    p._browser.timeout = 0.1
+    assert p.refresh() == cold
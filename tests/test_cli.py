@@ -0,0 +1,49 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cli
+
+
+SCRAPER = Path(__file__).resolve().parent.parent / "scraper"
+
+
+def write_payload(tmp_path):
+    path = tmp_path / "showtimes_1004_2026-05-01.json"
+    path.write_text(json.dumps({
+        "showtimes": [{"id": "s1", "filmId": "F1", "schedule": {"startsAt": "2026-05-01T18:00:00+03:00"}}],
+        "relatedData": {"films": [{"id": "F1", "title": {"text": "Film"}, "runtimeInMinutes": 90}]},
+    }))
+    return path
+
+
+def test_parse_passes_its_options_to_schedule_parse(tmp_path, capsys):
+    cli.main(["parse", "-i", str(write_payload(tmp_path)), "-f", "jsonl"])
+    row = json.loads(capsys.readouterr().out)
+    assert (row["site_id"], row["show_id"], row["title"]) == ("1004", "s1", "Film")
+
+
+def test_commands_with_their_own_options_reject_unknown_ones(capsys):
+    with pytest.raises(SystemExit):
+        cli.main(["scrape", "day", "--bogus"])
+    assert "unrecognized arguments: --bogus" in capsys.readouterr().err
+
+
+def test_subcommands_dispatch_to_their_runner():
+    args, rest = cli.build_parser().parse_known_args(["scrape", "site", "1004", "--date", "2026-05-01"])
+    assert (args.run, args.site_id, args.date, rest) == (cli._scrape_site, "1004", "2026-05-01", [])
+    args, rest = cli.build_parser().parse_known_args(["scrape", "week", "--incremental"])
+    assert (args.run, rest) == (cli._scrape_week, ["--incremental"])
+
+
+def test_parse_does_not_load_the_http_stack(tmp_path):
+    code = (
+        "import sys, cli\n"
+        f"cli.main(['parse', '-i', {str(write_payload(tmp_path))!r}, '-f', 'csv', '-o', {str(tmp_path / 'out.csv')!r}])\n"
+        "print(sorted(m for m in ('http_client', 'bearer_token', 'requests', 'playwright') if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=SCRAPER, capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
@@ -0,0 +1,78 @@
+import asyncio
+import time
+
+import pytest
+
+from daemon import Schedule, ScrapeDaemon, seat_poll_interval
+
+
+POLICY = [(30, 120), (120, 300), (None, 3600)]
+
+
+@pytest.fixture
+def schedule(tmp_path):
+    return Schedule(tmp_path / "schedule.sqlite")
+
+
+def test_seat_polls_tighten_towards_the_start():
+    assert seat_poll_interval(10 * 60, POLICY) == 120
+    assert seat_poll_interval(60 * 60, POLICY) == 300
+    assert seat_poll_interval(24 * 3600, POLICY) == 3600
+
+
+def test_add_keeps_the_existing_next_run(schedule):
+    schedule.add("showtimes|1|2026-05-01", "showtimes", 100.0, site_id="1", date="2026-05-01")
+    schedule.add("showtimes|1|2026-05-01", "showtimes", 50.0, site_id="1", date="2026-05-01")
+    assert schedule.next_run() == 100.0
+    assert schedule.due(99.0, 10) == []
+    assert [job[0] for job in schedule.due(100.0, 10)] == ["showtimes|1|2026-05-01"]
+
+
+def test_due_returns_the_earliest_jobs_up_to_the_limit(schedule):
+    for i, next_run in enumerate((30.0, 10.0, 20.0)):
+        schedule.add(f"seats|{i}", "seats", next_run, show_id=str(i))
+    assert [job[0] for job in schedule.due(100.0, 2)] == ["seats|1", "seats|2"]
+    schedule.reschedule("seats|1", 200.0)
+    assert [job[0] for job in schedule.due(100.0, 3)] == ["seats|2", "seats|0"]
+
+
+def test_prune_drops_past_dates_and_started_shows(schedule):
+    schedule.add("showtimes|1|2026-04-30", "showtimes", 0.0, site_id="1", date="2026-04-30")
+    schedule.add("showtimes|1|2026-05-01", "showtimes", 0.0, site_id="1", date="2026-05-01")
+    schedule.add("seats|old", "seats", 0.0, show_id="old", starts_at=50.0)
+    schedule.add("seats|new", "seats", 0.0, show_id="new", starts_at=500.0)
+    schedule.prune("2026-05-01", now=100.0)
+    assert sorted(job[0] for job in schedule.due(100.0, 10)) == ["seats|new", "showtimes|1|2026-05-01"]
+    assert schedule.counts() == {"seats": 1, "showtimes": 1}
+
+
+class Engine:
+    def __init__(self):
+        self.urls = []
+
+    async def fetch(self, url, headers=None):
+        self.urls.append(url)
+        return type("Resp", (), {"status_code": 503})()
+
+
+@pytest.fixture
+def daemon(schedule):
+    d = ScrapeDaemon.__new__(ScrapeDaemon)
+    d.schedule = schedule
+    d.engine = Engine()
+    return d
+
+
+def test_seat_jobs_stop_once_the_show_has_started(daemon):
+    daemon.schedule.add("seats|S", "seats", 0.0, show_id="S", starts_at=time.time() - 1)
+    asyncio.run(daemon.run_seats("seats|S", "1", "2026-05-01", "S", time.time() - 1))
+    assert daemon.engine.urls == []
+    assert daemon.schedule.counts() == {}
+
+
+def test_last_seat_poll_lands_right_before_the_start(daemon):
+    starts_at = time.time() + 90
+    daemon.schedule.add("seats|S", "seats", 0.0, show_id="S", starts_at=starts_at)
+    asyncio.run(daemon.run_seats("seats|S", "1", "2026-05-01", "S", starts_at))
+    assert len(daemon.engine.urls) == 1
+    assert daemon.schedule.next_run() == pytest.approx(starts_at - 60, abs=1)
@@ -0,0 +1,31 @@
+import datetime
+import json
+
+import data_paths
+from data_paths import load_keys, parse_date, showtimes_path, week_dir
+
+
+def test_parse_date_accepts_iso_and_finnish_formats():
+    assert parse_date("2026-05-01") == datetime.date(2026, 5, 1)
+    assert parse_date("1.5.2026") == datetime.date(2026, 5, 1)
+    assert parse_date("garbage") == datetime.date.today()
+    assert parse_date(None) == datetime.date.today()
+
+
+def test_paths_follow_the_iso_week(tmp_path, monkeypatch):
+    monkeypatch.setattr(data_paths, "DATA_DIR", tmp_path)
+    # 2027-01-01 belongs to ISO week 53 of 2026
+    assert week_dir("2027-01-01") == tmp_path / "2026" / "week_53"
+    path = showtimes_path("1004", "2026-05-01", create=True)
+    assert path == tmp_path / "2026" / "week_18" / "showtimes_1004_2026-05-01.json"
+    assert path.parent.is_dir()
+
+
+def test_load_keys_is_cached_until_the_file_changes(tmp_path):
+    path = tmp_path / "cinemas.json"
+    path.write_text(json.dumps([{"key": "1", "value": "A"}]))
+    first = load_keys(str(path))
+    assert load_keys(str(path)) is first
+
+    path.write_text(json.dumps([{"key": "2", "value": "B"}, {"key": "3", "value": "C"}]))
+    assert [k["key"] for k in load_keys(str(path))] == ["2", "3"]
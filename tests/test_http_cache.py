@@ -0,0 +1,112 @@
+import pytest
+
+import config
+import http_cache
+from http_cache import HttpCache, ttl_for
+from http_client import HttpClient
+
+
+@pytest.fixture(autouse=True)
+def ttls(monkeypatch):
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_TTLS", [("/never", None), ("/cached", 60)])
+
+
+@pytest.fixture
+def client(tmp_path):
+    c = HttpClient(pool_size=2, http2=False, cache_enabled=True)
+    c._cache = HttpCache(tmp_path)
+    yield c
+    c.close()
+
+
+def validating_server(http_server, etag='"v1"'):
+    def respond(req):
+        if req.headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag, "Content-Type": "application/json"}, b'{"v": 1}'
+
+    return http_server(respond)
+
+
+def test_showtimes_are_not_cached_by_default():
+    assert dict(config.HTTP_CACHE_TTLS)["/showtimes/by-business-date/"] is None
+
+
+def test_ttl_for_uses_the_first_matching_pattern():
+    assert ttl_for("http://x/cached/a") == 60
+    assert ttl_for("http://x/never/cached") is None
+    assert ttl_for("http://x/other") is None
+
+
+def test_fresh_entries_are_served_without_a_request(http_server, client):
+    server = validating_server(http_server)
+    first = client.get(server.url + "/cached", cache=True)
+    second = client.get(server.url + "/cached", cache=True)
+    assert not getattr(first, "from_cache", False)
+    assert second.from_cache and second.json() == {"v": 1}
+    assert len(server.requests) == 1
+    assert client.cache.stats()["hits"] == 1
+
+
+def test_stale_entries_are_revalidated_with_the_etag(http_server, client, monkeypatch):
+    server = validating_server(http_server)
+    client.get(server.url + "/cached", cache=True)
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_TTLS", [("/cached", 0)])
+
+    resp = client.get(server.url + "/cached", cache=True)
+    assert resp.not_modified and resp.json() == {"v": 1}
+    assert server.requests[1]["headers"]["If-None-Match"] == '"v1"'
+    assert client.cache.stats()["revalidated"] == 1
+
+
+def test_missing_body_is_refetched_without_validators(http_server, client, monkeypatch):
+    server = validating_server(http_server)
+    client.get(server.url + "/cached", cache=True)
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_TTLS", [("/cached", 0)])
+    for body in client.cache.root.glob("*/*.body"):
+        body.unlink()
+
+    assert client.get(server.url + "/cached", cache=True).json() == {"v": 1}
+    assert "If-None-Match" not in server.requests[-1]["headers"]
+
+
+def test_uncached_urls_are_never_stored(http_server, client):
+    server = validating_server(http_server)
+    client.get(server.url + "/never", cache=True)
+    client.get(server.url + "/never", cache=True)
+    assert len(server.requests) == 2
+    assert client.cache.stats()["entries"] == 0
+
+
+def test_entries_are_scoped_by_auth(tmp_path):
+    cache = HttpCache(tmp_path)
+    assert cache.key("http://x/cached", "anon") != cache.key("http://x/cached", "sub:a")
+
+
+class Resp:
+    status_code = 200
+
+    def __init__(self, content):
+        self.content = content
+        self.headers = {}
+
+
+def test_eviction_drops_the_least_recently_used_entry(tmp_path):
+    cache = HttpCache(tmp_path, max_entries=2)
+    for name in ("a", "b"):
+        cache.store(f"http://x/cached/{name}", "anon", Resp(b"x"))
+    entry, _ = cache.lookup("http://x/cached/a", "anon")
+    cache.hit(entry)
+    cache.store("http://x/cached/c", "anon", Resp(b"x"))
+
+    assert cache.lookup("http://x/cached/a", "anon")[0] is not None
+    assert cache.lookup("http://x/cached/b", "anon")[0] is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_eviction_respects_the_byte_limit(tmp_path):
+    cache = HttpCache(tmp_path, max_bytes=10)
+    cache.store("http://x/cached/a", "anon", Resp(b"123456"))
+    cache.store("http://x/cached/b", "anon", Resp(b"123456"))
+    assert cache.stats()["size"] <= 10
+    assert cache.lookup("http://x/cached/a", "anon")[0] is None
@@ -0,0 +1,69 @@
+import gzip
+
+import pytest
+
+import bearer_token
+from http_client import HttpClient
+
+
+class Provider:
+    def __init__(self, token="Bearer fresh"):
+        self.token = token
+        self.refreshes = []
+
+    def refresh(self, stale=None):
+        self.refreshes.append(stale)
+        return self.token
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    p = Provider()
+    monkeypatch.setattr(bearer_token, "get_provider", lambda: p)
+    return p
+
+
+@pytest.fixture
+def client():
+    c = HttpClient(pool_size=4, http2=False, cache_enabled=False)
+    yield c
+    c.close()
+
+
+def test_requests_reuse_one_pooled_connection(http_server, client):
+    server = http_server(lambda req: (200, {"Content-Type": "application/json"}, b"{}"))
+    for _ in range(3):
+        assert client.get(server.url + "/x").status_code == 200
+    assert len({r["client"] for r in server.requests}) == 1
+    assert "gzip" in server.requests[0]["headers"]["Accept-Encoding"]
+    assert server.requests[0]["headers"]["User-Agent"]
+
+
+def test_gzip_bodies_are_decoded(http_server, client):
+    body = b'{"showtimes": []}'
+    server = http_server(lambda req: (200, {"Content-Encoding": "gzip"}, gzip.compress(body)))
+    assert client.get(server.url + "/x").content == body
+
+
+def test_auth_injects_token_and_refreshes_once_on_401(http_server, client, provider):
+    def respond(req):
+        ok = req.headers.get("Authorization") == "Bearer fresh"
+        return (200 if ok else 401), {}, b"{}"
+
+    server = http_server(respond)
+    client.set_token("Bearer old")
+    assert client.get(server.url + "/x", auth=True).status_code == 200
+    assert provider.refreshes == ["Bearer old"]
+    assert [r["headers"]["Authorization"] for r in server.requests] == ["Bearer old", "Bearer fresh"]
+
+    # a token that already got a 401 is not taken back from a caller holding a stale copy
+    client.set_token("Bearer old")
+    assert client.get(server.url + "/x", auth=True).status_code == 200
+    assert provider.refreshes == ["Bearer old"]
+
+
+def test_refresh_token_is_single_flight_for_the_same_stale_token(client, provider):
+    client.set_token("Bearer old")
+    assert client.refresh_token("Bearer old") == "Bearer fresh"
+    assert client.refresh_token("Bearer old") == "Bearer fresh"
+    assert provider.refreshes == ["Bearer old"]
@@ -0,0 +1,56 @@
+import gzip
+import io
+
+import pytest
+
+import json_stream
+from json_stream import dumps, encode_payload, iter_documents, iter_items, loads, looks_like_object
+
+
+@pytest.fixture(params=["fast", "stdlib"])
+def backend(request, monkeypatch):
+    """Run against orjson/ijson when installed, and against the standard library fallbacks."""
+    if request.param == "stdlib":
+        monkeypatch.setattr(json_stream, "BACKEND", "json")
+        monkeypatch.setattr(json_stream, "ijson", None)
+    return request.param
+
+
+PAYLOAD = {"businessDate": "2026-05-01", "showtimes": [{"id": "1", "price": 12.5}, {"id": "2"}],
+           "relatedData": {"films": [{"id": "F", "title": "Elokuva ä"}]}}
+
+
+def test_loads_and_dumps_round_trip_bytes(backend):
+    raw = dumps(PAYLOAD)
+    assert isinstance(raw, bytes)
+    assert loads(raw) == PAYLOAD
+    assert loads(raw.decode("utf-8")) == PAYLOAD
+    assert dumps(PAYLOAD, pretty=True).startswith(b'{\n  "businessDate"')
+
+
+def test_iter_items_walks_a_prefix(backend, tmp_path):
+    path = tmp_path / "showtimes.json.gz"
+    path.write_bytes(gzip.compress(dumps(PAYLOAD)))
+    assert [s["id"] for s in iter_items(path, "showtimes.item")] == ["1", "2"]
+    assert list(iter_items(dumps(PAYLOAD), "relatedData.films.item.title")) == ["Elokuva ä"]
+    assert list(iter_items(dumps(PAYLOAD), "missing.item")) == []
+    assert list(iter_items(dumps(PAYLOAD), "showtimes.item.price")) == [12.5]
+
+
+def test_iter_documents_reads_concatenated_payloads_and_json_lines(backend):
+    stream = io.BytesIO(b'{"a": 1}{"a": 2}\n{"a": 3}\n\n[4]\n')
+    assert list(iter_documents(stream)) == [{"a": 1}, {"a": 2}, {"a": 3}, [4]]
+
+
+def test_encode_payload_keeps_raw_bodies_unless_pretty(backend):
+    raw = b'{"b":1,   "a":2}'
+    assert encode_payload(raw=raw, pretty=False) is raw
+    assert loads(encode_payload(raw=raw, pretty=True)) == {"b": 1, "a": 2}
+    assert encode_payload(raw=b"<html>", pretty=True) == b"<html>"
+    assert loads(encode_payload({"a": 1}, pretty=False)) == {"a": 1}
+
+
+def test_looks_like_object_only_checks_the_first_byte():
+    assert looks_like_object(b'  \n{"a": 1}')
+    assert not looks_like_object(b"[1]")
+    assert not looks_like_object(b"")
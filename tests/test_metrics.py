@@ -0,0 +1,69 @@
+import json
+
+import pytest
+
+import metrics
+from metrics import Registry
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+
+
+def test_counters_add_up_per_label_set():
+    registry = Registry()
+    c = registry.counter("requests_total", "Requests")
+    c.inc(endpoint="a")
+    c.inc(2, endpoint="a")
+    c.inc(endpoint='b"x')
+    assert registry.counter("requests_total") is c
+    assert registry.prometheus().splitlines() == [
+        "# HELP requests_total Requests",
+        "# TYPE requests_total counter",
+        'requests_total{endpoint="a"} 3',
+        'requests_total{endpoint="b\\"x"} 1',
+    ]
+
+
+def test_histograms_export_cumulative_buckets_and_summary_percentiles():
+    registry = Registry()
+    h = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1, 10))
+    for value in (0.05, 0.5, 0.5, 5, 50):
+        h.observe(value)
+    lines = registry.prometheus().splitlines()
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 5' in lines
+    assert "latency_seconds_count 5" in lines
+    (summary,) = registry.summary()["histograms"]["latency_seconds"]
+    assert (summary["count"], summary["p50"], summary["max"]) == (5, 1, 50)
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", False)
+    registry = Registry()
+    registry.counter("c").inc()
+    assert registry.prometheus() == "\n"
+
+
+def test_spans_time_blocks_count_errors_and_trace_with_parents(tmp_path, monkeypatch):
+    trace = tmp_path / "trace.jsonl"
+    monkeypatch.setattr(metrics, "METRICS_TRACE_FILE", str(trace))
+    errors = metrics.SPAN_ERRORS.values.get((("span", "inner"),), 0)
+    with metrics.span("outer", site_id="1004"):
+        with pytest.raises(ValueError):
+            with metrics.span("inner"):
+                raise ValueError
+    records = [json.loads(line) for line in trace.read_text().splitlines()]
+    assert [(r["name"], r["parent"], r["status"]) for r in records] == [("inner", "outer", "error"), ("outer", None, "ok")]
+    assert records[1]["site_id"] == "1004"
+    assert metrics.SPAN_ERRORS.values[(("span", "inner"),)] == errors + 1
+
+
+def test_write_summary_and_prometheus_files(tmp_path):
+    metrics.counter("finnkino_test_total").inc()
+    prom = metrics.write_prometheus(tmp_path / "finnkino.prom")
+    assert "finnkino_test_total 1" in prom.read_text()
+    summary = json.loads(metrics.write_summary("test", tmp_path / "run.json").read_text())
+    assert summary["run"] == "test"
+    assert summary["counters"]["finnkino_test_total"] == [{"labels": {}, "value": 1}]
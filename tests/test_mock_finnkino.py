@@ -0,0 +1,94 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+import mock_finnkino
+from mock_finnkino import MockServer, MockSettings, make_token, seat_payload, showtimes_payload, token_exp
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(settings):
+        srv = MockServer(("127.0.0.1", 0), settings)
+        threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(srv)
+        return srv
+
+    yield start
+    for srv in servers:
+        srv.shutdown()
+        srv.server_close()
+
+
+@pytest.fixture
+def server(serve):
+    return serve(MockSettings(sites=3, shows_per_site=4))
+
+
+def get(server, path, token=None, headers=None):
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = token
+    req = urllib.request.Request(server.base_url + path, headers=headers)
+    try:
+        with urllib.request.urlopen(req) as resp:
+            return resp.status, dict(resp.headers), resp.read()
+    except urllib.error.HTTPError as e:
+        return e.code, dict(e.headers), e.read()
+
+
+def test_payloads_are_deterministic():
+    settings = MockSettings(shows_per_site=5)
+    assert showtimes_payload(settings, "1004", "2026-05-01") == showtimes_payload(settings, "1004", "2026-05-01")
+    assert showtimes_payload(settings, "1004", "2026-05-01") != showtimes_payload(settings, "1094", "2026-05-01")
+
+
+def test_seats_only_ever_sell_as_polls_go_on():
+    settings = MockSettings()
+    early = seat_payload(settings, "S1", 0.2)
+    late = seat_payload(settings, "S1", 0.6)
+    seats = lambda data: {s["id"]: s["status"] for r in data["seatLayoutData"]["areas"][0]["rows"] for s in r["seats"]}
+    sold_early = {k for k, v in seats(early).items() if v == "Sold"}
+    sold_late = {k for k, v in seats(late).items() if v == "Sold"}
+    assert sold_early < sold_late
+
+
+def test_token_expiry_is_readable():
+    assert token_exp("Bearer " + make_token(60)) == pytest.approx(mock_finnkino.time.time() + 60, abs=2)
+    assert token_exp("garbage") is None
+
+
+def test_api_needs_a_valid_token(server):
+    assert get(server, "/ocapi/v1/sites")[0] == 401
+    assert get(server, "/ocapi/v1/sites", "Bearer " + make_token(-10))[0] == 401
+    _, _, body = get(server, "/token")
+    status, _, body = get(server, "/ocapi/v1/sites", json.loads(body)["token"])
+    assert status == 200
+    assert [s["id"] for s in json.loads(body)] == ["1004", "1094", "1095"]
+
+
+def test_multi_site_showtimes_merge_per_site_payloads(server):
+    token = "Bearer " + make_token(60)
+    _, _, body = get(server, "/ocapi/v1/showtimes/by-business-date/2026-05-01?siteIds=1004&siteIds=1094", token)
+    data = json.loads(body)
+    assert {s["siteId"] for s in data["showtimes"]} == {"1004", "1094"}
+    assert len(data["showtimes"]) == 8
+
+
+def test_etag_revalidation_answers_304(server):
+    status, headers, _ = get(server, "/api/omnia/connect/v1/cinemas")
+    assert status == 200
+    status, _, body = get(server, "/api/omnia/connect/v1/cinemas", headers={"If-None-Match": headers["ETag"]})
+    assert (status, body) == (304, b"")
+
+
+def test_rate_limit_answers_429_with_retry_after(serve):
+    srv = serve(MockSettings(rate_limit=1.0))
+    statuses = [get(srv, "/api/omnia/connect/v1/cinemas") for _ in range(3)]
+    assert statuses[0][0] == 200
+    assert statuses[-1][0] == 429 and statuses[-1][1]["Retry-After"] == "1"
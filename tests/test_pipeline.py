@@ -0,0 +1,39 @@
+import json
+
+import pipeline
+from pipeline import parse_seat_payload, parse_showtimes_payload
+
+
+def raw_payload(*shows):
+    return json.dumps({
+        "showtimes": [{"id": show_id, "filmId": "F1", "schedule": {"startsAt": starts}} for show_id, starts in shows],
+        "relatedData": {"films": [{"id": "F1", "title": {"text": "Film"}, "runtimeInMinutes": 90}]},
+    }).encode("utf-8")
+
+
+def test_only_shows_that_have_not_started_are_queued_for_seats(monkeypatch):
+    monkeypatch.setattr(pipeline, "SEAT_SWEEP_WINDOW_HOURS", 0)
+    raw = raw_payload(("later", "2099-01-02T20:00:00+02:00"), ("past", "2000-01-02T18:00:00+02:00"),
+                      ("sooner", "2099-01-02T18:00:00+02:00"))
+    _, show_ids, _, _, _, _ = parse_showtimes_payload(raw, "1004", "2099-01-02", False, False)
+    assert show_ids == ["sooner", "later"]
+
+
+def test_shows_outside_the_sweep_window_are_skipped(monkeypatch):
+    monkeypatch.setattr(pipeline, "SEAT_SWEEP_WINDOW_HOURS", 24)
+    raw = raw_payload(("far", "2099-01-02T20:00:00+02:00"))
+    assert parse_showtimes_payload(raw, "1004", "2099-01-02", False, False)[1] == []
+
+
+def test_rows_and_data_are_returned_on_request():
+    raw = raw_payload(("s1", "2099-01-02T20:00:00+02:00"))
+    body, _, rows, data, _, _ = parse_showtimes_payload(raw, "1004", "2099-01-02", True, True)
+    row = json.loads(rows)
+    assert (row["show_id"], row["title"], row["starts_at"]) == ("s1", "Film", "2099-01-02T20:00:00+02:00")
+    assert data["showtimes"][0]["id"] == "s1"
+    assert parse_showtimes_payload(raw, "1004", "2099-01-02", False, False)[2:4] == (None, None)
+
+
+def test_unparseable_seat_payloads_are_stored_as_received():
+    assert parse_seat_payload(b"not json", True) == (None, None)
+    assert parse_seat_payload(b'{"seats": []}', True)[1] == {"seats": []}
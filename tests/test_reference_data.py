@@ -0,0 +1,53 @@
+from reference_data import Catalog
+
+
+def test_sources_merge_into_one_record_per_id():
+    catalog = Catalog()
+    catalog.add_source("cinemas", [{"key": "1004", "value": "Tennispalatsi"}])
+    catalog.add_source("sites", {"sites": [{"id": 1004, "name": {"text": "Tennispalatsi Helsinki"},
+                                            "screens": [{"id": "100401", "name": {"text": "Sali 1"}}]}]})
+    catalog.add_source("theaters", [{"properties": {"name": "Tennispalatsi", "url": "/teatterit/tennispalatsi",
+                                                    "vistaCinema": {"key": "1004"}, "addressLine1": "Salomonkatu 15",
+                                                    "postCode": "00100"}}])
+    site = catalog.site("1004")
+    assert site["name"] == "Tennispalatsi Helsinki"
+    assert site["address"] == "Salomonkatu 15, 00100"
+    assert catalog.screen("100401") == {"id": "100401", "siteId": "1004", "name": "Sali 1"}
+    assert catalog.counts()["sites"] == 1
+
+
+def test_films_genres_and_features_are_indexed_by_id():
+    catalog = Catalog()
+    catalog.add_source("films", {"films": [{"id": "HO1", "title": {"text": "Film"}, "runtimeInMinutes": 90}]})
+    catalog.add_source("genres", [{"id": 3, "name": "Draama"}])
+    catalog.add_source("features", {"items": [{"id": "attr1", "name": {"text": "3D"}}]})
+    assert catalog.name("films", "HO1") == "Film"
+    assert catalog.genre(3)["name"] == "Draama"
+    assert catalog.name("attributes", "attr1") == "3D"
+    assert catalog.name("films", "missing") is None
+
+
+def test_absorbed_related_data_fills_gaps_without_erasing_fields():
+    catalog = Catalog()
+    catalog.add_source("films", [{"id": "HO1", "title": {"text": "Film"}, "censorRatingId": "12"}])
+    catalog.absorb_related({"films": [{"id": "HO1", "title": {"text": "Film"}, "runtimeInMinutes": 100}],
+                            "screens": [{"id": "S1", "siteId": "1004", "name": {"text": "Sali 1"}}]})
+    assert catalog.film("HO1")["runtimeInMinutes"] == 100
+    assert catalog.film("HO1")["censorRatingId"] == "12"
+    assert catalog.name("screens", "S1") == "Sali 1"
+    assert catalog.dirty
+
+
+def test_save_keeps_records_other_processes_saved(tmp_path):
+    path = tmp_path / "catalog.json"
+    first, second = Catalog(), Catalog()
+    first.absorb_related({"films": [{"id": "HO1", "title": {"text": "One"}}]})
+    second.absorb_related({"films": [{"id": "HO2", "title": {"text": "Two"}}]})
+    first.save(path)
+    second.save(path)
+
+    loaded = Catalog()
+    assert loaded.load(path)
+    assert sorted(loaded.tables["films"]) == ["HO1", "HO2"]
+    assert not second.dirty
+    assert not Catalog().load(tmp_path / "missing.json")
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+
+import retry_policy
+from retry_policy import CircuitBreaker, RetryBudget, RetryPolicy, endpoint_key, parse_retry_after
+
+
+class Response:
+    def __init__(self, status_code, retry_after=None):
+        self.status_code = status_code
+        self.headers = {"Retry-After": retry_after} if retry_after is not None else {}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+    monkeypatch.setattr(retry_policy.time, "sleep", slept.append)
+    return slept
+
+
+def policy(**kwargs):
+    return RetryPolicy(max_attempts=kwargs.pop("max_attempts", 4), base_delay=0.0, max_delay=30.0,
+                       budget=RetryBudget(capacity=100.0), **kwargs)
+
+
+def sender(*responses):
+    responses = list(responses)
+    calls = []
+
+    def send():
+        calls.append(1)
+        return responses.pop(0)
+    return send, calls
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("7") == 7.0
+    assert parse_retry_after(" 1.5 ") == 1.5
+    assert parse_retry_after("-3") == 0.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_backoff_honours_retry_after_capped_at_max_delay():
+    p = policy()
+    assert p.backoff(1, retry_after=5.0) == 5.0
+    assert p.backoff(1, retry_after=300.0) == 30.0
+
+
+def test_endpoint_key_wildcards_ids_and_dates():
+    assert endpoint_key("https://h/ocapi/v1/showtimes/1004-20260102-001/seat-availability") == \
+        "h/ocapi/v1/showtimes/*/seat-availability"
+    assert endpoint_key("https://h/ocapi/v1/showtimes/by-business-date/2026-01-02?siteIds=1004") == \
+        "h/ocapi/v1/showtimes/by-business-date/*"
+
+
+def test_429_waits_for_retry_after_and_does_not_open_circuit(sleeps):
+    p = policy()
+    send, calls = sender(Response(429, "2"), Response(200))
+    url = "https://h/api/v1/films"
+    assert p.call(send, url).status_code == 200
+    assert len(calls) == 2
+    # the endpoint hold plus the backoff before the retry, both at least Retry-After
+    assert sleeps and all(s >= 1.9 for s in sleeps)
+    assert p.breaker(url).state == "closed"
+
+
+def test_retryable_status_returns_last_response_when_attempts_run_out(sleeps):
+    p = policy(max_attempts=3)
+    send, calls = sender(Response(503), Response(503), Response(503))
+    assert p.call(send, "https://h/api/v1/films").status_code == 503
+    assert len(calls) == 3
+
+
+def test_non_retryable_status_is_returned_at_once(sleeps):
+    p = policy()
+    send, calls = sender(Response(404))
+    assert p.call(send, "https://h/api/v1/films").status_code == 404
+    assert len(calls) == 1 and sleeps == []
+
+
+def test_exhausted_budget_stops_retries(sleeps):
+    p = RetryPolicy(max_attempts=5, base_delay=0.0, budget=RetryBudget(ratio=0.0, min_per_second=0.0, capacity=1.0))
+    p.budget.balance = 0.0
+    send, calls = sender(Response(503), Response(200))
+    assert p.call(send, "https://h/api/v1/films").status_code == 503
+    assert len(calls) == 1
+    assert p.budget.exhausted == 1
+
+
+def test_breaker_opens_after_threshold_and_lets_one_probe_through():
+    breaker = CircuitBreaker(threshold=2, reset=0.05)
+    breaker.failure()
+    assert breaker.state == "closed"
+    breaker.failure()
+    assert breaker.state == "open" and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()  # the probe is still out
+    breaker.success()
+    assert breaker.state == "closed" and breaker.allow()
@@ -0,0 +1,75 @@
+import csv
+import io
+import json
+
+from schedule_parse import (iter_json_input, iter_payloads, iter_schedule_rows, load_json_input,
+                            parse_finnkino_schedule, parse_schedules, parse_start_times, write_rows)
+
+
+def payload(*shows):
+    return {
+        "showtimes": [
+            {"id": show_id, "filmId": "F1", "screenId": "S1", "attributeIds": ["a1"],
+             "schedule": {"startsAt": starts}}
+            for show_id, starts in shows
+        ],
+        "relatedData": {
+            "films": [{"id": "F1", "title": {"text": "Film"}, "runtimeInMinutes": 90}],
+            "screens": [{"id": "S1", "name": {"text": "Sali 1"}}],
+            "attributes": [{"id": "a1", "name": {"text": "2D"}}],
+        },
+    }
+
+
+def test_parse_start_times_parses_each_distinct_string_once():
+    a, b, c, d = parse_start_times(["2026-05-01T18:00:00+03:00", None, "2026-05-01T18:00:00+03:00", "2026-05-01T20:00:00+03:00"])
+    assert a is c
+    assert b is None
+    assert (d - a).seconds == 7200
+
+
+def test_rows_are_ordered_by_timestamp_across_midnight():
+    data = payload(("late", "2026-05-02T00:30:00+03:00"), ("none", None), ("early", "2026-05-01T23:00:00+03:00"))
+    rows = list(iter_schedule_rows(data, "1004", "2026-05-01"))
+    assert [r["show_id"] for r in rows] == ["early", "late", "none"]
+    assert rows[0]["time"] == "23:00"
+    assert (rows[0]["title"], rows[0]["duration"], rows[0]["screen"], rows[0]["attributes"]) == ("Film", "90 min", "Sali 1", "2D")
+
+
+def test_unknown_films_keep_the_legacy_placeholders():
+    data = payload(("s1", "2026-05-01T18:00:00+03:00"))
+    data["relatedData"]["films"] = []
+    assert parse_finnkino_schedule(data) == [
+        {"time": "18:00", "title": "Unknown Title", "duration": "None min", "screen": "Sali 1", "attributes": "2D"}]
+
+
+def test_parse_schedules_sorts_across_payloads_unless_streaming():
+    payloads = [("1", "2026-05-01", payload(("b", "2026-05-01T20:00:00+03:00"))),
+                ("2", "2026-05-01", payload(("a", "2026-05-01T18:00:00+03:00")))]
+    assert [r["show_id"] for r in parse_schedules(payloads)] == ["a", "b"]
+    assert [r["show_id"] for r in parse_schedules(payloads, sort=False)] == ["b", "a"]
+
+
+def test_iter_payloads_reads_site_and_date_from_file_names(tmp_path):
+    (tmp_path / "showtimes_1004_2026-05-01.json").write_text(json.dumps(payload()))
+    assert [(s, d) for s, d, _ in iter_payloads([str(tmp_path)])] == [("1004", "2026-05-01")]
+
+
+def test_csv_output_has_iso_timestamps():
+    out = io.StringIO()
+    write_rows(iter_schedule_rows(payload(("s1", "2026-05-01T18:00:00+03:00")), "1004"), "csv", out)
+    (row,) = csv.DictReader(io.StringIO(out.getvalue()))
+    assert row["starts_at"] == "2026-05-01T18:00:00+03:00"
+    assert row["site_id"] == "1004"
+
+
+def test_load_json_input_returns_one_payload(tmp_path):
+    path = tmp_path / "payload.json"
+    path.write_text(json.dumps(payload()))
+    assert load_json_input(str(path)) == payload()
+
+
+def test_iter_json_input_streams_json_lines(tmp_path):
+    path = tmp_path / "payloads.jsonl"
+    path.write_text(json.dumps(payload(("a", None))) + "\n" + json.dumps(payload(("b", None))) + "\n")
+    assert [data["showtimes"][0]["id"] for data in iter_json_input(str(path))] == ["a", "b"]
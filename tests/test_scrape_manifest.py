@@ -0,0 +1,59 @@
+import datetime
+import json
+
+from scrape_manifest import ScrapeManifest, content_hash, max_age_for, payload_hash
+
+
+TODAY = datetime.date(2026, 5, 1)
+POLICY = [(0, 100), (2, 1000), (None, 10000)]
+
+
+def test_max_age_grows_with_distance():
+    assert max_age_for(0, POLICY) == 100
+    assert max_age_for(2, POLICY) == 1000
+    assert max_age_for(30, POLICY) == 10000
+
+
+def test_unknown_dates_are_due_and_past_dates_never(tmp_path):
+    manifest = ScrapeManifest(tmp_path / "manifest.json", POLICY)
+    assert manifest.is_due("1", "2026-05-01", today=TODAY)
+    assert manifest.is_due("1", "3.5.2026", today=TODAY)
+    assert not manifest.is_due("1", "2026-04-30", today=TODAY)
+
+
+def test_freshness_depends_on_days_ahead(tmp_path):
+    manifest = ScrapeManifest(tmp_path / "manifest.json", POLICY)
+    for date in ("2026-05-01", "2026-05-10"):
+        manifest.record("1", date, "h")
+    fetched = manifest.entries["1|2026-05-01"]["fetched_at"]
+
+    assert not manifest.is_due("1", "2026-05-01", today=TODAY, now=fetched + 50)
+    assert manifest.is_due("1", "2026-05-01", today=TODAY, now=fetched + 100)
+    assert not manifest.is_due("1", "2026-05-10", today=TODAY, now=fetched + 5000)
+    assert manifest.is_due("2", "2026-05-10", today=TODAY, now=fetched)
+
+
+def test_record_reports_content_changes(tmp_path):
+    manifest = ScrapeManifest(tmp_path / "manifest.json", POLICY)
+    assert manifest.record("1", "2026-05-01", content_hash(b"a"))
+    assert not manifest.record("1", "2026-05-01", content_hash(b"a"))
+    assert manifest.record("1", "2026-05-01", content_hash(b"b"))
+    assert (manifest.changed, manifest.unchanged) == (2, 1)
+
+
+def test_save_round_trips_and_bad_files_start_empty(tmp_path):
+    path = tmp_path / "manifest.json"
+    manifest = ScrapeManifest(path, POLICY)
+    manifest.record("1", "2026-05-01", "h")
+    manifest.save()
+    assert ScrapeManifest(path, POLICY).entries == manifest.entries
+
+    path.write_text("{not json")
+    assert ScrapeManifest(path, POLICY).entries == {}
+
+
+def test_payload_hash_ignores_key_order_and_formatting():
+    a = payload_hash({"showtimes": [{"id": "1", "filmId": "F"}], "businessDate": "2026-05-01"})
+    b = payload_hash(json.loads('{"businessDate": "2026-05-01",\n "showtimes": [{"filmId": "F", "id": "1"}]}'))
+    assert a == b
+    assert a != payload_hash({"showtimes": [], "businessDate": "2026-05-01"})
@@ -0,0 +1,63 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from seat_analytics import (AVAILABLE, MISSING, OTHER, RESERVED, SOLD, SnapshotTable, parse_week, status_code,
+                            status_matrix)
+
+
+def test_status_words_map_to_codes():
+    assert status_code("Sold") == SOLD
+    assert status_code("OCCUPIED") == SOLD
+    assert status_code("Reserved") == RESERVED
+    assert status_code("Available") == AVAILABLE
+    assert status_code("Unavailable") == OTHER
+    assert status_code(None) == OTHER
+
+
+def test_status_matrix_has_one_column_per_snapshot():
+    seat_ids, matrix = status_matrix([{"A-1": "Available", "A-2": "Sold"}, {"A-1": "Sold"}])
+    assert seat_ids == ["A-1", "A-2"]
+    assert matrix.tolist() == [[AVAILABLE, SOLD], [SOLD, MISSING]]
+
+
+def test_parse_week_accepts_iso_weeks_and_dates():
+    assert parse_week("2026-W18") == "2026-04-27"
+    assert parse_week("2026-05-01") == "2026-05-01"
+
+
+@pytest.fixture
+def table():
+    start = 10_000.0
+    results = [
+        # show id, poll times, sold, reserved, capacity; the last poll of "a" is after its start
+        ("a", np.array([start - 7200, start - 3600, start + 60]), np.array([10, 40, 90]), np.array([0, 0, 0]),
+         np.array([100, 100, 100])),
+        ("b", np.array([start - 3600, start]), np.array([0, 20]), np.array([5, 0]), np.array([50, 50])),
+        ("empty", np.array([]), np.array([]), np.array([]), np.array([])),
+    ]
+    meta = {"a": {"film": "F1", "title": "Film", "site": "1004", "starts_at": start},
+            "b": {"film": "F2", "title": "Other", "site": "1004", "starts_at": start}}
+    return SnapshotTable(results, meta)
+
+
+def test_table_drops_shows_without_snapshots(table):
+    assert table.shows == ["a", "b"]
+    assert len(table) == 5
+
+
+def test_fill_uses_the_last_snapshot_before_start(table):
+    assert table.fill_by("film") == [("Film", 1, 40, 100, 0.4), ("Other", 1, 20, 50, 0.4)]
+    assert table.fill_by("site") == [("1004", 2, 60, 150, 0.4)]
+
+
+def test_velocity_counts_seats_sold_per_hour_before_start(table):
+    assert table.velocity_by("show") == [("a", 30, 1.0, 30.0), ("b", 20, 1.0, 20.0)]
+    assert table.velocity_by("show", hours=0.5) == []
+
+
+def test_curves_report_fill_at_points_before_start(table):
+    assert [row[2] for row in table.curve("a")] == [10, 40, 90]
+    curves = table.curve_by("show", points=(120, 60, 0))
+    assert curves["a"] == [0.1, 0.4, 0.4]
+    assert np.isnan(curves["b"][0]) and curves["b"][1:] == [0.0, 0.4]
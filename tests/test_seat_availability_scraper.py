@@ -0,0 +1,37 @@
+from datetime import datetime, timezone
+
+from seat_availability_scraper import select_shows, shows_from_payload
+
+NOW = datetime(2026, 1, 2, 12, 0, tzinfo=timezone.utc).timestamp()
+
+
+def show(show_id, hour):
+    return {"id": show_id, "startsAt": f"2026-01-02T{hour:02d}:00:00+00:00" if hour is not None else None}
+
+
+SHOWS = [show("evening", 20), show("started", 11), show("afternoon", 14), show("no-time", None), show("late", 23)]
+
+
+def ids(shows):
+    return [s["id"] for s in shows]
+
+
+def test_select_shows_skips_started_and_orders_by_start():
+    assert ids(select_shows(SHOWS, NOW)) == ["afternoon", "evening", "late", "no-time"]
+
+
+def test_select_shows_include_started():
+    assert ids(select_shows(SHOWS, NOW, include_started=True)) == ["started", "afternoon", "evening", "late", "no-time"]
+
+
+def test_select_shows_window_drops_later_and_untimed_shows():
+    assert ids(select_shows(SHOWS, NOW, window_hours=9)) == ["afternoon", "evening"]
+    assert ids(select_shows(SHOWS, NOW, window_hours=9, include_started=True)) == ["started", "afternoon", "evening"]
+
+
+def test_shows_from_payload():
+    data = {"showtimes": [{"id": "a", "filmId": "F1", "schedule": {"startsAt": "2026-01-02T20:00:00+00:00"}},
+                          {"filmId": "F2"}, {"id": "b"}]}
+    assert shows_from_payload(data) == [{"id": "a", "startsAt": "2026-01-02T20:00:00+00:00", "filmId": "F1"},
+                                        {"id": "b", "startsAt": None, "filmId": None}]
+    assert shows_from_payload(None) == []
@@ -0,0 +1,71 @@
+import pytest
+
+import seat_snapshots
+from seat_snapshots import SeatSeries, SeatSnapshotStore, apply_statuses, diff_seats, extract_seats
+
+
+def seat_map(sold=(), seats=("A-1", "A-2", "A-3")):
+    return {"areas": [{"id": "A", "rows": [{"seats": [
+        {"id": s, "status": "Sold" if s in sold else "Available"} for s in seats]}]}]}
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(seat_snapshots, "week_dir", lambda date: tmp_path)
+    return SeatSnapshotStore()
+
+
+def test_extract_seats_suffixes_repeated_ids():
+    data = {"areas": [{"seats": [{"id": "1", "status": "Sold"}]}, {"seats": [{"id": "1", "status": "Available"}]}]}
+    assert extract_seats(data) == {"1": "Sold", "1#1": "Available"}
+
+
+def test_diff_seats_marks_removed_seats_none():
+    assert diff_seats({"a": "Sold", "b": "Available"}, {"a": "Available"}) == {"a": "Available", "b": None}
+
+
+def test_state_at_rebuilds_each_poll():
+    base = {"showId": "X", "t": 100.0, "data": seat_map()}
+    deltas = [
+        {"t": 160.0, "c": {"A-1": "Sold"}},
+        {"t": 220.0},
+        {"t": 280.0, "c": {"A-2": "Sold", "A-3": None}},
+    ]
+    series = SeatSeries(base, deltas)
+    assert series.state_at(99.0) == {}
+    assert series.state_at(100.0) == {"A-1": "Available", "A-2": "Available", "A-3": "Available"}
+    assert series.state_at(200.0) == {"A-1": "Sold", "A-2": "Available", "A-3": "Available"}
+    assert series.state_at(220.0) == series.state_at(200.0)
+    assert series.state_at() == {"A-1": "Sold", "A-2": "Sold"}
+    assert series.occupancy()[-1] == (280.0, {"Sold": 2})
+
+
+def test_snapshot_at_restores_payload():
+    series = SeatSeries({"showId": "X", "t": 100.0, "data": seat_map()}, [{"t": 160.0, "c": {"A-1": "Sold"}}])
+    assert series.snapshot_at() == seat_map(sold=("A-1",))
+    assert apply_statuses(seat_map(), {}) == seat_map()
+
+
+def test_append_writes_base_then_deltas(store):
+    store.append("X", "2026-01-02", seat_map(), t=100.0)
+    store.append("X", "2026-01-02", seat_map(sold=("A-1",)), t=160.0)
+    store.append("X", "2026-01-02", seat_map(sold=("A-1",)), t=220.0)
+    series = store.load("X", "2026-01-02")
+    assert series.deltas == [{"t": 160.0, "c": {"A-1": "Sold"}}, {"t": 220.0}]
+    assert series.state_at(160.0) == extract_seats(seat_map(sold=("A-1",)))
+
+
+def test_append_diffs_against_polls_of_other_processes(store):
+    other = SeatSnapshotStore()  # a second process: its own cache, same files
+    store.append("X", "2026-01-02", seat_map(), t=100.0)
+    other.append("X", "2026-01-02", seat_map(sold=("A-1",)), t=160.0)
+    store.append("X", "2026-01-02", seat_map(sold=("A-1", "A-2")), t=150.0)
+    series = store.load("X", "2026-01-02")
+    assert series.deltas[-1] == {"t": 160.0, "c": {"A-2": "Sold"}}
+    assert series.state_at() == extract_seats(seat_map(sold=("A-1", "A-2")))
+
+
+def test_appends_share_one_lock_file_per_directory(store, tmp_path):
+    for show_id in ("X", "Y"):
+        store.append(show_id, "2026-01-02", seat_map(), t=100.0)
+    assert sorted(p.name for p in tmp_path.rglob("*.lock")) == ["seat_series.lock"]
@@ -0,0 +1,125 @@
+import json
+
+import pytest
+
+from showtime_changes import ADDED, CANCELLED, CHANGED, ChangeFeed, diff_states, read_changes, show_states
+
+NOW = 1767355200.0  # 2026-01-02T12:00:00Z
+# record_many diffs at the current time; shows this far ahead have not started
+LATER = "2099-01-02T18:00:00+02:00"
+
+
+def state(starts_at, **fields):
+    return {"filmId": "HO1", "screenId": "S1", "startsAt": starts_at, "endsAt": None,
+            "attributeIds": [], "isSoldOut": False, **fields}
+
+
+@pytest.fixture
+def feed(tmp_path):
+    f = ChangeFeed(tmp_path)
+    f.record_many([("1094", "2026-01-01", {})])  # the silent first baseline
+    yield f
+    f.close()
+
+
+def test_show_states_tracks_fields_and_sorts_attributes():
+    data = {"showtimes": [
+        {"id": "a", "filmId": "HO1", "screenId": "S1", "attributeIds": ["b", "a"], "isSoldOut": False,
+         "schedule": {"startsAt": "2026-01-02T18:00:00+02:00", "endsAt": "2026-01-02T20:00:00+02:00"}},
+        {"filmId": "HO2"},
+    ]}
+    assert show_states(data) == {"a": {
+        "filmId": "HO1", "screenId": "S1", "startsAt": "2026-01-02T18:00:00+02:00",
+        "endsAt": "2026-01-02T20:00:00+02:00", "attributeIds": ["a", "b"], "isSoldOut": False}}
+
+
+def test_diff_states_unchanged_is_empty():
+    old = {"a": state("2026-01-02T18:00:00+02:00")}
+    assert diff_states(old, dict(old), NOW) == []
+
+
+def test_diff_states_added_changed_cancelled():
+    old = {
+        "kept": state("2026-01-02T18:00:00+02:00"),
+        "moved": state("2026-01-02T19:00:00+02:00"),
+        "gone": state("2026-01-02T21:00:00+02:00"),
+    }
+    new = {
+        "kept": state("2026-01-02T18:00:00+02:00"),
+        "moved": state("2026-01-02T19:30:00+02:00", isSoldOut=True),
+        "new": state("2026-01-02T17:00:00+02:00"),
+    }
+    events = diff_states(old, new, NOW)
+    assert [(e["type"], e["showId"]) for e in events] == [(ADDED, "new"), (CHANGED, "moved"), (CANCELLED, "gone")]
+    assert events[1]["changes"] == {
+        "startsAt": ["2026-01-02T19:00:00+02:00", "2026-01-02T19:30:00+02:00"],
+        "isSoldOut": [False, True],
+    }
+    assert events[2]["show"] == old["gone"]
+
+
+def test_diff_states_started_show_dropping_out_is_not_cancelled():
+    old = {"started": state("2026-01-02T13:00:00+02:00"), "later": state("2026-01-02T20:00:00+02:00")}
+    events = diff_states(old, {}, NOW)
+    assert [(e["type"], e["showId"]) for e in events] == [(CANCELLED, "later")]
+
+
+def test_record_emits_against_previous_state(feed):
+    first = feed.record_many([("1004", "2026-01-02", {"a": state("2026-01-02T18:00:00+02:00")})])
+    assert [(e["type"], e["seq"], e["siteId"], e["date"]) for e in first] == [(ADDED, 1, "1004", "2026-01-02")]
+    assert feed.record_many([("1004", "2026-01-02", {"a": state("2026-01-02T18:00:00+02:00")})]) == []
+    again = feed.record_many([("1004", "2026-01-02", {"a": state("2026-01-02T18:00:00+02:00", screenId="S2")})])
+    assert [(e["type"], e["seq"]) for e in again] == [(CHANGED, 2)]
+
+
+def test_record_without_emit_only_stores_state(feed, tmp_path):
+    assert feed.record_many([("1004", "2026-01-02", {"a": state("2026-01-02T18:00:00+02:00")})], emit=False) == []
+    assert read_changes(root=tmp_path) == ([], None)
+    assert feed.record_many([("1004", "2026-01-02", {"a": state("2026-01-02T18:00:00+02:00")})]) == []
+
+
+def test_new_feed_takes_its_first_payloads_as_the_baseline(tmp_path):
+    feed = ChangeFeed(tmp_path)
+    try:
+        assert feed.record_many([("1004", "2026-01-02", {"a": state(LATER)})]) == []
+        assert read_changes(root=tmp_path) == ([], None)
+        events = feed.record_many([("1004", "2026-01-03", {"b": state(LATER)})])
+        assert [(e["type"], e["showId"], e["seq"]) for e in events] == [(ADDED, "b", 1)]
+    finally:
+        feed.close()
+
+
+def test_read_changes_cursor_advances_and_resumes(feed, tmp_path):
+    feed.record_many([("1004", "2026-01-02", {"a": state(LATER),
+                                              "b": state("2099-01-02T19:00:00+02:00")})])
+    events, cursor = read_changes(root=tmp_path)
+    assert [e["showId"] for e in events] == ["a", "b"]
+
+    assert read_changes(cursor, root=tmp_path) == ([], cursor)
+
+    feed.record_many([("1004", "2026-01-02", {"a": state(LATER)})])
+    events, next_cursor = read_changes(cursor, root=tmp_path)
+    assert [(e["type"], e["showId"]) for e in events] == [(CANCELLED, "b")]
+    assert next_cursor != cursor
+
+
+def test_read_changes_limit_resumes_after_last_returned(feed, tmp_path):
+    feed.record_many([("1004", "2026-01-02", {s: state(f"2026-01-02T1{n}:00:00+02:00") for n, s in enumerate("abc")})])
+    first, cursor = read_changes(limit=2, root=tmp_path)
+    rest, _ = read_changes(cursor, root=tmp_path)
+    assert [e["showId"] for e in first + rest] == ["a", "b", "c"]
+
+
+def test_read_changes_leaves_partial_line_and_moves_to_next_segment(tmp_path):
+    line = json.dumps({"seq": 1}) + "\n"
+    (tmp_path / "2026-01-01.jsonl").write_text(line + '{"seq": 2', encoding="utf-8")
+    events, cursor = read_changes(root=tmp_path)
+    assert [e["seq"] for e in events] == [1]
+    assert cursor == f"2026-01-01:{len(line)}"
+
+    with open(tmp_path / "2026-01-01.jsonl", "a", encoding="utf-8") as f:
+        f.write("}\n")
+    (tmp_path / "2026-01-02.jsonl").write_text(json.dumps({"seq": 3}) + "\n", encoding="utf-8")
+    events, cursor = read_changes(cursor, root=tmp_path)
+    assert [e["seq"] for e in events] == [2, 3]
+    assert cursor.startswith("2026-01-02:")
@@ -0,0 +1,87 @@
+import json
+import os
+
+import pytest
+
+import showtime_index
+from artifact_index import SHOWTIMES, ArtifactIndex
+from showtime_index import ShowtimeIndex
+
+
+def payload(*shows):
+    return {
+        "showtimes": [
+            {"id": show_id, "filmId": film, "screenId": "S1", "attributeIds": attrs,
+             "schedule": {"startsAt": starts}}
+            for show_id, film, starts, attrs in shows
+        ],
+        "relatedData": {
+            "films": [{"id": "F1", "title": {"text": "Dune"}, "runtimeInMinutes": 155},
+                      {"id": "F2", "title": {"text": "Paddington"}, "runtimeInMinutes": 100}],
+            "screens": [{"id": "S1", "name": {"text": "Sali 1"}}],
+            "attributes": [{"id": "a1", "name": {"text": "IMAX"}}, {"id": "a2", "name": {"text": "3D"}}],
+        },
+    }
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch):
+    artifacts = ArtifactIndex(tmp_path / "artifacts.sqlite")
+    monkeypatch.setattr(showtime_index, "get_index", lambda: artifacts)
+    idx = ShowtimeIndex(tmp_path / "showtime_index.sqlite")
+    idx.artifacts = artifacts
+    yield idx
+    idx.close()
+
+
+@pytest.fixture
+def loaded(index):
+    index.add_payload("1004", "2026-05-01", payload(
+        ("s1", "F1", "2026-05-01T18:00:00+03:00", ["a1"]),
+        ("s2", "F2", "2026-05-01T12:00:00+03:00", []),
+    ))
+    index.add_payload("1094", "2026-05-02", payload(("s3", "F1", "2026-05-02T21:00:00+03:00", ["a1", "a2"])))
+    return index
+
+
+def test_shows_filter_by_title_attribute_and_hour(loaded):
+    shows = loaded.shows(film="dune", refresh=False)
+    assert [s["show_id"] for s in shows] == ["s1", "s3"]
+    assert shows[0]["title"] == "Dune" and shows[0]["time"] == "18:00"
+    assert [s["show_id"] for s in loaded.shows(attributes=["imax", "3D"], refresh=False)] == ["s3"]
+    assert [s["show_id"] for s in loaded.shows(attributes=["a1"], hours=(17, 19), refresh=False)] == ["s1"]
+    assert [s["show_id"] for s in loaded.shows(site="1004", date_to="2026-05-01", refresh=False)] == ["s2", "s1"]
+
+
+def test_film_summary_and_film_list(loaded):
+    summary = loaded.film_summary("F1", refresh=False)
+    assert summary["films"] == [("F1", "Dune")]
+    assert sorted(site for site, *_ in summary["sites"]) == ["1004", "1094"]
+    assert loaded.films(refresh=False)[0][:4] == ("F1", "Dune", 2, 2)
+
+
+def test_readding_a_site_date_replaces_its_rows(loaded):
+    loaded.add_payload("1004", "2026-05-01", payload(("s9", "F2", "2026-05-01T15:00:00+03:00", [])))
+    assert [s["show_id"] for s in loaded.shows(site="1004", refresh=False)] == ["s9"]
+    assert loaded.counts() == {"sources": 2, "films": 2, "shows": 2}
+    assert loaded.query("SELECT COUNT(*) FROM show_attributes") == [(4,)]  # s3: ids and names of a1, a2
+
+
+def test_update_indexes_recorded_files_once(index, tmp_path):
+    path = tmp_path / "showtimes_1004_2026-05-01.json"
+    path.write_text(json.dumps(payload(("s1", "F1", "2026-05-01T18:00:00+03:00", []))))
+    index.artifacts.record(SHOWTIMES, path, site_id="1004", date="2026-05-01", fetched_at=1.0)
+    assert index.update() == 1
+    assert index.update() == 0
+    assert [s["show_id"] for s in index.shows()] == ["s1"]
+
+
+def test_full_update_skips_files_older_than_the_indexed_ones(index, tmp_path):
+    data = tmp_path / "data"
+    data.mkdir()
+    path = data / "showtimes_1004_2026-05-01.json"
+    path.write_text(json.dumps(payload(("s1", "F1", "2026-05-01T18:00:00+03:00", []))))
+    assert index.update(full=True, root=data) == 1
+    assert index.update(full=True, root=data) == 0
+    os.utime(path, (path.stat().st_atime, path.stat().st_mtime + 10))
+    assert index.update(full=True, root=data) == 1
@@ -0,0 +1,32 @@
+from showtime_scraper import split_showtimes_by_site
+
+
+def test_split_showtimes_by_site_narrows_related_data():
+    data = {
+        "businessDate": "2026-01-02",
+        "showtimes": [
+            {"id": "1", "siteId": "1004", "filmId": "F1", "screenId": "S1", "attributeIds": ["3D"]},
+            {"id": "2", "filmId": "F2", "screenId": "S2", "attributeIds": []},
+            {"id": "3", "siteId": "9999", "filmId": "F3", "screenId": "S3"},
+        ],
+        "relatedData": {
+            "films": [{"id": "F1"}, {"id": "F2"}, {"id": "F3"}],
+            "screens": [{"id": "S1", "siteId": "1004"}, {"id": "S2", "siteId": "1005"}, {"id": "S4", "siteId": "1005"}],
+            "attributes": [{"id": "3D"}, {"id": "IMAX"}],
+            "sites": [{"id": "1004"}, {"id": "1005"}],
+        },
+    }
+    out = split_showtimes_by_site(data, ["1004", "1005", "1006"])
+
+    assert set(out) == {"1004", "1005", "1006"}
+    assert [s["id"] for s in out["1004"]["showtimes"]] == ["1"]
+    # shows without a siteId are placed by their screen
+    assert [s["id"] for s in out["1005"]["showtimes"]] == ["2"]
+    assert out["1004"]["businessDate"] == "2026-01-02"
+    assert out["1004"]["relatedData"] == {
+        "films": [{"id": "F1"}], "screens": [{"id": "S1", "siteId": "1004"}],
+        "attributes": [{"id": "3D"}], "sites": [{"id": "1004"}],
+    }
+    assert out["1005"]["relatedData"]["screens"] == [{"id": "S2", "siteId": "1005"}, {"id": "S4", "siteId": "1005"}]
+    assert out["1005"]["relatedData"]["attributes"] == []
+    assert out["1006"]["showtimes"] == []
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from mock_finnkino import MockSettings, showtimes_payload
+from showtime_store import ShowtimeStore, ingest_files
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = ShowtimeStore(tmp_path / "showtimes.sqlite")
+    yield s
+    s.close()
+
+
+def dumps(data):
+    return json.dumps(data, ensure_ascii=False)
+
+
+def test_export_rebuilds_the_ingested_payload_byte_for_byte(store):
+    payload = showtimes_payload(MockSettings(shows_per_site=20), "1004", "2026-05-01")
+    store.ingest("1004", "2026-05-01", payload, fetched_at=1.0)
+    assert dumps(store.export("1004", "2026-05-01")) == dumps(payload)
+
+
+def test_unusual_key_order_and_missing_fields_survive(store):
+    payload = {
+        "relatedData": {"attributes": [{"id": "a2"}, {"id": "a1"}], "films": [{"id": "F2"}, {"id": "F1"}]},
+        "businessDate": "2026-05-01",
+        "showtimes": [
+            {"schedule": {"startsAt": "2026-05-01T18:00:00+02:00"}, "id": "s1", "filmId": "F1", "attributeIds": []},
+            {"id": "s2", "filmId": "F2", "attributeIds": ["a2", "a1"]},
+            {"id": "s3"},
+        ],
+    }
+    store.ingest("1004", "2026-05-01", payload, fetched_at=1.0)
+    assert dumps(store.export("1004", "2026-05-01")) == dumps(payload)
+
+
+def test_export_returns_the_latest_scrape(store):
+    first = showtimes_payload(MockSettings(shows_per_site=3), "1004", "2026-05-01")
+    second = showtimes_payload(MockSettings(shows_per_site=5, seed=2), "1004", "2026-05-01")
+    store.ingest("1004", "2026-05-01", first, fetched_at=1.0)
+    store.ingest("1004", "2026-05-01", second, fetched_at=2.0)
+    assert store.export("1004", "2026-05-01") == second
+    assert store.export("1004", "2026-05-02") is None
+    assert store.query("SELECT COUNT(*) FROM scrapes") == [(2,)]
+
+
+def test_films_are_dictionary_encoded_across_scrapes(store):
+    settings = MockSettings(shows_per_site=10)
+    for date in ("2026-05-01", "2026-05-02"):
+        store.ingest("1004", date, showtimes_payload(settings, "1004", date))
+    films = store.query("SELECT COUNT(*), COUNT(DISTINCT film_id) FROM films")[0]
+    assert films[0] == films[1]
+    shows = store.shows_per_film("2026-05-01", "2026-05-02")
+    assert sum(n for _, n, _ in shows) == 20
+
+
+def test_ingest_files_reads_site_and_date_from_the_name(store, tmp_path):
+    payload = showtimes_payload(MockSettings(shows_per_site=2), "1094", "2026-05-03")
+    path = tmp_path / "showtimes_1094_2026-05-03.json"
+    path.write_text(json.dumps(payload), encoding="utf-8")
+    (tmp_path / "notes.json").write_text("{}")
+    assert ingest_files(store, [path, tmp_path / "notes.json"]) == 1
+    assert store.export("1094", "2026-05-03") == payload
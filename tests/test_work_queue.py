@@ -0,0 +1,102 @@
+import pytest
+
+import work_queue
+from work_queue import SqliteQueue
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(work_queue.time, "time", c)
+    return c
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    q = SqliteQueue(tmp_path / "queue.sqlite", max_attempts=3)
+    yield q
+    q.close()
+
+
+def units(*keys, partition=0):
+    return [{"key": k, "partition": partition} for k in keys]
+
+
+def test_put_is_idempotent(queue):
+    assert queue.put(units("a", "b")) == 2
+    assert queue.put(units("a", "b", "c")) == 1
+    assert queue.stats()["ready"] == 3
+
+
+def test_lease_hands_out_each_unit_once(queue):
+    queue.put(units("a", "b", "c"))
+    first = queue.lease("w1", 2, 60)
+    second = queue.lease("w2", 2, 60)
+    assert sorted(u["key"] for u in first + second) == ["a", "b", "c"]
+    assert queue.lease("w3", 2, 60) == []
+
+
+def test_lease_respects_partitions(queue):
+    queue.put(units("a", partition=0) + units("b", partition=1))
+    assert [u["key"] for u in queue.lease("w1", 10, 60, partitions=[1])] == ["b"]
+
+
+def test_expired_lease_is_delivered_again_and_late_ack_ignored(queue, clock):
+    queue.put(units("a"))
+    assert [u["key"] for u in queue.lease("w1", 1, 60)] == ["a"]
+    clock.now += 30
+    assert queue.lease("w2", 1, 60) == []
+
+    clock.now += 31
+    assert queue.stats()["expired"] == 1
+    assert [u["key"] for u in queue.lease("w2", 1, 60)] == ["a"]
+    assert queue.ack("w1", "a") is False
+    assert queue.ack("w2", "a") is True
+    assert queue.stats()["done"] == 1
+    assert queue.lease("w1", 1, 60) == []
+
+
+def test_extend_keeps_the_lease(queue, clock):
+    queue.put(units("a"))
+    queue.lease("w1", 1, 60)
+    clock.now += 50
+    assert queue.extend("w1", ["a"], 60) == 1
+    assert queue.extend("w2", ["a"], 60) == 0
+    clock.now += 50
+    assert queue.lease("w2", 1, 60) == []
+
+
+def test_nack_requeues_after_delay_then_fails(queue, clock):
+    queue.put(units("a"))
+    for attempt in range(2):
+        assert queue.lease("w1", 1, 60)
+        assert queue.nack("w1", "a", retry_in=10)
+        assert queue.lease("w1", 1, 60) == []
+        clock.now += 10
+    assert queue.lease("w1", 1, 60)
+    assert queue.nack("w1", "a")
+    assert queue.stats().get("failed") == 1
+    assert queue.lease("w1", 1, 60) == []
+
+
+def test_expired_lease_out_of_attempts_fails(queue, clock):
+    queue.put(units("a"))
+    for _ in range(3):
+        assert queue.lease("w1", 1, 60)
+        clock.now += 61
+    assert queue.lease("w1", 1, 60) == []
+    assert queue.stats().get("failed") == 1
+
+
+def test_values(queue):
+    assert queue.get_value("token") is None
+    queue.set_value("token", "Bearer x")
+    assert queue.get_value("token") == "Bearer x"